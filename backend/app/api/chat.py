@@ -1,22 +1,67 @@
-from fastapi import APIRouter, HTTPException
+import asyncio
+import json
+import time
+from typing import Any, Dict, Optional
+from fastapi import APIRouter, Header, HTTPException
+from fastapi.concurrency import run_in_threadpool
 from fastapi.responses import StreamingResponse
-from app.services.chat_service import handle_query_stream
+from starlette.background import BackgroundTask
+from app.services.chat_service import (format_turns, generation_admission, handle_query_batches, load_session_turns,
+                                       model_registry, schedule_conversation_compaction, wait_for_model, worker_pool)
+from app.services.conversation_cache import get_conversation_cache
+from app.services.generation_service import GenerationQueueFullError, StreamStats
+from app.services.kv_cache import get_session_state_cache
+from app.services.metrics import CHAT_HISTOGRAMS, observe, server_timing
+from app.services.model_loader import ModelNotReadyError
+from app.services.model_registry import UnknownModelError
 from uuid import UUID
 from app.models.chat_request import ChatRequest
-from app.repositories import get_message_repository
+from app.repositories import get_file_repository, get_async_message_repository
 from app.models.message import Message
 from app.core.enums import Role
+from app.core.config import CHAT_STREAM_COALESCE_MS, CHAT_STREAM_COALESCE_BYTES
 from datetime import datetime, timezone
 
 router = APIRouter()
 
 
+def _sse_event(event: str, data: Dict[str, Any]) -> bytes:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n".encode("utf-8")
+
+
+def _breakdown(trace: Dict[str, Any]) -> Dict[str, Any]:
+    """Latency breakdown for the client: *_s trace entries in ms, plus prompt size and candidates."""
+    breakdown: Dict[str, Any] = {
+        f"{key[:-2]}_ms": round(value * 1000, 1)
+        for key, value in trace.items() if key.endswith("_s") and value is not None
+    }
+    breakdown["prompt_tokens"] = trace.get("prompt_tokens")
+    breakdown["candidates"] = trace.get("candidates")
+    return breakdown
+
+
 @router.post("/chat")
-async def chat_endpoint(request: ChatRequest):
+async def chat_endpoint(request: ChatRequest, accept: Optional[str] = Header(None)):
     """
-    POST /api/v1/chat/ expects { "messages": [...], "selected_file_ids": [...] }
+    POST /api/v1/chat/ expects { "session_id": ..., "message": {...}, "selected_file_ids": [...] }
+    with only the new user message; the history is loaded on the server.
+    Clients may instead send the full history as "messages": [...].
+    An optional "model" picks a registered model; it sticks to the session.
+
+    The answer streams as plain text. Clients accepting text/event-stream get
+    Server-Sent Events instead: "token" events ({text, tokens, t_ms}), then a
+    "done" event with time-to-first-token, tokens/s and retrieval stats, or an
+    "error" event. Tokens are coalesced per CHAT_STREAM_COALESCE_MS / _BYTES either way.
+    The Server-Timing header covers the work done before streaming starts; the full
+    latency breakdown is in the "done" event and the /metrics histograms.
+    Returns 503 if the model is still loading after MODEL_WAIT_TIMEOUT_SECONDS.
     """
-    if not request.messages:
+    stats = StreamStats()
+    sse = "text/event-stream" in (accept or "")
+    if request.server_side_history:
+        if request.message.role != Role.user: # type: ignore[union-attr]
+            raise HTTPException(status_code=400, detail="The new message must have the user role")
+    elif not request.messages:
         raise HTTPException(status_code=400, detail="No messages provided")
 
     # Convert string UUIDs to UUID objects if provided
@@ -26,17 +71,77 @@ async def chat_endpoint(request: ChatRequest):
             selected_file_ids = [UUID(fid) for fid in request.selected_file_ids]
         except ValueError:
             raise HTTPException(status_code=400, detail="Invalid file ID format")
+        # Files still being ingested are not searchable yet
+        selected_file_ids = get_file_repository().filter_ready_ids(selected_file_ids)
+
+    # Picked once: switching the default later doesn't affect this stream
+    try:
+        model = model_registry.resolve(request.model, request.session_id)
+    except UnknownModelError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    # While the model loads, wait up to MODEL_WAIT_TIMEOUT_SECONDS; nothing is persisted on 503
+    try:
+        await wait_for_model(model)
+    except ModelNotReadyError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "10"})
 
-    repo = get_message_repository()
-    repo.create_from_chat_request(chat_request=request)
+    # Reserve a place in the generation queue before persisting anything
+    try:
+        ticket = generation_admission.reserve()
+    except GenerationQueueFullError as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "5"})
+
+    repo = get_async_message_repository()
+    conversation_cache = get_conversation_cache()
+    pre_stream: Dict[str, float] = {}
+    try:
+        started = time.perf_counter()
+        if request.server_side_history:
+            # History is read before the new message is stored, so it isn't included twice
+            turns = await load_session_turns(request.session_id)
+            turns.extend(format_turns(request.submitted_messages()))
+        else:
+            turns = format_turns(request.submitted_messages())
+        pre_stream["history"] = time.perf_counter() - started
+        started = time.perf_counter()
+        await repo.create_from_chat_request(chat_request=request)
+        pre_stream["persist"] = time.perf_counter() - started
+    except Exception:
+        ticket.release()
+        raise
+    conversation_cache.put(request.session_id, turns)
+    pre_stream["total"] = stats.elapsed_ms() / 1000
+
+    trace: Dict[str, Any] = {}
 
     async def stream_and_record():
         assistant_chunks = []
         try:
-            async for chunk in handle_query_stream(request.messages, selected_file_ids):
-                assistant_chunks.append(chunk)
-                yield chunk
+            async for batch in handle_query_batches(
+                    turns, selected_file_ids, ticket=ticket, session_id=request.session_id, trace=trace, model=model,
+                    coalesce_seconds=CHAT_STREAM_COALESCE_MS / 1000, coalesce_bytes=CHAT_STREAM_COALESCE_BYTES):
+                text = "".join(batch)
+                t_ms = stats.record(len(batch))
+                assistant_chunks.append(text)
+                if sse:
+                    yield _sse_event("token", {"text": text, "tokens": len(batch), "t_ms": t_ms})
+                else:
+                    yield text
+            if sse:
+                yield _sse_event("done", {**stats.summary(), "model": model, "retrieval": trace.get("retrieval"),
+                                          "breakdown": _breakdown(trace)})
+        except Exception as e:
+            # Headers are already sent: only an event stream can report the failure in-band
+            if not sse:
+                raise
+            yield _sse_event("error", {"detail": str(e), **stats.summary()})
         finally:
+            ttft_ms = stats.ttft_ms
+            trace["ttft_s"] = ttft_ms / 1000 if ttft_ms is not None else None
+            trace["decode_tokens_per_second"] = stats.tokens_per_second
+            trace["total_s"] = stats.elapsed_ms() / 1000
+            observe(CHAT_HISTOGRAMS, trace)
             assistant_text = "".join(assistant_chunks)
             if assistant_text:
                 assistant_message = Message(
@@ -45,18 +150,68 @@ async def chat_endpoint(request: ChatRequest):
                     role=Role.assistant,
                     timestamp=datetime.now(timezone.utc).isoformat()
                 )
+                conversation_cache.append(request.session_id, {"role": Role.assistant.value, "content": assistant_text})
                 try:
-                    repo.create(assistant_message)
+                    # Shielded: a client disconnect must not drop the finished answer
+                    await asyncio.shield(repo.create(assistant_message))
+                    schedule_conversation_compaction(request.session_id)
                 except Exception:
                     # Don't raise from cleanup; streaming already finished for client.
                     pass
     # StreamingResponse keeps HTTP connection open while chunks are sent.
+    # The background task frees the queue slot even if the client disconnects before streaming starts
     return StreamingResponse(
         stream_and_record(),
-        media_type="text/plain",
+        media_type="text/event-stream" if sse else "text/plain",
         headers={
             "X-Accel-Buffering": "no",
             "Cache-Control": "no-cache",
             "Connection": "keep-alive",
-        }
-    )
\ No newline at end of file
+            "X-Queue-Position": str(ticket.position),
+            "X-Model": model,
+            "Server-Timing": server_timing(pre_stream),
+        },
+        background=BackgroundTask(ticket.release),
+    )
+
+
+@router.get("/chat/queue")
+async def get_chat_queue():
+    """
+    Get the number of chat generations running or waiting for the model.
+    """
+    return {
+        "pending": generation_admission.pending,
+        "max_depth": generation_admission.max_depth,
+        "slots": generation_admission.slots,
+    }
+
+
+@router.get("/chat/cache")
+async def get_chat_cache_stats():
+    """
+    Get per-session KV-cache hit rates and prefill tokens saved.
+    With LLM_WORKERS each worker process keeps its own cache, listed per worker.
+    """
+    if worker_pool is not None:
+        return {"workers": await run_in_threadpool(worker_pool.cache_stats)}
+    return get_session_state_cache().stats()
+
+
+@router.get("/chat/workers")
+async def get_chat_workers():
+    """
+    Get the model worker processes: which are busy or restarted, and how often
+    a session found its previous replica free.
+    """
+    if worker_pool is None:
+        return {"workers": 0}
+    return worker_pool.stats()
+
+
+@router.get("/chat/conversations")
+async def get_conversation_cache_stats():
+    """
+    Get hit rates of the in-memory cache of session histories.
+    """
+    return get_conversation_cache().stats()
\ No newline at end of file
@@ -1,18 +1,23 @@
-from fastapi import APIRouter, HTTPException, UploadFile, Query, File
+from typing import Optional
+from fastapi import APIRouter, HTTPException, UploadFile, Query, File, Header
+from fastapi.concurrency import run_in_threadpool
 from fastapi.responses import StreamingResponse
 from app.models.file import File as FileModel
 from app.repositories import get_file_repository
 from app.services.file_service import handle_file_stream
+from app.services.extracted_text import ExtractedText, open_extracted_text, parse_byte_range
+from app.services.retrieval_cache import get_retrieval_cache
 
 
 router = APIRouter()
 
 
-@router.post("/file")
+@router.post("/file", status_code=202)
 async def upload_source_text_file(file: UploadFile = File(...)):
     """
-    Saves file to backend/sources directory,
-    reads their content, and stores it in ChromaDB with file ID tracking.
+    Saves file to backend/sources directory and queues an ingestion job
+    that reads its content and stores it in ChromaDB with file ID tracking.
+    Poll GET /api/v1/jobs/{job_id} for progress.
     """
     # Ensure we have a filename
     if not file or not file.filename:
@@ -35,11 +40,12 @@ async def upload_source_text_file(file: UploadFile = File(...)):
 
     try:
         repo = get_file_repository()
-        repo.create(new_file, upload_file=file, file_extension=file_extension)
+        job = await run_in_threadpool(repo.create, new_file, upload_file=file, file_extension=file_extension)
         return {
-            "message": f"File '{new_file.name}' uploaded successfully.",
+            "message": f"File '{new_file.name}' uploaded and queued for ingestion.",
             "type": new_file.content_type,
-            "file_id": str(new_file.id)
+            "file_id": str(new_file.id),
+            "job_id": str(job.id),
         }
     except:
         raise HTTPException(status_code=400, detail=f"File '{file.filename}' not uploaded successfully.")
@@ -61,16 +67,31 @@ async def get_all_files():
                 "extension": f.extension,
                 "size_bytes": f.size_bytes,
                 "content_type" : f.content_type,
+                "status": f.status,
             }
             for f in files
         ]
     }
 
 
+@router.get("/files/retrieval-cache")
+async def get_retrieval_cache_stats():
+    """
+    Get hit/miss counters of the retrieval result cache.
+    """
+    return get_retrieval_cache().stats()
+
+
 @router.get("/file-content")
-async def get_file_content(filename: str = Query(...)):
+async def get_file_content(
+        filename: str = Query(...),
+        offset: Optional[int] = Query(None, ge=0, description="First character to return"),
+        limit: Optional[int] = Query(None, ge=0, description="Maximum number of characters"),
+        range_header: Optional[str] = Header(None, alias="Range")):
     """
     Get the content of a specific file by filename.
+    Served from the text extracted at ingest; offset/limit select characters
+    (as in chunk metadata) and an HTTP Range header selects bytes.
     """
     if not filename:
         raise HTTPException(status_code=400, detail="Missing filename.")
@@ -79,16 +100,42 @@ async def get_file_content(filename: str = Query(...)):
     file = repo.get_by_name(filename)
     if not file:
         raise HTTPException(status_code=404, detail=f"File '{filename}' not found.")
-    
-    return StreamingResponse(
-        handle_file_stream(file),
-        media_type="text/plain",
-        headers={
-            "X-Accel-Buffering": "no",
-            "Cache-Control": "no-cache",
-            "Connection": "keep-alive",
-        }
-    )
+
+    headers = {
+        "X-Accel-Buffering": "no",
+        "Cache-Control": "no-cache",
+        "Connection": "keep-alive",
+    }
+    extracted = open_extracted_text(file.id)
+    if extracted is None:
+        # Still ingesting, or ingested before sidecars existed: parse the source
+        return StreamingResponse(handle_file_stream(file), media_type="text/plain", headers=headers)
+
+    headers["Accept-Ranges"] = "bytes"
+    headers["X-Total-Chars"] = str(extracted.total_chars)
+    if range_header and offset is None and limit is None:
+        try:
+            byte_range = parse_byte_range(range_header, extracted.total_bytes)
+        except ValueError:
+            extracted.close()
+            raise HTTPException(status_code=416, detail="Requested range not satisfiable.",
+                                headers={"Content-Range": f"bytes */{extracted.total_bytes}"})
+        if byte_range is not None:
+            start, end = byte_range
+            headers["Content-Range"] = f"bytes {start}-{end}/{extracted.total_bytes}"
+            headers["Content-Length"] = str(end - start + 1)
+            return StreamingResponse(_stream_and_close(extracted, extracted.iter_bytes(start, end + 1)),
+                                     status_code=206, media_type="text/plain", headers=headers)
+
+    return StreamingResponse(_stream_and_close(extracted, extracted.iter_chars(offset or 0, limit)),
+                             media_type="text/plain", headers=headers)
+
+
+def _stream_and_close(extracted: ExtractedText, pieces):
+    try:
+        yield from pieces
+    finally:
+        extracted.close()
 
 
 @router.delete("/files")
@@ -0,0 +1,24 @@
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+from app.services.chat_service import model_registry
+
+router = APIRouter()
+
+
+@router.get("/health")
+async def get_health():
+    """
+    Liveness: the API is up, whether or not the model has loaded.
+    """
+    return {"status": "ok"}
+
+
+@router.get("/health/ready")
+async def get_readiness():
+    """
+    Readiness: 200 once the default model is loaded, otherwise 503 with its loading state
+    and progress. "models" lists every registered model.
+    """
+    default = model_registry.default
+    status = {**model_registry.status(default), "model": default, "models": model_registry.stats()["models"]}
+    return JSONResponse(status, status_code=200 if model_registry.is_ready(default) else 503)
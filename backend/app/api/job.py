@@ -0,0 +1,27 @@
+from uuid import UUID
+from fastapi import APIRouter, HTTPException
+from app.services.ingestion_service import get_ingestion_queue
+
+router = APIRouter()
+
+
+@router.get("/jobs/{job_id}")
+async def get_job_status(job_id: UUID):
+    """
+    Get state and progress of a file ingestion job.
+    """
+    job = get_ingestion_queue().get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail=f"Job '{job_id}' not found.")
+
+    return {
+        "id": str(job.id),
+        "file_id": str(job.file_id),
+        "file_name": job.file_name,
+        "state": job.state,
+        "chunks_processed": job.chunks_processed,
+        "error": job.error,
+        "created_at": job.created_at,
+        "started_at": job.started_at,
+        "finished_at": job.finished_at,
+    }
@@ -1,35 +1,72 @@
-from fastapi import APIRouter, Query, HTTPException
-from app.repositories import get_message_repository
+from typing import AsyncIterator, Optional, Tuple
+from uuid import UUID
+import json
+from fastapi import APIRouter, Query, HTTPException, Header
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, StreamingResponse
+from app.repositories import get_async_message_repository
+from app.services.chat_service import model_registry, session_state_key, worker_pool
+from app.services.kv_cache import get_session_state_cache
+from app.services.conversation_cache import get_conversation_cache
 
 router = APIRouter()
 
 
+_MESSAGE_KEYS = ("id", "session_id", "text", "role", "timestamp")
+
+
+async def _encode_rows(rows: AsyncIterator[Tuple]) -> AsyncIterator[bytes]:
+    """NDJSON: one message object per line, encoded straight from the SQLite rows."""
+    async for row in rows:
+        yield json.dumps(dict(zip(_MESSAGE_KEYS, row)), ensure_ascii=False).encode("utf-8") + b"\n"
+
+
 @router.get("/messages")
-async def get_messages(session_id: str = Query(...)):
-    repo = get_message_repository()
-    messages = repo.get_by_session(session_id=session_id)
+async def get_messages(
+        session_id: str = Query(...),
+        before: Optional[UUID] = Query(None, description="Return messages older than this message ID"),
+        after: Optional[UUID] = Query(None, description="Return messages newer than this message ID"),
+        limit: Optional[int] = Query(None, ge=1, le=10000),
+        stream: bool = Query(False, description="Stream NDJSON, one message per line"),
+        accept: Optional[str] = Header(None)):
+    """
+    Get messages of a session, oldest first. before/after page by message ID;
+    with a limit and no after, the newest messages are returned. NDJSON is
+    streamed when stream=true or the client accepts application/x-ndjson.
+    """
+    repo = get_async_message_repository()
+    stream = stream or "application/x-ndjson" in (accept or "")
+    # JSON pages read one extra row to tell whether more messages exist
+    fetch_limit = limit + 1 if limit is not None and not stream else limit
+    try:
+        rows = await repo.iter_session_rows(
+            session_id=session_id, before=before, after=after, limit=fetch_limit, stream=stream)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
-    return {
-        "messages": [
-            {
-                "id": message.id,
-                "session_id": message.session_id,
-                "text": message.text,
-                "role": message.role,
-                "timestamp": message.timestamp,
-            }
-            for message in messages
-        ]
-    }
+    if stream:
+        return StreamingResponse(_encode_rows(rows), media_type="application/x-ndjson")
+
+    page = [dict(zip(_MESSAGE_KEYS, row)) async for row in rows]
+    has_more = limit is not None and len(page) > limit
+    if has_more:
+        # The extra row lies beyond the page: oldest when paging backwards, newest when paging forwards
+        page = page[:-1] if after is not None else page[1:]
+    return JSONResponse({"messages": page, "has_more": has_more})
 
 
 @router.get("/sessions")
-async def get_sessions():
+async def get_sessions(
+        limit: int = Query(50, ge=1, le=1000),
+        cursor: Optional[str] = Query(None, description="next_cursor from the previous page")):
     """
-    Get history of sessions.
+    Get history of sessions, most recent first, one page at a time.
     """
-    repo = get_message_repository()
-    sessions = repo.get_sessions_data()
+    repo = get_async_message_repository()
+    try:
+        sessions, next_cursor = await repo.get_sessions_page(limit=limit, cursor=cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     return {
         "sessions": [
             {
@@ -39,15 +76,24 @@ async def get_sessions():
                 "lastMessage": session.get("lastMessage"),
             }
             for session in sessions
-        ]
+        ],
+        "next_cursor": next_cursor,
     }
 
 @router.delete("/sessions")
 async def delete_session(session_id: str = Query(...)):
-    repo = get_message_repository()
+    repo = get_async_message_repository()
     
     try:
-        repo.delete_by_session(session_id=session_id)
+        await repo.delete_by_session(session_id=session_id)
+        session_keys = [session_state_key(model, session_id) for model in model_registry.names]
+        for key in session_keys:
+            get_session_state_cache().discard(key)
+        if worker_pool is not None:
+            # With LLM_WORKERS the states live in the worker processes
+            await run_in_threadpool(worker_pool.discard, *session_keys)
+        model_registry.forget_session(session_id)
+        get_conversation_cache().discard(session_id)
         return {
             "message": f"Messages for session id '{session_id}' deleted successfully.",
             "file_id": session_id
@@ -1,13 +1,12 @@
-from pathlib import Path
-
-from fastapi import APIRouter
+from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 from app.core.config import (
     CONTEXT_LIMIT,
     MAX_OUTPUT_TOKENS,
-    MODEL_ABSOLUTE_PATH,
     runtime_config
 )
+from app.services.chat_service import load_executor, model_registry
+from app.services.model_registry import UnknownModelError
 
 router = APIRouter()
 
@@ -16,17 +15,20 @@ class PromptUpdate(BaseModel):
     prompt: str
 
 
+class ModelUpdate(BaseModel):
+    model: str
+
+
 @router.get("/settings")
 async def get_settings_info():
     """
     Get some basic settings information
     """
-    model = Path(MODEL_ABSOLUTE_PATH).stem if MODEL_ABSOLUTE_PATH else "unknown"
-    
     return {
         "context_limit": CONTEXT_LIMIT,
         "max_output_tokens": MAX_OUTPUT_TOKENS,
-        "model": model,
+        "model": model_registry.default,
+        "models": model_registry.names,
         "role_llm_prompt": runtime_config.role_llm_prompt,
     }
 
@@ -38,4 +40,26 @@ async def get_prompt():
 @router.post("/settings/prompt")
 async def set_prompt(update: PromptUpdate):
     runtime_config.role_llm_prompt = update.prompt
-    return {"role_llm_prompt": runtime_config.role_llm_prompt}
\ No newline at end of file
+    return {"role_llm_prompt": runtime_config.role_llm_prompt}
+
+
+@router.get("/settings/models")
+async def get_models():
+    """
+    Get the registered models, which are loaded, and the memory budget they share.
+    """
+    return model_registry.stats()
+
+
+@router.post("/settings/model")
+async def set_default_model(update: ModelUpdate):
+    """
+    Switch the default model. It starts loading in the background; chats already
+    streaming finish on the model they started with.
+    """
+    try:
+        model_registry.set_default(update.model)
+    except UnknownModelError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    model_registry.start(update.model, load_executor)
+    return {"model": update.model, **model_registry.status(update.model)}
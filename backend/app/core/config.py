@@ -3,7 +3,8 @@ from pathlib import Path
 from dotenv import load_dotenv
 
 # Load .env file from backend directory
-env_path = Path(__file__).parent.parent.parent / ".env"
+BACKEND_DIR = Path(__file__).resolve().parent.parent.parent
+env_path = BACKEND_DIR / ".env"
 load_dotenv(dotenv_path=env_path)
 
 VECTOR_DB_COLLECTION_NAME = "my_collection"
@@ -11,10 +12,60 @@ CONTEXT_LIMIT = int(os.getenv("CONTEXT_LIMIT", 100000))
 SERVICE_NAME = os.getenv("SERVICE_NAME")
 MAX_OUTPUT_TOKENS = int(os.getenv("MAX_OUTPUT_TOKENS", 40000))
 MODEL_ABSOLUTE_PATH = os.getenv("MODEL_ABSOLUTE_PATH")
+MODEL_PATHS = os.getenv("MODEL_PATHS", "") # More GGUF files, separated by os.pathsep; each is selectable by its file name stem
+DEFAULT_MODEL = os.getenv("DEFAULT_MODEL", "") # Model used when a chat names none; defaults to MODEL_ABSOLUTE_PATH's
+MODEL_RAM_BUDGET_BYTES = int(os.getenv("MODEL_RAM_BUDGET_BYTES", 0)) # Total file size of models kept loaded (in each worker process with LLM_WORKERS); 0 keeps only the last used one
+MODEL_SESSION_CHOICES = int(os.getenv("MODEL_SESSION_CHOICES", 4096)) # Sessions whose model choice is remembered
 ROLE_LLM_PROMPT = os.getenv("ROLE_LLM_PROMPT", "You are a helpful, respectful and honest assistant.")
 N_GPU_LAYERS = int(os.getenv("N_GPU_LAYERS", -1)) # Set to -1 to offload all layers (requires sufficient VRAM)
 LLAMA_VERBOSE = os.getenv("LLAMA_VERBOSE", "False").lower() in ("true", "1", "yes")
+LLM_WORKERS = int(os.getenv("LLM_WORKERS", 0)) # Model replica processes serving chats in parallel; 0 runs one model on a thread in the API process
+LLM_THREADS = int(os.getenv("LLM_THREADS", 0)) # CPU threads per model instance; 0 splits the cores across LLM_WORKERS (llama.cpp's default without workers)
+MODEL_USE_MMAP = os.getenv("MODEL_USE_MMAP", "True").lower() in ("true", "1", "yes") # Map the weights instead of reading them into RAM
+MODEL_USE_MLOCK = os.getenv("MODEL_USE_MLOCK", "False").lower() in ("true", "1", "yes") # Pin the weights in RAM so they are never paged out
+MODEL_PREFETCH = os.getenv("MODEL_PREFETCH", "True").lower() in ("true", "1", "yes") # Read the model file sequentially before mapping it
+MODEL_WAIT_TIMEOUT_SECONDS = float(os.getenv("MODEL_WAIT_TIMEOUT_SECONDS", 30)) # Chats wait this long for a loading model before 503
 SOURCES_VECTOR_DB_N_RESULTS = int(os.getenv("SOURCES_VECTOR_DB_N_RESULTS", 100))
+GENERATION_QUEUE_MAX_DEPTH = int(os.getenv("GENERATION_QUEUE_MAX_DEPTH", 8)) # Chats allowed to wait for the model before 429
+GENERATION_TOKEN_BUFFER = int(os.getenv("GENERATION_TOKEN_BUFFER", 64)) # Tokens buffered between generation thread and response
+CHAT_STREAM_COALESCE_MS = float(os.getenv("CHAT_STREAM_COALESCE_MS", 30)) # Tokens arriving within this window are sent in one write
+CHAT_STREAM_COALESCE_BYTES = int(os.getenv("CHAT_STREAM_COALESCE_BYTES", 512)) # Flush a batch early once it reaches this size
+PROMPT_DEBUG_SAMPLE_RATE = float(os.getenv("PROMPT_DEBUG_SAMPLE_RATE", 0.0)) # Fraction of chat prompts printed in full for debugging
+KV_CACHE_ENABLED = os.getenv("KV_CACHE_ENABLED", "True").lower() in ("true", "1", "yes") # Reuse llama.cpp state per chat session
+KV_CACHE_RAM_BYTES = int(os.getenv("KV_CACHE_RAM_BYTES", 2 * 1024**3))
+KV_CACHE_SPILL_DIR = os.getenv("KV_CACHE_SPILL_DIR", "") # Empty disables spilling evicted states to disk
+MESSAGE_REPOSITORY_BACKEND = os.getenv("MESSAGE_REPOSITORY_BACKEND", "aiosqlite") # "aiosqlite" or "sqlite" (blocking sqlite3 run in the threadpool)
+CONVERSATION_CACHE_SIZE = int(os.getenv("CONVERSATION_CACHE_SIZE", 256)) # Sessions whose formatted history is kept in memory
+HISTORY_MAX_TOKENS = int(os.getenv("HISTORY_MAX_TOKENS", CONTEXT_LIMIT // 2)) # Conversation share of the prompt; older turns beyond it are left out
+COMPACTION_ENABLED = os.getenv("COMPACTION_ENABLED", "True").lower() in ("true", "1", "yes") # Fold old turns of long chats into a rolling summary
+COMPACTION_TRIGGER_TOKENS = int(os.getenv("COMPACTION_TRIGGER_TOKENS", CONTEXT_LIMIT // 4)) # Unsummarized history above this gets compacted
+COMPACTION_KEEP_RECENT_TOKENS = int(os.getenv("COMPACTION_KEEP_RECENT_TOKENS", CONTEXT_LIMIT // 8)) # Newest turns always kept verbatim
+COMPACTION_SUMMARY_MAX_TOKENS = int(os.getenv("COMPACTION_SUMMARY_MAX_TOKENS", 512))
+TOKEN_COUNT_CACHE_SIZE = int(os.getenv("TOKEN_COUNT_CACHE_SIZE", 4096)) # Memoized message token counts
+RETRIEVAL_WORKERS = int(os.getenv("RETRIEVAL_WORKERS", 4)) # Threads embedding queries and searching Chroma
+RETRIEVAL_PAGE_SIZE = int(os.getenv("RETRIEVAL_PAGE_SIZE", 16)) # First candidate page; doubles until the token budget is filled
+RETRIEVAL_MIN_REMAINING_TOKENS = int(os.getenv("RETRIEVAL_MIN_REMAINING_TOKENS", 64)) # Stop paging below this much free budget
+NEAR_DUPLICATE_THRESHOLD = float(os.getenv("NEAR_DUPLICATE_THRESHOLD", 0.8)) # Shingle Jaccard above which chunks are dropped
+RETRIEVAL_CACHE_SIZE = int(os.getenv("RETRIEVAL_CACHE_SIZE", 256)) # Cached vector DB query results
+RETRIEVAL_CACHE_TTL_SECONDS = float(os.getenv("RETRIEVAL_CACHE_TTL_SECONDS", 300))
+CHROMA_PERSIST_DIR = os.getenv("CHROMA_PERSIST_DIR", str(BACKEND_DIR / "chroma_db"))
+SOURCES_DIR = os.getenv("SOURCES_DIR", str(BACKEND_DIR / "sources")) # Uploaded source files
+MESSAGE_DB_PATH = os.getenv("MESSAGE_DB_PATH", str(BACKEND_DIR / "messages.db"))
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", 64)) # Chunks embedded per bulk add
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", 2)) # Background threads parsing and embedding uploads
+PDF_EXTRACT_WORKERS = int(os.getenv("PDF_EXTRACT_WORKERS", min(4, os.cpu_count() or 1))) # Processes extracting PDF pages in parallel
+PDF_PAGES_PER_TASK = int(os.getenv("PDF_PAGES_PER_TASK", 8)) # Page range handed to one worker task
+PDF_MAX_IN_FLIGHT_PAGES = int(os.getenv("PDF_MAX_IN_FLIGHT_PAGES", 128)) # Extracted-but-unconsumed page ceiling
+PDF_PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES", 32)) # Smaller PDFs are extracted in-process
+CHUNKER_STRATEGY = os.getenv("CHUNKER_STRATEGY", "token") # "token" (sentence packing) or "block" (one chunk per paragraph/page)
+CHUNK_TARGET_TOKENS = int(os.getenv("CHUNK_TARGET_TOKENS", 256)) # Chunks close once they reach this size
+CHUNK_MAX_TOKENS = int(os.getenv("CHUNK_MAX_TOKENS", 512)) # Hard ceiling; longer sentences are split by words
+CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", 32)) # Trailing sentences repeated in the next chunk
+HYBRID_SEARCH_ENABLED = os.getenv("HYBRID_SEARCH_ENABLED", "True").lower() in ("true", "1", "yes") # BM25 + dense with rank fusion
+RRF_K = int(os.getenv("RRF_K", 60)) # Reciprocal-rank fusion damping constant
+LEXICAL_INDEX_PATH = os.getenv("LEXICAL_INDEX_PATH", str(Path(CHROMA_PERSIST_DIR) / "lexical_index.pkl"))
+EXTRACTED_TEXT_DIR = os.getenv("EXTRACTED_TEXT_DIR", str(Path(CHROMA_PERSIST_DIR) / "extracted_text")) # Text sidecars served by /file-content
+FILE_MANIFEST_PATH = os.getenv("FILE_MANIFEST_PATH", str(Path(CHROMA_PERSIST_DIR) / "file_manifest.json"))
 
 # Runtime mutable config
 class RuntimeConfig:
@@ -1,15 +1,18 @@
 import chromadb
-from app.core.config import VECTOR_DB_COLLECTION_NAME
+from chromadb.utils.embedding_functions import DefaultEmbeddingFunction
+from app.core.config import VECTOR_DB_COLLECTION_NAME, CHROMA_PERSIST_DIR
 
 
 def initialize_chroma_client():
     """
-    Initialize and return a ChromaDB client with the required collection.
+    Initialize and return the persistent ChromaDB client with the required collection.
+    Embeddings are stored on disk in CHROMA_PERSIST_DIR and survive restarts.
     """
-    client = chromadb.Client()
-    client.create_collection(name=VECTOR_DB_COLLECTION_NAME)
-    return client
+    chroma_client.get_or_create_collection(name=VECTOR_DB_COLLECTION_NAME)
+    return chroma_client
 
 
 # Global ChromaDB client instance
-chroma_client = chromadb.Client()
\ No newline at end of file
+chroma_client = chromadb.PersistentClient(path=CHROMA_PERSIST_DIR)
+# Same embedding function the collection uses; lets retrieval embed a query once and reuse it
+embedding_function = DefaultEmbeddingFunction()
@@ -2,4 +2,16 @@ from enum import Enum
 
 class Role(str, Enum):
     user = "user"
-    assistant = "assistant"
\ No newline at end of file
+    assistant = "assistant"
+
+class FileStatus(str, Enum):
+    processing = "processing"
+    ready = "ready"
+    failed = "failed"
+
+
+class JobState(str, Enum):
+    queued = "queued"
+    running = "running"
+    completed = "completed"
+    failed = "failed"
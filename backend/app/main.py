@@ -1,14 +1,35 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 from app.api.chat import router as chat_router
 from app.api.file import router as file_router
+from app.api.health import router as health_router
+from app.api.job import router as job_router
 from app.api.message import router as message_router
+from app.api.metrics import router as metrics_router
 from app.api.settings import router as settings_router
 import uvicorn
 from app.core.database import initialize_chroma_client
+from app.repositories import close_async_message_repository, get_file_repository
+from app.services.chat_service import load_executor, model_registry, worker_pool
 
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Load the default model in the background; /api/v1/health/ready reports progress
+    model_registry.start(model_registry.default, load_executor)
+    # Reconcile sources with the vector store off the event loop, before the first request
+    # needs the file repository; changed files are re-ingested by the background job queue
+    await run_in_threadpool(get_file_repository)
+    yield
+    if worker_pool is not None:
+        worker_pool.close()
+    # Flush and close the shared message DB connection
+    await close_async_message_repository()
+
+
+app = FastAPI(lifespan=lifespan)
 
 # CORS allow Angular (localhost:4200) to talk to FastAPI
 app.add_middleware(
@@ -16,13 +37,18 @@ app.add_middleware(
     allow_origins=["http://localhost:4200"],
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing"],
 )
 
 # Mount routers
 app.include_router(chat_router, prefix="/api/v1", tags=["chat"])
 app.include_router(file_router, prefix="/api/v1", tags=["file"])
+app.include_router(health_router, prefix="/api/v1", tags=["health"])
+app.include_router(job_router, prefix="/api/v1", tags=["job"])
 app.include_router(message_router, prefix="/api/v1", tags=["message"])
 app.include_router(settings_router, prefix="/api/v1", tags=["settings"])
+# Served at the root, where Prometheus scrapes by default
+app.include_router(metrics_router, tags=["metrics"])
 
 if __name__ == "__main__":
     # Initialize ChromaDB client and collection
@@ -1,9 +1,32 @@
 from app.models.message import Message
 from typing import List, Optional
-from pydantic import BaseModel
+from pydantic import BaseModel, model_validator
 from uuid import UUID
 
 class ChatRequest(BaseModel):
-    messages: List[Message]
+    """
+    Either the full history in `messages`, or only the new user `message`:
+    the server then continues the stored conversation of `session_id`.
+    `model` picks a registered model for this and later requests of the session.
+    """
+    messages: Optional[List[Message]] = None
+    message: Optional[Message] = None
     selected_file_ids: Optional[List[str]] = None
-    session_id: str
\ No newline at end of file
+    session_id: str
+    model: Optional[str] = None
+
+    @model_validator(mode="after")
+    def check_messages(self) -> "ChatRequest":
+        if self.messages is not None and self.message is not None:
+            raise ValueError("Send either 'messages' or 'message', not both")
+        return self
+
+    @property
+    def server_side_history(self) -> bool:
+        return self.message is not None
+
+    def submitted_messages(self) -> List[Message]:
+        """The messages carried by this request."""
+        if self.message is not None:
+            return [self.message]
+        return self.messages or []
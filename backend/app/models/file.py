@@ -1,5 +1,6 @@
 from pydantic import BaseModel, Field
 from uuid import UUID, uuid4
+from app.core.enums import FileStatus
 
 
 class File(BaseModel):
@@ -8,4 +9,5 @@ class File(BaseModel):
     path: str
     extension: str
     size_bytes: int
-    content_type: str | None
\ No newline at end of file
+    content_type: str | None
+    status: FileStatus = FileStatus.ready
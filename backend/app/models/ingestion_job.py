@@ -0,0 +1,15 @@
+from uuid import UUID, uuid4
+from pydantic import BaseModel, Field
+from app.core.enums import JobState
+
+
+class IngestionJob(BaseModel):
+    id: UUID = Field(default_factory=uuid4)
+    file_id: UUID
+    file_name: str
+    state: JobState = JobState.queued
+    chunks_processed: int = 0
+    error: str | None = None
+    created_at: str # ISO string
+    started_at: str | None = None
+    finished_at: str | None = None
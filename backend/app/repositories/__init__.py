@@ -1,9 +1,15 @@
 from .file_repository import FileRepository, get_file_repository
 from .message_repository import MessageRepository, get_message_repository
+from .async_message_repository import (AsyncMessageRepository, ThreadedMessageRepository,
+                                       get_async_message_repository, close_async_message_repository)
 
 __all__ = [
 	"FileRepository",
 	"get_file_repository",
 	"MessageRepository",
 	"get_message_repository",
+	"AsyncMessageRepository",
+	"ThreadedMessageRepository",
+	"get_async_message_repository",
+	"close_async_message_repository",
 ]
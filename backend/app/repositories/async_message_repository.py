@@ -0,0 +1,407 @@
+import asyncio
+import sqlite3
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+from uuid import UUID
+
+import aiosqlite
+from fastapi.concurrency import iterate_in_threadpool, run_in_threadpool
+
+from app.core.config import MESSAGE_REPOSITORY_BACKEND
+from app.core.enums import Role
+from app.models.chat_request import ChatRequest
+from app.models.message import Message
+from app.repositories.message_repository import (CONNECTION_PRAGMAS, CONVERSATION_SUMMARY_SQL, CURSOR_MESSAGE_SQL,
+                                                 DEFAULT_DB_PATH, DELETE_CONVERSATION_SUMMARY_SQL, DELETE_SESSION_SQL,
+                                                 FIRST_MESSAGE_SQL, FIRST_USER_MESSAGE_SQL, LAST_MESSAGE_SQL,
+                                                 MESSAGE_COLUMNS, UPSERT_CONVERSATION_SUMMARY_SQL, UPSERT_SESSION_SQL,
+                                                 MessageRepository,
+                                                 get_message_repository, session_rows_query,
+                                                 session_summary_row, sessions_page_query, sessions_page_result)
+
+# Writes waiting in the queue are committed together, up to this many per transaction
+_MAX_WRITE_BATCH = 64
+_WriteJob = Callable[[aiosqlite.Connection], Awaitable[Any]]
+
+
+class AsyncMessageRepository:
+    """
+    aiosqlite-backed message repository with the same interface as MessageRepository, awaited.
+    All calls share one connection. Writes go through a queue drained by a single
+    writer task, which commits whatever has queued up in one transaction
+    (a savepoint per write keeps a failing write from affecting the others).
+    """
+
+    def __init__(self, db_path: Optional[str] = None):
+        self._db_path = Path(db_path) if db_path else DEFAULT_DB_PATH
+        self._conn: Optional[aiosqlite.Connection] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._write_queue: "asyncio.Queue[Tuple[_WriteJob, asyncio.Future]]"
+        self._writer: Optional[asyncio.Task] = None
+        self._start_lock: Optional[asyncio.Lock] = None
+
+    async def _connection(self) -> aiosqlite.Connection:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # The connection and writer task belong to the loop that opened them (tests may run several)
+            self._loop, self._conn, self._start_lock = loop, None, asyncio.Lock()
+        if self._conn is None:
+            async with self._start_lock:  # type: ignore[union-attr]
+                if self._conn is None:
+                    # Schema creation and summary backfill are shared with the sync repository
+                    await asyncio.to_thread(lambda: MessageRepository(str(self._db_path)).close())
+                    conn = await aiosqlite.connect(str(self._db_path), timeout=5.0, isolation_level=None)
+                    conn.row_factory = sqlite3.Row
+                    for pragma in CONNECTION_PRAGMAS:
+                        await conn.execute(pragma)
+                    self._write_queue = asyncio.Queue()
+                    self._writer = asyncio.create_task(self._write_loop(conn))
+                    self._conn = conn
+        return self._conn
+
+    async def close(self) -> None:
+        """Commits every queued write, then stops the writer and closes the connection."""
+        if self._writer is not None:
+            if self._loop is asyncio.get_running_loop() and not self._writer.done():
+                # The writer only idles on an empty queue once all batches are committed
+                await self._write_queue.join()
+            self._writer.cancel()
+            try:
+                await self._writer
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._writer = None
+        if self._conn is not None:
+            await self._conn.close()
+            self._conn = None
+
+    async def _write(self, job: _WriteJob) -> Any:
+        await self._connection()
+        future = asyncio.get_running_loop().create_future()
+        await self._write_queue.put((job, future))
+        return await future
+
+    async def _write_loop(self, conn: aiosqlite.Connection) -> None:
+        while True:
+            batch = [await self._write_queue.get()]
+            while len(batch) < _MAX_WRITE_BATCH and not self._write_queue.empty():
+                batch.append(self._write_queue.get_nowait())
+
+            outcomes: List[Tuple[asyncio.Future, Any, Optional[BaseException]]] = []
+            try:
+                await conn.execute("BEGIN IMMEDIATE")
+                for job, future in batch:
+                    await conn.execute("SAVEPOINT write_job")
+                    try:
+                        result = await job(conn)
+                        await conn.execute("RELEASE write_job")
+                        outcomes.append((future, result, None))
+                    except Exception as e:
+                        await conn.execute("ROLLBACK TO write_job")
+                        await conn.execute("RELEASE write_job")
+                        outcomes.append((future, None, e))
+                await conn.execute("COMMIT")
+            except Exception as e:
+                if conn.in_transaction:
+                    await conn.execute("ROLLBACK")
+                outcomes = [(future, None, e) for _, future in batch]
+
+            for future, result, error in outcomes:
+                self._write_queue.task_done()
+                if future.done():
+                    continue  # Caller was cancelled; the write itself still happened
+                if error is not None:
+                    future.set_exception(error)
+                else:
+                    future.set_result(result)
+
+    async def _fetchall(self, query: str, params: Tuple = ()) -> List[sqlite3.Row]:
+        conn = await self._connection()
+        async with conn.execute(query, params) as cur:
+            return list(await cur.fetchall())
+
+    async def _fetchone(self, query: str, params: Tuple = ()) -> Optional[sqlite3.Row]:
+        conn = await self._connection()
+        async with conn.execute(query, params) as cur:
+            return await cur.fetchone()
+
+    @staticmethod
+    async def _refresh_sessions(conn: aiosqlite.Connection, session_ids: List[Optional[str]]) -> None:
+        """Recompute summary rows of the given sessions, as MessageRepository._refresh_sessions."""
+        for sid in set(session_ids):
+            if sid is None:
+                continue
+            async with conn.execute(LAST_MESSAGE_SQL, (sid,)) as cur:
+                last = await cur.fetchone()
+            if last is None:
+                await conn.execute(DELETE_SESSION_SQL, (sid,))
+                continue
+            async with conn.execute(FIRST_USER_MESSAGE_SQL, (sid, Role.user.value)) as cur:
+                first = await cur.fetchone()
+            if first is None:
+                async with conn.execute(FIRST_MESSAGE_SQL, (sid,)) as cur:
+                    first = await cur.fetchone()
+            await conn.execute(UPSERT_SESSION_SQL,
+                               session_summary_row(sid, first["text"], last["text"], last["timestamp"]))
+
+    @staticmethod
+    def _message_params(message: Message) -> Tuple:
+        return (
+            str(message.id),
+            message.session_id,
+            message.text,
+            message.role.value if hasattr(message.role, "value") else str(message.role),
+            message.timestamp,
+        )
+
+    @staticmethod
+    def _row_to_message(row: sqlite3.Row) -> Message:
+        return Message(
+            id=UUID(row["id"]),
+            session_id=row["session_id"],
+            text=row["text"],
+            role=Role(row["role"]),
+            timestamp=row["timestamp"],
+        )
+
+    async def create_from_chat_request(self, chat_request: ChatRequest) -> bool:
+        # Persist only non-assistant messages; already stored IDs are skipped by INSERT OR IGNORE
+        rows = [
+            (str(msg.id), chat_request.session_id, *self._message_params(msg)[2:])
+            for msg in chat_request.submitted_messages()
+            if msg.role != Role.assistant
+        ]
+        if not rows:
+            return True
+
+        async def job(conn: aiosqlite.Connection) -> bool:
+            cur = await conn.executemany(
+                f"INSERT OR IGNORE INTO messages ({MESSAGE_COLUMNS}) VALUES (?, ?, ?, ?, ?)", rows)
+            if cur.rowcount:
+                await self._refresh_sessions(conn, [chat_request.session_id])
+            return True
+
+        return await self._write(job)
+
+    async def create(self, message: Message) -> Message:
+        async def job(conn: aiosqlite.Connection) -> Message:
+            try:
+                await conn.execute(f"INSERT INTO messages ({MESSAGE_COLUMNS}) VALUES (?, ?, ?, ?, ?)",
+                                   self._message_params(message))
+            except sqlite3.IntegrityError:
+                raise ValueError(f"Message with ID {message.id} already exists.")
+            await self._refresh_sessions(conn, [message.session_id])
+            return message
+
+        return await self._write(job)
+
+    async def get(self, message_id: UUID | None) -> Message | None:
+        if message_id is None:
+            return None
+        row = await self._fetchone(f"SELECT {MESSAGE_COLUMNS} FROM messages WHERE id = ?", (str(message_id),))
+        return self._row_to_message(row) if row else None
+
+    async def get_all(self) -> List[Message]:
+        rows = await self._fetchall(f"SELECT {MESSAGE_COLUMNS} FROM messages ORDER BY timestamp ASC")
+        return [self._row_to_message(r) for r in rows]
+
+    async def get_by_session(self, session_id: str) -> List[Message]:
+        rows = await self._fetchall(
+            f"SELECT {MESSAGE_COLUMNS} FROM messages WHERE session_id = ? ORDER BY timestamp ASC", (session_id,))
+        return [self._row_to_message(r) for r in rows]
+
+    async def iter_session_rows(
+            self,
+            session_id: str,
+            before: Optional[UUID] = None,
+            after: Optional[UUID] = None,
+            limit: Optional[int] = None,
+            batch_size: int = 256,
+            stream: bool = False) -> AsyncIterator[Tuple[str, str, str, str, str]]:
+        """
+        See MessageRepository.iter_session_rows. Unbounded reads are fetched as
+        successive keyset batches, so no cursor stays open on the shared connection
+        and stream makes no difference.
+        Raises ValueError when a cursor message is not in the session.
+        """
+        bounds: List[Tuple[str, str, str]] = []
+        for message_id, operator in ((before, "<"), (after, ">")):
+            if message_id is None:
+                continue
+            row = await self._fetchone(CURSOR_MESSAGE_SQL, (str(message_id), session_id))
+            if row is None:
+                raise ValueError(f"Message '{message_id}' not found in session '{session_id}'.")
+            bounds.append((operator, row["timestamp"], str(message_id)))
+        return self._iter_rows(session_id, bounds, limit, after is None, batch_size)
+
+    async def _iter_rows(
+            self,
+            session_id: str,
+            bounds: List[Tuple[str, str, str]],
+            limit: Optional[int],
+            newest: bool,
+            batch_size: int) -> AsyncIterator[Tuple[str, str, str, str, str]]:
+        if limit is not None and newest:
+            for row in await self._fetchall(*session_rows_query(session_id, bounds, limit, newest=True)):
+                yield tuple(row)
+            return
+
+        remaining = limit
+        while remaining is None or remaining > 0:
+            size = batch_size if remaining is None else min(batch_size, remaining)
+            rows = await self._fetchall(*session_rows_query(session_id, bounds, size, newest=False))
+            for row in rows:
+                yield tuple(row)
+            if len(rows) < size:
+                return
+            if remaining is not None:
+                remaining -= len(rows)
+            # Continue after the last row returned
+            bounds = [bound for bound in bounds if bound[0] != ">"] + [(">", rows[-1]["timestamp"], rows[-1]["id"])]
+
+    async def update(self, message_id: UUID, **kwargs) -> Message | None:
+        existing = await self.get(message_id)
+        if not existing:
+            return None
+        updated = existing.model_copy(update=kwargs)
+
+        async def job(conn: aiosqlite.Connection) -> Message:
+            await conn.execute(
+                "UPDATE messages SET session_id = ?, text = ?, role = ?, timestamp = ? WHERE id = ?",
+                (*self._message_params(updated)[1:], str(message_id)),
+            )
+            await self._refresh_sessions(conn, [existing.session_id, updated.session_id])
+            return updated
+
+        return await self._write(job)
+
+    async def delete(self, message_id: UUID) -> bool:
+        async def job(conn: aiosqlite.Connection) -> bool:
+            async with conn.execute("SELECT session_id FROM messages WHERE id = ?", (str(message_id),)) as cur:
+                row = await cur.fetchone()
+            cur = await conn.execute("DELETE FROM messages WHERE id = ?", (str(message_id),))
+            if row is not None:
+                await self._refresh_sessions(conn, [row["session_id"]])
+            return cur.rowcount > 0
+
+        return await self._write(job)
+
+    async def delete_by_session(self, session_id: str) -> int:
+        async def job(conn: aiosqlite.Connection) -> int:
+            cur = await conn.execute("DELETE FROM messages WHERE session_id = ?", (session_id,))
+            await conn.execute(DELETE_SESSION_SQL, (session_id,))
+            await conn.execute(DELETE_CONVERSATION_SUMMARY_SQL, (session_id,))
+            return cur.rowcount or 0
+
+        return await self._write(job)
+
+    async def get_conversation_summary(self, session_id: str) -> Tuple[str, int] | None:
+        row = await self._fetchone(CONVERSATION_SUMMARY_SQL, (session_id,))
+        return (row["summary"], row["covered_turns"]) if row else None
+
+    async def save_conversation_summary(self, session_id: str, summary: str, covered_turns: int) -> None:
+        params = (session_id, summary, covered_turns, datetime.now(timezone.utc).isoformat())
+
+        async def job(conn: aiosqlite.Connection) -> None:
+            await conn.execute(UPSERT_CONVERSATION_SUMMARY_SQL, params)
+
+        await self._write(job)
+
+    async def get_sessions_data(self) -> List[Dict[str, str]]:
+        sessions: List[Dict[str, str]] = []
+        cursor: Optional[str] = None
+        while True:
+            page, cursor = await self.get_sessions_page(limit=1000, cursor=cursor)
+            sessions.extend(page)
+            if cursor is None:
+                return sessions
+
+    async def get_sessions_page(self, limit: int = 50, cursor: Optional[str] = None) -> Tuple[List[Dict[str, str]], Optional[str]]:
+        """See MessageRepository.get_sessions_page. Raises ValueError on a malformed cursor."""
+        limit = max(1, limit)
+        query, params = sessions_page_query(limit, cursor)
+        return sessions_page_result(await self._fetchall(query, params), limit)
+
+
+class ThreadedMessageRepository:
+    """
+    Awaitable facade over the blocking MessageRepository: every call runs in the
+    threadpool, so the event loop keeps streaming tokens meanwhile.
+    """
+
+    def __init__(self, repo: MessageRepository):
+        self._repo = repo
+
+    async def create_from_chat_request(self, chat_request: ChatRequest) -> bool:
+        return await run_in_threadpool(self._repo.create_from_chat_request, chat_request)
+
+    async def create(self, message: Message) -> Message:
+        return await run_in_threadpool(self._repo.create, message)
+
+    async def get(self, message_id: UUID | None) -> Message | None:
+        return await run_in_threadpool(self._repo.get, message_id)
+
+    async def get_all(self) -> List[Message]:
+        return await run_in_threadpool(self._repo.get_all)
+
+    async def get_by_session(self, session_id: str) -> List[Message]:
+        return await run_in_threadpool(self._repo.get_by_session, session_id)
+
+    async def iter_session_rows(
+            self,
+            session_id: str,
+            before: Optional[UUID] = None,
+            after: Optional[UUID] = None,
+            limit: Optional[int] = None,
+            stream: bool = False) -> AsyncIterator[Tuple[str, str, str, str, str]]:
+        rows = await run_in_threadpool(self._repo.iter_session_rows, session_id, before, after, limit, stream=stream)
+        return iterate_in_threadpool(rows)
+
+    async def update(self, message_id: UUID, **kwargs) -> Message | None:
+        return await run_in_threadpool(self._repo.update, message_id, **kwargs)
+
+    async def delete(self, message_id: UUID) -> bool:
+        return await run_in_threadpool(self._repo.delete, message_id)
+
+    async def delete_by_session(self, session_id: str) -> int:
+        return await run_in_threadpool(self._repo.delete_by_session, session_id)
+
+    async def get_conversation_summary(self, session_id: str) -> Tuple[str, int] | None:
+        return await run_in_threadpool(self._repo.get_conversation_summary, session_id)
+
+    async def save_conversation_summary(self, session_id: str, summary: str, covered_turns: int) -> None:
+        return await run_in_threadpool(self._repo.save_conversation_summary, session_id, summary, covered_turns)
+
+    async def get_sessions_data(self) -> List[Dict[str, str]]:
+        return await run_in_threadpool(self._repo.get_sessions_data)
+
+    async def get_sessions_page(self, limit: int = 50, cursor: Optional[str] = None) -> Tuple[List[Dict[str, str]], Optional[str]]:
+        return await run_in_threadpool(self._repo.get_sessions_page, limit, cursor)
+
+    async def close(self) -> None:
+        return None
+
+
+_async_message_repository: Optional[AsyncMessageRepository | ThreadedMessageRepository] = None
+
+
+def get_async_message_repository() -> AsyncMessageRepository | ThreadedMessageRepository:
+    """
+    Awaitable message repository used by the API: aiosqlite when
+    MESSAGE_REPOSITORY_BACKEND is "aiosqlite", otherwise the sqlite3 repository in the threadpool.
+    """
+    global _async_message_repository
+    if _async_message_repository is None:
+        if MESSAGE_REPOSITORY_BACKEND == "aiosqlite":
+            _async_message_repository = AsyncMessageRepository()
+        else:
+            _async_message_repository = ThreadedMessageRepository(get_message_repository())
+    return _async_message_repository
+
+
+async def close_async_message_repository() -> None:
+    global _async_message_repository
+    if _async_message_repository is not None:
+        await _async_message_repository.close()
+        _async_message_repository = None
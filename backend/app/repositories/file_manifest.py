@@ -0,0 +1,51 @@
+import json
+import os
+from typing import Any, Dict, List, Optional
+
+from app.core.config import FILE_MANIFEST_PATH
+
+
+class FileManifest:
+    """
+    JSON manifest of the source files that are already embedded in the vector database.
+    Keyed by file name; each entry keeps the File ID, content hash, size and mtime
+    so startup can tell new, changed, unchanged and removed files apart.
+    """
+
+    def __init__(self, manifest_path: Optional[str] = None):
+        self._path = manifest_path or FILE_MANIFEST_PATH
+        self._entries: Dict[str, Dict[str, Any]] = self._load()
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        if not os.path.isfile(self._path):
+            return {}
+        try:
+            with open(self._path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            return data.get("files", {})
+        except Exception as e:
+            print(f"Ignoring unreadable file manifest: {e}")
+            return {}
+
+    def save(self) -> None:
+        """Write the manifest atomically so a crash never leaves it half-written."""
+        os.makedirs(os.path.dirname(self._path) or ".", exist_ok=True)
+        tmp_path = f"{self._path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"version": 1, "files": self._entries}, f, indent=2)
+        os.replace(tmp_path, self._path)
+
+    def get(self, name: str) -> Dict[str, Any] | None:
+        return self._entries.get(name)
+
+    def set(self, name: str, entry: Dict[str, Any]) -> None:
+        self._entries[name] = entry
+
+    def remove(self, name: str) -> Dict[str, Any] | None:
+        return self._entries.pop(name, None)
+
+    def names(self) -> List[str]:
+        return list(self._entries.keys())
+
+    def clear(self) -> None:
+        self._entries.clear()
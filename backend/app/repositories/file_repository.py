@@ -1,36 +1,67 @@
-from typing import Optional, List, Dict
+from typing import Any, Optional, List, Dict
 import os
+import threading
 from fastapi import UploadFile
 from uuid import UUID
+from app.core.enums import FileStatus, JobState
 from app.models.file import File
+from app.models.ingestion_job import IngestionJob
+from app.repositories.file_manifest import FileManifest
+from app.services.ingestion_service import get_ingestion_queue
+from app.services.chunker import chunker_signature
+from app.services.extracted_text import has_extracted_text
 from app.services.file_service import (clear_documents_collection,
-                                        upload_file_to_vector_db,
-                                        save_or_reuse_data_file,
+                                        compute_file_hash,
+                                        count_documents,
+                                        rebuild_lexical_index_if_stale,
+                                        save_data_file,
                                         delete_file_from_disk,
                                         delete_file_from_vector_db,
                                         data_dir)
+
+SUPPORTED_CONTENT_TYPES = {
+    "txt": "text/plain",
+    "md": "text/markdown",
+    "pdf": "application/pdf",
+    "docx": "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+}
+
+
 class FileRepository:
     """
     In-memory repository for managing File metadata.
-    Tracks which files have been uploaded and are in the vector database.
+    Tracks which files have been uploaded and are in the vector database;
+    a FileManifest persists their hashes so restarts only reindex what changed.
     """
 
     def __init__(self):
         self._files: Dict[UUID, File] = {}  # Store by ID
         self._file_path_index: Dict[str, UUID] = {}  # Map file_path to ID for quick lookup
-        self._load_existing_files()
+        self._manifest = FileManifest()  # Persisted hashes of already embedded files
+        self._lock = threading.RLock()  # Ingestion workers update files and manifest concurrently
+        with self._lock:
+            self._load_existing_files()
 
     def _load_existing_files(self) -> None:
-        supported_content_types = {
-            "txt": "text/plain",
-            "md": "text/markdown",
-            "pdf": "application/pdf",
-            "docx": "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
-        }
+        """
+        Reconcile backend/sources with the persistent vector store.
+        Only new or changed files, files chunked with other chunker settings and
+        files without an extracted text sidecar are queued for re-ingestion;
+        unchanged files keep their File IDs and embeddings, and files missing
+        from disk are dropped.
+        """
         if not os.path.isdir(data_dir):
-            return
+            data_names = []
+        else:
+            data_names = sorted(os.listdir(data_dir))
 
-        for name in os.listdir(data_dir):
+        # A wiped vector store invalidates every manifest entry
+        vector_db_empty = count_documents() == 0
+        rebuild_lexical_index_if_stale()
+        seen_names = set()
+        stats = {"new": 0, "changed": 0, "unchanged": 0, "removed": 0}
+
+        for name in data_names:
             path = os.path.join(data_dir, name)
             if not os.path.isfile(path):
                 continue
@@ -38,60 +69,169 @@ class FileRepository:
             if "." not in name:
                 continue
             extension = name.rsplit(".", 1)[-1].lower()
-            if extension not in supported_content_types:
+            if extension not in SUPPORTED_CONTENT_TYPES:
                 continue
 
+            seen_names.add(name)
+            stat = os.stat(path)
+            entry = self._manifest.get(name)
             file = File(
                 name=name,
                 path=path,
                 extension=extension,
-                size_bytes=os.path.getsize(path),
-                content_type=supported_content_types[extension],
+                size_bytes=stat.st_size,
+                content_type=SUPPORTED_CONTENT_TYPES[extension],
             )
-            upload_file_to_vector_db(path, file_extension=extension, file_id=file.id)
+            if entry:
+                file.id = UUID(entry["id"])
+
+            sha256 = None
+            unchanged = False
+            if (entry and not vector_db_empty and entry.get("chunker") == chunker_signature()
+                    and has_extracted_text(file.id)):
+                if entry.get("size_bytes") == stat.st_size and entry.get("mtime") == stat.st_mtime:
+                    unchanged = True
+                else:
+                    sha256 = compute_file_hash(path)
+                    unchanged = sha256 == entry.get("sha256")
+
+            if unchanged:
+                stats["unchanged"] += 1
+                self._manifest.set(name, self._manifest_entry(file, sha256 or entry["sha256"], stat.st_mtime))
+                self._register(file)
+            else:
+                stats["changed" if entry else "new"] += 1
+                if entry:
+                    delete_file_from_vector_db(file.id)
+                self._manifest.remove(name)
+                self._submit_ingestion(file)
+
+        for name in self._manifest.names():
+            if name in seen_names:
+                continue
+            entry = self._manifest.remove(name)
+            if entry:
+                delete_file_from_vector_db(UUID(entry["id"]))
+                stats["removed"] += 1
+
+        self._manifest.save()
+        print(f"Sources reindexed: {stats}")
+
+    @staticmethod
+    def _manifest_entry(file: File, sha256: str, mtime: float) -> Dict[str, Any]:
+        return {
+            "id": str(file.id),
+            "sha256": sha256,
+            "size_bytes": file.size_bytes,
+            "mtime": mtime,
+            "extension": file.extension,
+            "chunker": chunker_signature(),
+        }
+
+    def _register(self, file: File) -> None:
+        with self._lock:
             self._files[file.id] = file
             self._file_path_index[file.path] = file.id
 
-    def create(self, file: File, upload_file : UploadFile, file_extension : str) -> File:
-        """Add a new file to the repository."""
+    def _submit_ingestion(self, file: File) -> IngestionJob:
+        """Track the file as processing and hand parsing/embedding to the background queue."""
+        file.status = FileStatus.processing
+        self._register(file)
+        return get_ingestion_queue().submit(file, on_finished=self._on_ingestion_finished)
+
+    def _on_ingestion_finished(self, job: IngestionJob) -> None:
+        """Runs on the ingestion worker: mark the file ready/failed and persist its hash."""
+        with self._lock:
+            file = self._files.get(job.file_id)
+
+        sha256, mtime = None, 0.0
+        if file is not None and job.state == JobState.completed:
+            try:
+                mtime = os.stat(file.path).st_mtime
+                sha256 = compute_file_hash(file.path)
+            except OSError as e:
+                print(f"Could not hash '{file.name}' for manifest: {e}")
+
+        with self._lock:
+            if file is None or job.file_id not in self._files:
+                # Deleted while ingesting; drop whatever chunks were written meanwhile
+                delete_file_from_vector_db(job.file_id)
+                return
+
+            if job.state != JobState.completed:
+                file.status = FileStatus.failed
+                return
+
+            if sha256:
+                self._manifest.set(file.name, self._manifest_entry(file, sha256, mtime))
+                self._manifest.save()
+            file.status = FileStatus.ready
+
+    def create(self, file: File, upload_file : UploadFile, file_extension : str) -> IngestionJob:
+        """
+        Save an uploaded file and queue it for ingestion.
+        The file is listed immediately but only becomes selectable once its job completes.
+        """
         if file.id in self._files:
             raise ValueError(f"File with ID {file.id} already exists.")
 
-        file.size_bytes = upload_file.size if upload_file.size is not None else 0
-        saved_path = save_or_reuse_data_file(upload_file)
-        
-        if saved_path:
-            file.path = saved_path
-            upload_file_to_vector_db(saved_path, file_extension=file_extension, file_id=file.id)
-        
-        self._files[file.id] = file
-        self._file_path_index[file.path] = file.id
-        return file
+        saved_path = save_data_file(upload_file)
+        if not saved_path:
+            raise ValueError(f"File '{file.name}' could not be saved.")
+
+        # Re-uploading a known name replaces the previous content, record and chunks;
+        # the manifest gets the new hash and mtime once the new content is ingested
+        existing = self.get_by_name(file.name)
+        if existing:
+            with self._lock:
+                self._files.pop(existing.id, None)
+                self._file_path_index.pop(existing.path, None)
+                self._manifest.remove(existing.name)
+                self._manifest.save()
+            delete_file_from_vector_db(existing.id)
+
+        file.path = saved_path
+        file.extension = file_extension
+        file.size_bytes = os.path.getsize(saved_path)
+        return self._submit_ingestion(file)
 
     def get_by_name(self, file_name: str) -> File | None:
         """Retrieve all files matching a filename."""
-        for f in self._files.values():
+        for f in self.get_all():
             if f.name == file_name:
                 return f
         return None
 
     def get_all(self) -> List[File]:
         """Retrieve all files."""
-        return list(self._files.values())
+        with self._lock:
+            return list(self._files.values())
+
+    def filter_ready_ids(self, file_ids: List[UUID]) -> List[UUID]:
+        """Keep only IDs of files whose ingestion has completed."""
+        with self._lock:
+            return [fid for fid in file_ids
+                    if fid in self._files and self._files[fid].status == FileStatus.ready]
     
     def delete(self, file : File) -> bool:
         """Delete a file from the repository."""
+        with self._lock:
+            del self._files[file.id]
+            self._file_path_index.pop(file.path, None)
+            self._manifest.remove(file.name)
+            self._manifest.save()
         delete_file_from_vector_db(file.id)
         delete_file_from_disk(file.name)
-        del self._files[file.id]
-        self._file_path_index.pop(file.path, None)
         return True
 
     def delete_all(self) -> None:
         """Clear all files from the repository."""
+        with self._lock:
+            self._files.clear()
+            self._file_path_index.clear()
+            self._manifest.clear()
+            self._manifest.save()
         clear_documents_collection()
-        self._files.clear()
-        self._file_path_index.clear()
 
     # def get_by_id(self, file_id: UUID) -> Optional[File]:
     #     """Retrieve a file by its ID."""
@@ -127,11 +267,17 @@ class FileRepository:
 
 # Global instance for singleton pattern
 _file_repository: Optional[FileRepository] = None
+_file_repository_lock = threading.Lock()
 
 
 def get_file_repository() -> FileRepository:
-    """Get or create the singleton FileRepository instance."""
+    """
+    Get or create the singleton FileRepository instance. Creating it reconciles the
+    sources on disk, so the app lifespan does it on a worker thread before serving.
+    """
     global _file_repository
     if _file_repository is None:
-        _file_repository = FileRepository()
+        with _file_repository_lock:
+            if _file_repository is None:
+                _file_repository = FileRepository()
     return _file_repository
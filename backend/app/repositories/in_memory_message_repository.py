@@ -1,4 +1,4 @@
-from typing import Dict, List, Optional
+from typing import Dict, Iterator, List, Optional, Tuple
 from uuid import UUID
 from app.models.message import Message
 from app.models.chat_request import ChatRequest
@@ -9,9 +9,10 @@ class MessageRepository:
 
     def __init__(self):
         self._messages: Dict[Optional[UUID], Message] = {}
+        self._summaries: Dict[str, Tuple[str, int]] = {}
 
     def create_from_chat_request(self, chat_request: ChatRequest) -> bool:
-        for message in chat_request.messages:
+        for message in chat_request.submitted_messages():
             print(f"{message.id=}")
             if not self.get(message.id) and message.role != Role.assistant:
                 message_object = Message(
@@ -38,6 +39,32 @@ class MessageRepository:
     def get_by_session(self, session_id: str) -> List[Message]:
         return [m for m in self._messages.values() if m.session_id == session_id]
 
+    def iter_session_rows(
+            self,
+            session_id: str,
+            before: Optional[UUID] = None,
+            after: Optional[UUID] = None,
+            limit: Optional[int] = None,
+            stream: bool = False) -> Iterator[Tuple[str, str, str, str, str]]:
+        """
+        Messages of a session as (id, session_id, text, role, timestamp) tuples, oldest first,
+        paged by message ID like the SQLite repository. stream makes no difference here.
+        """
+        messages = sorted(self.get_by_session(session_id), key=lambda m: (m.timestamp, str(m.id)))
+        keys = [(m.timestamp, str(m.id)) for m in messages]
+        for message_id, is_before in ((before, True), (after, False)):
+            if message_id is None:
+                continue
+            cursor = self.get(message_id)
+            if cursor is None or cursor.session_id != session_id:
+                raise ValueError(f"Message '{message_id}' not found in session '{session_id}'.")
+            cursor_key = (cursor.timestamp, str(cursor.id))
+            messages = [m for m, key in zip(messages, keys) if (key < cursor_key) == is_before and key != cursor_key]
+            keys = [(m.timestamp, str(m.id)) for m in messages]
+        if limit is not None:
+            messages = messages[-limit:] if after is None else messages[:limit]
+        return iter([(str(m.id), m.session_id, m.text, m.role.value, m.timestamp) for m in messages])
+
     def update(self, message_id: UUID, **kwargs) -> Message | None:
         existing = self._messages.get(message_id)
         if not existing:
@@ -56,8 +83,15 @@ class MessageRepository:
         to_delete = [mid for mid, msg in self._messages.items() if msg.session_id == session_id]
         for mid in to_delete:
             del self._messages[mid]
+        self._summaries.pop(session_id, None)
         return len(to_delete)
 
+    def get_conversation_summary(self, session_id: str) -> Tuple[str, int] | None:
+        return self._summaries.get(session_id)
+
+    def save_conversation_summary(self, session_id: str, summary: str, covered_turns: int) -> None:
+        self._summaries[session_id] = (summary, covered_turns)
+
     def get_sessions_data(self) -> List[Dict[str, str]]:
         """
         Aggregate messages into session summaries.
@@ -121,6 +155,21 @@ class MessageRepository:
 
         return summaries
 
+    def get_sessions_page(self, limit: int = 50, cursor: Optional[str] = None) -> Tuple[List[Dict[str, str]], Optional[str]]:
+        """
+        Page of get_sessions_data; the cursor is the ID of the last session of the previous page.
+        """
+        summaries = self.get_sessions_data()
+        start = 0
+        if cursor:
+            ids = [summary["id"] for summary in summaries]
+            if cursor not in ids:
+                raise ValueError(f"Invalid cursor '{cursor}'.")
+            start = ids.index(cursor) + 1
+        page = summaries[start:start + max(1, limit)]
+        has_more = start + len(page) < len(summaries)
+        return page, (page[-1]["id"] if page and has_more else None)
+
 
 _message_repository: Optional[MessageRepository] = None
 
@@ -1,30 +1,185 @@
+import base64
+import json
 import sqlite3
+import threading
+from datetime import datetime, timezone
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
 from uuid import UUID
 
 from app.models.message import Message
 from app.models.chat_request import ChatRequest
 from app.core.enums import Role
+from app.core.config import MESSAGE_DB_PATH
+
+# Applied once to every new connection. WAL lets readers run alongside the single writer;
+# synchronous=NORMAL is durable across application crashes under WAL.
+CONNECTION_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-16000",
+    "PRAGMA mmap_size=268435456",
+)
+
+
+def _parse_ts(ts: str) -> float:
+    """ISO timestamp to UTC epoch seconds; naive timestamps are taken as UTC."""
+    try:
+        dt = datetime.fromisoformat(ts)
+        if dt.tzinfo is None:
+            dt = dt.replace(tzinfo=timezone.utc)
+        else:
+            dt = dt.astimezone(timezone.utc)
+        return dt.timestamp()
+    except Exception:
+        return 0.0
+
+
+def _encode_cursor(last_ts_epoch: float, session_id: str) -> str:
+    return base64.urlsafe_b64encode(json.dumps([last_ts_epoch, session_id]).encode("utf-8")).decode("ascii")
+
+
+def _decode_cursor(cursor: str) -> Tuple[float, str]:
+    try:
+        last_ts_epoch, session_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return float(last_ts_epoch), str(session_id)
+    except Exception:
+        raise ValueError(f"Invalid cursor '{cursor}'.")
+
+
+# Queries shared with the async repository
+DEFAULT_DB_PATH = Path(MESSAGE_DB_PATH)
+MESSAGE_COLUMNS = "id, session_id, text, role, timestamp"
+LAST_MESSAGE_SQL = "SELECT text, timestamp FROM messages WHERE session_id = ? ORDER BY timestamp DESC LIMIT 1"
+FIRST_USER_MESSAGE_SQL = "SELECT text FROM messages WHERE session_id = ? AND role = ? ORDER BY timestamp ASC LIMIT 1"
+FIRST_MESSAGE_SQL = "SELECT text FROM messages WHERE session_id = ? ORDER BY timestamp ASC LIMIT 1"
+CURSOR_MESSAGE_SQL = "SELECT timestamp FROM messages WHERE id = ? AND session_id = ?"
+DELETE_SESSION_SQL = "DELETE FROM sessions WHERE session_id = ?"
+CONVERSATION_SUMMARY_SQL = "SELECT summary, covered_turns FROM conversation_summaries WHERE session_id = ?"
+DELETE_CONVERSATION_SUMMARY_SQL = "DELETE FROM conversation_summaries WHERE session_id = ?"
+UPSERT_CONVERSATION_SUMMARY_SQL = """
+    INSERT INTO conversation_summaries (session_id, summary, covered_turns, updated_at)
+    VALUES (?, ?, ?, ?)
+    ON CONFLICT(session_id) DO UPDATE SET
+        summary = excluded.summary,
+        covered_turns = excluded.covered_turns,
+        updated_at = excluded.updated_at
+"""
+UPSERT_SESSION_SQL = """
+    INSERT INTO sessions (session_id, title, last_timestamp, last_ts_epoch, last_message)
+    VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT(session_id) DO UPDATE SET
+        title = excluded.title,
+        last_timestamp = excluded.last_timestamp,
+        last_ts_epoch = excluded.last_ts_epoch,
+        last_message = excluded.last_message
+"""
+
+
+def session_summary_row(session_id: str, first_text: str, last_text: str, last_timestamp: str) -> Tuple:
+    """UPSERT_SESSION_SQL parameters: title and preview are cut to 10/20 words (75/150 chars)."""
+    title = " ".join(first_text.split(" ")[:10])[:75]
+    last_message = " ".join(last_text.split(" ")[:20])[:150]
+    return session_id, title, last_timestamp, _parse_ts(last_timestamp), last_message
+
+
+def sessions_page_query(limit: int, cursor: Optional[str]) -> Tuple[str, Tuple]:
+    """Keyset query for one page of sessions; reads limit + 1 rows to detect a next page."""
+    query = "SELECT session_id, title, last_timestamp, last_ts_epoch, last_message FROM sessions"
+    params: Tuple = ()
+    if cursor:
+        last_ts_epoch, session_id = _decode_cursor(cursor)
+        query += " WHERE last_ts_epoch < ? OR (last_ts_epoch = ? AND session_id < ?)"
+        params = (last_ts_epoch, last_ts_epoch, session_id)
+    query += " ORDER BY last_ts_epoch DESC, session_id DESC LIMIT ?"
+    return query, (*params, limit + 1)
+
+
+def sessions_page_result(rows: List[sqlite3.Row], limit: int) -> Tuple[List[Dict[str, str]], Optional[str]]:
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = _encode_cursor(rows[-1]["last_ts_epoch"], rows[-1]["session_id"])
+    sessions = [
+        {
+            "id": str(row["session_id"]),
+            "title": row["title"],
+            "timestamp": row["last_timestamp"],
+            "lastMessage": row["last_message"],
+        }
+        for row in rows
+    ]
+    return sessions, next_cursor
+
+
+def session_rows_query(
+        session_id: str,
+        bounds: List[Tuple[str, str, str]],
+        limit: Optional[int],
+        newest: bool) -> Tuple[str, Tuple]:
+    """
+    Messages of a session ordered by (timestamp, id). bounds are (operator, timestamp, id)
+    keyset conditions; newest selects the last `limit` rows, still returned oldest first.
+    """
+    conditions = ["session_id = ?"]
+    params: List = [session_id]
+    for operator, timestamp, message_id in bounds:
+        conditions.append(f"(timestamp {operator} ? OR (timestamp = ? AND id {operator} ?))")
+        params += [timestamp, timestamp, message_id]
+    where = " AND ".join(conditions)
+    if limit is not None and newest:
+        query = (f"SELECT {MESSAGE_COLUMNS} FROM (SELECT {MESSAGE_COLUMNS} FROM messages WHERE {where} "
+                 f"ORDER BY timestamp DESC, id DESC LIMIT ?) ORDER BY timestamp ASC, id ASC")
+    else:
+        query = f"SELECT {MESSAGE_COLUMNS} FROM messages WHERE {where} ORDER BY timestamp ASC, id ASC"
+        if limit is not None:
+            query += " LIMIT ?"
+    if limit is not None:
+        params.append(limit)
+    return query, tuple(params)
 
 
 class MessageRepository:
-    """SQLite-backed CRUD repository for messages."""
+    """
+    SQLite-backed CRUD repository for messages.
+    Connections are long-lived, one per thread, so each call skips connection setup.
+    """
 
     def __init__(self, db_path: Optional[str] = None):
         # Default DB at backend/messages.db
         if db_path is None:
-            backend_dir = Path(__file__).resolve().parents[2]
-            self._db_path = backend_dir / "messages.db"
+            self._db_path = DEFAULT_DB_PATH
         else:
             self._db_path = Path(db_path)
+        self._local = threading.local()
         self._init_db()
 
     def _connect(self) -> sqlite3.Connection:
-        conn = sqlite3.connect(str(self._db_path), check_same_thread=False)
+        """
+        The calling thread's connection, opened on first use. Used as
+        `with self._connect() as conn:`, which commits or rolls back but keeps it open.
+        """
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._open_connection()
+            self._local.conn = conn
+        return conn
+
+    def _open_connection(self, check_same_thread: bool = True) -> sqlite3.Connection:
+        conn = sqlite3.connect(str(self._db_path), timeout=5.0, check_same_thread=check_same_thread)
         conn.row_factory = sqlite3.Row
+        for pragma in CONNECTION_PRAGMAS:
+            conn.execute(pragma)
         return conn
 
+    def close(self) -> None:
+        """Close the calling thread's connection."""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
     def _init_db(self) -> None:
         with self._connect() as conn:
             cur = conn.cursor()
@@ -45,22 +200,88 @@ class MessageRepository:
                 ON messages(session_id)
                 """
             )
+            cur.execute(
+                """
+                CREATE INDEX IF NOT EXISTS idx_session_timestamp
+                ON messages(session_id, timestamp)
+                """
+            )
+            # One row per session, kept in sync with messages on every write
+            cur.execute(
+                """
+                CREATE TABLE IF NOT EXISTS sessions (
+                    session_id TEXT PRIMARY KEY,
+                    title TEXT NOT NULL,
+                    last_timestamp TEXT NOT NULL,
+                    last_ts_epoch REAL NOT NULL,
+                    last_message TEXT NOT NULL
+                )
+                """
+            )
+            cur.execute(
+                """
+                CREATE INDEX IF NOT EXISTS idx_sessions_recent
+                ON sessions(last_ts_epoch DESC, session_id DESC)
+                """
+            )
+            # Rolling summary of each long conversation's oldest turns, see compaction_service
+            cur.execute(
+                """
+                CREATE TABLE IF NOT EXISTS conversation_summaries (
+                    session_id TEXT PRIMARY KEY,
+                    summary TEXT NOT NULL,
+                    covered_turns INTEGER NOT NULL,
+                    updated_at TEXT NOT NULL
+                )
+                """
+            )
+            # Backfill summaries for databases created before the sessions table existed
+            has_summaries = cur.execute("SELECT 1 FROM sessions LIMIT 1").fetchone()
+            if not has_summaries:
+                cur.execute("SELECT DISTINCT session_id FROM messages WHERE session_id IS NOT NULL")
+                self._refresh_sessions(conn, [row["session_id"] for row in cur.fetchall()])
             conn.commit()
 
+    def _refresh_sessions(self, conn: sqlite3.Connection, session_ids: Iterable[Optional[str]]) -> None:
+        """
+        Recompute the summary rows of the given sessions inside the caller's transaction.
+        Two indexed lookups per session: the last message, and the first user message for the title.
+        """
+        for sid in set(session_ids):
+            if sid is None:
+                continue
+            last = conn.execute(LAST_MESSAGE_SQL, (sid,)).fetchone()
+            if last is None:
+                conn.execute(DELETE_SESSION_SQL, (sid,))
+                continue
+            first = (conn.execute(FIRST_USER_MESSAGE_SQL, (sid, Role.user.value)).fetchone()
+                     or conn.execute(FIRST_MESSAGE_SQL, (sid,)).fetchone())
+            conn.execute(UPSERT_SESSION_SQL, session_summary_row(sid, first["text"], last["text"], last["timestamp"]))
+
     def create_from_chat_request(self, chat_request: ChatRequest) -> bool:
-        # Persist only non-assistant messages from the request payload
-        for msg in chat_request.messages:
-            if msg.role != Role.assistant:
-                # If already present, skip; otherwise insert
-                if not self.get(msg.id):
-                    message_object = Message(
-                        id=msg.id,
-                        session_id=chat_request.session_id,
-                        text=msg.text,
-                        role=msg.role,
-                        timestamp=msg.timestamp,
-                    )
-                    self.create(message_object)
+        # Persist only non-assistant messages from the request payload.
+        # A client sending the whole history resends earlier turns: already stored IDs are
+        # skipped by INSERT OR IGNORE, all in one transaction.
+        rows = [
+            (
+                str(msg.id),
+                chat_request.session_id,
+                msg.text,
+                msg.role.value if hasattr(msg.role, "value") else str(msg.role),
+                msg.timestamp,
+            )
+            for msg in chat_request.submitted_messages()
+            if msg.role != Role.assistant
+        ]
+        if not rows:
+            return True
+        with self._connect() as conn:
+            cur = conn.executemany(
+                "INSERT OR IGNORE INTO messages (id, session_id, text, role, timestamp) VALUES (?, ?, ?, ?, ?)",
+                rows,
+            )
+            if cur.rowcount:
+                self._refresh_sessions(conn, [chat_request.session_id])
         return True
 
     def create(self, message: Message) -> Message:
@@ -76,6 +297,7 @@ class MessageRepository:
                         message.timestamp,
                     ),
                 )
+                self._refresh_sessions(conn, [message.session_id])
                 conn.commit()
             except sqlite3.IntegrityError:
                 raise ValueError(f"Message with ID {message.id} already exists.")
@@ -118,6 +340,53 @@ class MessageRepository:
             )
             return [self._row_to_message(r) for r in cur.fetchall()]
 
+    def iter_session_rows(
+            self,
+            session_id: str,
+            before: Optional[UUID] = None,
+            after: Optional[UUID] = None,
+            limit: Optional[int] = None,
+            batch_size: int = 256,
+            stream: bool = False) -> Iterator[Tuple[str, str, str, str, str]]:
+        """
+        Messages of a session as plain (id, session_id, text, role, timestamp) tuples,
+        oldest first, without building Message models.
+
+        before/after are message IDs used as keyset cursors on (timestamp, id).
+        With before, or with only a limit, the newest matching rows are returned.
+        Rows are read on the calling thread's connection; with stream they are instead
+        fetched in batches from a dedicated connection, so the iterator can be consumed
+        from any thread (e.g. by a streaming response).
+        Raises ValueError immediately when a cursor message is not in the session.
+        """
+        bounds: List[Tuple[str, str, str]] = []
+        with self._connect() as conn:
+            for message_id, operator in ((before, "<"), (after, ">")):
+                if message_id is None:
+                    continue
+                row = conn.execute(CURSOR_MESSAGE_SQL, (str(message_id), session_id)).fetchone()
+                if row is None:
+                    raise ValueError(f"Message '{message_id}' not found in session '{session_id}'.")
+                bounds.append((operator, row["timestamp"], str(message_id)))
+
+            query, params = session_rows_query(session_id, bounds, limit, newest=after is None)
+            if not stream:
+                return iter([tuple(row) for row in conn.execute(query, params).fetchall()])
+        return self._iter_rows(query, params, batch_size)
+
+    def _iter_rows(self, query: str, params: Tuple, batch_size: int) -> Iterator[Tuple[str, str, str, str, str]]:
+        conn = self._open_connection(check_same_thread=False)
+        conn.row_factory = None
+        try:
+            cur = conn.execute(query, params)
+            while True:
+                rows = cur.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield from rows
+        finally:
+            conn.close()
+
     def update(self, message_id: UUID, **kwargs) -> Message | None:
         existing = self.get(message_id)
         if not existing:
@@ -136,75 +405,71 @@ class MessageRepository:
                     str(message_id),
                 ),
             )
+            self._refresh_sessions(conn, [existing.session_id, updated.session_id])
             conn.commit()
         return updated
 
     def delete(self, message_id: UUID) -> bool:
         with self._connect() as conn:
+            row = conn.execute("SELECT session_id FROM messages WHERE id = ?", (str(message_id),)).fetchone()
             cur = conn.execute("DELETE FROM messages WHERE id = ?", (str(message_id),))
+            if row is not None:
+                self._refresh_sessions(conn, [row["session_id"]])
             conn.commit()
             return cur.rowcount > 0
 
     def delete_by_session(self, session_id: str) -> int:
         with self._connect() as conn:
             cur = conn.execute("DELETE FROM messages WHERE session_id = ?", (session_id,))
+            conn.execute(DELETE_SESSION_SQL, (session_id,))
+            conn.execute(DELETE_CONVERSATION_SUMMARY_SQL, (session_id,))
             conn.commit()
             return cur.rowcount or 0
 
+    def get_conversation_summary(self, session_id: str) -> Tuple[str, int] | None:
+        """The session's rolling summary and how many of its first turns it covers."""
+        with self._connect() as conn:
+            row = conn.execute(CONVERSATION_SUMMARY_SQL, (session_id,)).fetchone()
+        return (row["summary"], row["covered_turns"]) if row else None
+
+    def save_conversation_summary(self, session_id: str, summary: str, covered_turns: int) -> None:
+        with self._connect() as conn:
+            conn.execute(UPSERT_CONVERSATION_SUMMARY_SQL,
+                         (session_id, summary, covered_turns, datetime.now(timezone.utc).isoformat()))
+            conn.commit()
+
     def get_sessions_data(self) -> List[Dict[str, str]]:
         """
-        Aggregate messages into session summaries.
+        All session summaries, most recently active first.
+        See get_sessions_page for the keys of each summary.
+        """
+        sessions: List[Dict[str, str]] = []
+        cursor: Optional[str] = None
+        while True:
+            page, cursor = self.get_sessions_page(limit=1000, cursor=cursor)
+            sessions.extend(page)
+            if cursor is None:
+                return sessions
 
-        Returns a list of dictionaries with keys:
+    def get_sessions_page(self, limit: int = 50, cursor: Optional[str] = None) -> Tuple[List[Dict[str, str]], Optional[str]]:
+        """
+        One page of session summaries from the sessions table, sorted by last
+        message timestamp (descending) with keyset pagination.
+
+        Each summary has keys:
         - id: session identifier
         - title: derived from the first user message text (fallback to first message)
         - timestamp: timestamp of the last message in the session
         - lastMessage: text of the last message in the session
 
-        Sessions are sorted by last message timestamp (descending).
+        Returns the page and the cursor of the next page (None on the last page).
+        Raises ValueError on a malformed cursor.
         """
-        from datetime import datetime, timezone
-
-        def parse_ts(ts: str) -> float:
-            try:
-                dt = datetime.fromisoformat(ts)
-                if dt.tzinfo is None:
-                    dt = dt.replace(tzinfo=timezone.utc)
-                else:
-                    dt = dt.astimezone(timezone.utc)
-                return dt.timestamp()
-            except Exception:
-                return 0.0
-
-        # Fetch distinct session_ids
+        limit = max(1, limit)
+        query, params = sessions_page_query(limit, cursor)
         with self._connect() as conn:
-            cur = conn.execute("SELECT DISTINCT session_id FROM messages WHERE session_id IS NOT NULL")
-            session_ids = [row["session_id"] for row in cur.fetchall()]
-
-        summaries: List[Dict[str, str]] = []
-        for sid in session_ids:
-            msgs = self.get_by_session(sid)
-            if not msgs:
-                continue
-            last = msgs[-1]
-            first_user = next((m for m in msgs if m.role == Role.user), None)
-            title_text = (first_user.text if first_user else msgs[0].text)
-            title_text_words = title_text.split(" ")
-            final_title_text = " ".join(title_text_words[:10])[:75]
-            last_message_words = last.text.split(" ")
-            final_last_message = " ".join(last_message_words[:20])[:150]
-
-            summaries.append(
-                {
-                    "id": str(sid),
-                    "title": final_title_text,
-                    "timestamp": last.timestamp,
-                    "lastMessage": final_last_message,
-                }
-            )
-
-        summaries.sort(key=lambda s: parse_ts(s["timestamp"]), reverse=True)
-        return summaries
+            rows = conn.execute(query, params).fetchall()
+        return sessions_page_result(rows, limit)
 
 
 _message_repository: Optional[MessageRepository] = None
@@ -1,75 +1,348 @@
-from typing import List, Dict, cast, Any, AsyncGenerator, Optional
+from typing import Any, List, Dict, AsyncGenerator, Optional
 from app.models.message import Message
 import asyncio
+import os
+import random
+import time
 from llama_cpp import Llama
-from llama_cpp.llama_cpp import llama_supports_gpu_offload
 from concurrent.futures import ThreadPoolExecutor
 from functools import partial
-from app.services.file_service import get_results_from_vector_db
+from app.services.file_service import cached_first_page, fetch_first_page_async, retrieve_within_budget_async
 from chromadb import QueryResult
-from app.core.config import CONTEXT_LIMIT, MAX_OUTPUT_TOKENS, MODEL_ABSOLUTE_PATH, N_GPU_LAYERS, LLAMA_VERBOSE, SOURCES_VECTOR_DB_N_RESULTS, runtime_config
+from app.services.generation_service import AdmissionTicket, GenerationAdmission, GenerationQueueFullError, stream_token_batches_from_worker
+from app.services.compaction_service import build_summary_messages, compact_turns, turns_to_fold
+from app.services.kv_cache import get_session_state_cache, stream_with_session_state
+from app.services.llm_worker import load_llm
+from app.services.model_registry import ModelRegistry, model_paths_from_config
+from app.services.worker_pool import WorkerPool
+from app.services.conversation_cache import get_conversation_cache
+from app.repositories import get_async_message_repository
+from app.services.token_service import count_tokens_cached, tokenizer_signature
+from app.core.config import CONTEXT_LIMIT, MAX_OUTPUT_TOKENS, MODEL_ABSOLUTE_PATH, SOURCES_VECTOR_DB_N_RESULTS, GENERATION_QUEUE_MAX_DEPTH, GENERATION_TOKEN_BUFFER, KV_CACHE_ENABLED, KV_CACHE_RAM_BYTES, runtime_config
+from app.core.config import (HISTORY_MAX_TOKENS, COMPACTION_ENABLED, COMPACTION_TRIGGER_TOKENS, COMPACTION_KEEP_RECENT_TOKENS,
+                             COMPACTION_SUMMARY_MAX_TOKENS, PROMPT_DEBUG_SAMPLE_RATE)
+from app.core.config import MODEL_WAIT_TIMEOUT_SECONDS, LLM_WORKERS, LLM_THREADS
+from app.core.config import MODEL_PATHS, DEFAULT_MODEL, MODEL_RAM_BUDGET_BYTES, MODEL_SESSION_CHOICES
 from uuid import UUID 
 
 
-# Initialize with GPU support: n_gpu_la$env:CMAKE_ARGS="-DLLAMA_CUDA=on"; pip install llama-cpp-python --upgrade --force-reinstall --no-cache-diryers offloads layers to GPU
-# -1 offloads all layers; adjust based on your VRAM and model size
-llm = Llama(
-    model_path=MODEL_ABSOLUTE_PATH, # type: ignore
-    n_ctx=CONTEXT_LIMIT,
-    n_gpu_layers=N_GPU_LAYERS,  # Enable GPU acceleration
-    verbose=LLAMA_VERBOSE  # Set True for debugging
+# Chat template tokens around each message and between joined documents
+MESSAGE_TOKEN_OVERHEAD = 8
+DOCUMENT_SEPARATOR_TOKENS = 1
+CONTEXT_HEADER = f"{SOURCES_VECTOR_DB_N_RESULTS} The most relevant paragraphs context from database:\n\n"
+
+def on_model_evicted(name: str, model: Any) -> None:
+    """Runs on the load executor when the registry evicts a model to make room for another."""
+    if worker_pool is not None:
+        # Waits for the streams pinning it, then frees it in every worker process
+        worker_pool.unload(model)
+        return
+    # An evicted model no longer holds any session's KV state
+    cache = get_session_state_cache()
+    if (cache.current_session_id or "").startswith(f"{name}/"):
+        cache.current_session_id = None
+
+
+if LLM_WORKERS > 0:
+    # One model replica per worker process, each with its share of the CPU threads
+    worker_pool: Optional[WorkerPool] = WorkerPool(
+        LLM_WORKERS, LLM_THREADS or max(1, (os.cpu_count() or 1) // LLM_WORKERS), KV_CACHE_RAM_BYTES // LLM_WORKERS)
+    executor = ThreadPoolExecutor(max_workers=LLM_WORKERS) # Threads relaying each replica's stream
+    load_executor = ThreadPoolExecutor(max_workers=1)
+    model_lock: asyncio.Lock | asyncio.Semaphore = asyncio.Semaphore(LLM_WORKERS)
+else:
+    worker_pool = None
+    executor = ThreadPoolExecutor(max_workers=1) # 1 thread worker for LLM interactions
+    load_executor = executor # Models load on the thread that runs them
+    model_lock = asyncio.Lock()
+# Models load in the background so the rest of the API is usable right away
+model_registry = ModelRegistry(
+    model_paths_from_config(MODEL_ABSOLUTE_PATH, MODEL_PATHS),
+    DEFAULT_MODEL or None,
+    MODEL_RAM_BUDGET_BYTES,
+    worker_pool.load if worker_pool is not None else partial(load_llm, n_threads=LLM_THREADS or None),
+    session_capacity=MODEL_SESSION_CHOICES,
+    on_evict=on_model_evicted,
 )
-print(f"Library compiled with GPU support: {llama_supports_gpu_offload()}")
-executor = ThreadPoolExecutor(max_workers=1) # 1 thread worker for LLM interactions
-model_lock = asyncio.Lock()
+generation_admission = GenerationAdmission(model_lock, max_depth=GENERATION_QUEUE_MAX_DEPTH, slots=max(1, LLM_WORKERS))
+# Sessions with a summary refresh scheduled or running
+_compaction_tasks: Dict[str, asyncio.Task] = {}
+
+
+async def wait_for_model(model: Optional[str] = None, timeout: float = MODEL_WAIT_TIMEOUT_SECONDS) -> Any:
+    """
+    The named (default: default) model, a Llama or with worker processes a ReplicaModel;
+    starts loading it if needed. Raises ModelNotReadyError after timeout.
+    """
+    return await model_registry.acquire(model or model_registry.default, load_executor, timeout)
+
+
+async def pin_model(model: str) -> Any:
+    """
+    wait_for_model, and with worker processes keep the replicas from dropping the model
+    until release_model(), so the stream finishes on it even if it is evicted meanwhile.
+    """
+    llm = await wait_for_model(model)
+    # An eviction that started after the wait refuses the pin: wait for the reload instead
+    while worker_pool is not None and not worker_pool.pin(llm):
+        llm = await wait_for_model(model)
+    return llm
+
+
+def release_model(llm: Any) -> None:
+    if worker_pool is not None:
+        worker_pool.unpin(llm)
+
+
+def session_state_key(model: str, session_id: str) -> str:
+    """KV states are only valid for the model that produced them."""
+    return f"{model}/{session_id}"
 
 
 async def handle_query_stream(
-        messages: List[Message],
+        turns: List[Dict[str, str]],
+        selected_file_ids: Optional[List[UUID]] = None,
+        max_tokens: int = MAX_OUTPUT_TOKENS,
+        ticket: Optional[AdmissionTicket] = None,
+        session_id: Optional[str] = None,
+        trace: Optional[Dict[str, Any]] = None,
+        model: Optional[str] = None) -> AsyncGenerator[str, None]:
+    """Token-by-token handle_query_batches."""
+    async for batch in handle_query_batches(turns, selected_file_ids, max_tokens, ticket, session_id, trace, model=model):
+        for token in batch:
+            yield token
+
+
+async def handle_query_batches(
+        turns: List[Dict[str, str]],
         selected_file_ids: Optional[List[UUID]] = None,
-        max_tokens: int = MAX_OUTPUT_TOKENS) -> AsyncGenerator[str, None]:
-    
-    llm_formatted_messages = get_llm_formatted_messages(messages)
-
-    knowledge_base_the_most_relevant = get_results_from_vector_db(
-        last_user_message=messages[-1],
-        selected_file_ids=selected_file_ids)
-    
+        max_tokens: int = MAX_OUTPUT_TOKENS,
+        ticket: Optional[AdmissionTicket] = None,
+        session_id: Optional[str] = None,
+        trace: Optional[Dict[str, Any]] = None,
+        coalesce_seconds: float = 0.0,
+        coalesce_bytes: int = 0,
+        model: Optional[str] = None) -> AsyncGenerator[List[str], None]:
+    """
+    Streams the model answer for a conversation given as formatted turns
+    (see format_turns), the last one being the new user message. Pass a ticket reserved from
+    generation_admission to queue behind other generations; without one a ticket
+    is reserved here and GenerationQueueFullError may be raised.
+    With a session_id the session's KV state is restored so only the new turn is prefilled.
+    A trace dict, if given, is filled with retrieval stats, the prompt size and
+    queue wait / retrieval / prefill times for the caller to report.
+    Tokens are yielded in batches coalesced over coalesce_seconds / coalesce_bytes.
+    The model is the named one, else the session's last choice, else the registry default;
+    it is picked once, so a stream finishes on it even if the default is switched meanwhile.
+    Waits up to MODEL_WAIT_TIMEOUT_SECONDS for a loading model, then raises ModelNotReadyError.
+    """
+    if trace is None:
+        trace = {}
+    model = model_registry.resolve(model, session_id)
+    trace["model"] = model
+    # Raises ModelNotReadyError before a queue slot is taken
+    llm = await pin_model(model)
+    if ticket is None:
+        try:
+            ticket = generation_admission.reserve()
+        except GenerationQueueFullError:
+            release_model(llm)
+            raise
+    enqueued = time.perf_counter()
+
+    # History formatting and budget-aware retrieval run on worker threads while
+    # this request waits for the model slot.
+    prompt_task = asyncio.create_task(prepare_prompt(turns, selected_file_ids, max_tokens, trace, session_id, model))
+
+    try:
+        async with generation_admission.hold(ticket):
+            trace["queue_wait_s"] = time.perf_counter() - enqueued
+            prompt_messages = await prompt_task
+
+            session_key = session_state_key(model, session_id) if KV_CACHE_ENABLED and session_id else None
+            if worker_pool is not None:
+                # A free replica streams it, preferably the one holding the session's KV state
+                create_stream = partial(worker_pool.stream, llm.model_path, prompt_messages, max_tokens, session_key)
+            else:
+                create_stream = partial(
+                    llm.create_chat_completion,
+                    messages=prompt_messages, # type: ignore[arg-type],
+                    max_tokens=max_tokens,
+                    stream=True
+                )
+                if session_key:
+                    create_stream = partial(stream_with_session_state, llm, session_key, create_stream)
+
+            # Tokens are pulled on the executor thread; the event loop only awaits the queue
+            generation_started = time.perf_counter()
+            async for batch in stream_token_batches_from_worker(
+                    executor, create_stream, GENERATION_TOKEN_BUFFER, coalesce_seconds, coalesce_bytes):
+                # Prompt evaluation dominates the wait for the first token
+                trace.setdefault("prefill_s", time.perf_counter() - generation_started)
+                yield batch
+    finally:
+        prompt_task.cancel()
+        ticket.release()
+        release_model(llm)
+
+
+async def prepare_prompt(
+        turns: List[Dict[str, str]],
+        selected_file_ids: Optional[List[UUID]],
+        max_tokens: int,
+        trace: Optional[Dict[str, Any]] = None,
+        session_id: Optional[str] = None,
+        model: Optional[str] = None) -> List[Dict[str, str]]:
+    """
+    Formats the history, with turns covered by the session's rolling summary replaced
+    by the summary, while the query is embedded and its first page of chunks ranked
+    (unless that page is cached). Then retrieves only as many chunks as the remaining
+    token budget can hold, and packs both into the prompt.
+    Tokens are counted with the vocabulary of the model (default: the registry default).
+    """
+    model_path = model_registry.path(model or model_registry.default)
+    query_text = turns[-1]["content"]
+    retrieval_started = time.perf_counter()
+    first_page = cached_first_page(query_text, selected_file_ids)
+    if first_page is not None or not selected_file_ids:
+        llm_formatted_messages = await format_history(turns, max_tokens, session_id, model_path)
+    else:
+        llm_formatted_messages, first_page = await asyncio.gather(
+            format_history(turns, max_tokens, session_id, model_path),
+            fetch_first_page_async(query_text, selected_file_ids))
+    knowledge_base_the_most_relevant, retrieval_stats = await retrieve_within_budget_async(
+        query_text,
+        selected_file_ids,
+        token_budget=context_token_budget(llm_formatted_messages, max_tokens, model_path),
+        per_chunk_overhead=DOCUMENT_SEPARATOR_TOKENS,
+        first_page=first_page)
+    if trace is None:
+        trace = {}
+    trace["retrieval_s"] = time.perf_counter() - retrieval_started
+    trace["retrieval"] = retrieval_stats
+    trace["candidates"] = retrieval_stats.get("fetched", 0)
+
     prompt_messages = cut_into_context_window(
         llm_formatted_messages,
         knowledge_base_the_most_relevant,
-        max_tokens)
-    
-    loop = asyncio.get_running_loop()
-    
-    sync_func = partial(
-        llm.create_chat_completion,
-        messages=prompt_messages, # type: ignore[arg-type],
-        max_tokens=max_tokens,
-        stream=True
-    )
-    
-    stream_iterator = await loop.run_in_executor(executor, sync_func)
-
-    # Yield chunks as they arrive
-    for chunk in stream_iterator:
-        chunk_dict = cast(Dict[str, Any], chunk)
-        content = chunk_dict['choices'][0].get('delta', {}).get('content')
-        if content:
-            yield content
-            await asyncio.sleep(0)
-
-
-def count_tokens(text: str) -> int:
-    # Rough estimate: 1 token ~= 4 characters for English
-    # can also use len(llm.tokenize("test".encode('utf-8'))) for more accuracy
-    return len(text) // 4
+        max_tokens,
+        trace,
+        model_path)
+    log_prompt_sample(prompt_messages, trace)
+    return prompt_messages
+
+
+async def format_history(turns: List[Dict[str, str]], max_tokens: int, session_id: Optional[str],
+                         model_path: Optional[str] = MODEL_ABSOLUTE_PATH) -> List[Dict[str, str]]:
+    if COMPACTION_ENABLED and session_id:
+        turns = compact_turns(turns, await get_async_message_repository().get_conversation_summary(session_id))
+    return await asyncio.to_thread(prepare_llm_formatted_messages, turns, max_tokens, model_path)
+
+
+def log_prompt_sample(prompt_messages: List[Dict[str, str]], trace: Dict[str, Any]) -> None:
+    """Prints a PROMPT_DEBUG_SAMPLE_RATE fraction of full prompts; off by default."""
+    if PROMPT_DEBUG_SAMPLE_RATE > 0 and random.random() < PROMPT_DEBUG_SAMPLE_RATE:
+        print(f"Prompt sample ({trace.get('prompt_tokens')} tokens, retrieval {trace.get('retrieval')}): {prompt_messages}")
+
+
+async def refresh_conversation_summary(session_id: str) -> None:
+    """
+    Folds the oldest turns outside the recent window into the session's rolling
+    summary once the unsummarized history passes COMPACTION_TRIGGER_TOKENS.
+    Waits for the model slot like a chat does; skipped when the queue is full.
+    """
+    model = model_registry.resolve(session_id=session_id)
+    llm = model_registry.loaded(model)
+    if llm is None or (worker_pool is not None and not worker_pool.pin(llm)):
+        return
+    try:
+        await fold_into_summary(session_id, llm, model_registry.path(model))
+    finally:
+        release_model(llm)
+
+
+async def fold_into_summary(session_id: str, llm: Any, model_path: Optional[str] = MODEL_ABSOLUTE_PATH) -> None:
+    repo = get_async_message_repository()
+    turns = await load_session_turns(session_id)
+    summary, covered_turns = await repo.get_conversation_summary(session_id) or ("", 0)
+    if covered_turns >= len(turns):
+        # History shrank below what the summary covers: start over
+        summary, covered_turns = "", 0
+
+    turn_tokens = await asyncio.to_thread(
+        lambda: [count_tokens_cached(turn["content"], model_path) + MESSAGE_TOKEN_OVERHEAD for turn in turns])
+    end = turns_to_fold(turn_tokens, covered_turns, COMPACTION_TRIGGER_TOKENS, COMPACTION_KEEP_RECENT_TOKENS,
+                        max_fold_tokens=CONTEXT_LIMIT - 4 * COMPACTION_SUMMARY_MAX_TOKENS)
+    if end is None:
+        return
+
+    try:
+        ticket = generation_admission.reserve()
+    except GenerationQueueFullError:
+        return
+    async with generation_admission.hold(ticket):
+        summarize = (partial(worker_pool.complete, llm.model_path, max_tokens=COMPACTION_SUMMARY_MAX_TOKENS)
+                     if worker_pool is not None else partial(summarize_on_model, llm))
+        new_summary = await asyncio.get_running_loop().run_in_executor(
+            executor, summarize, build_summary_messages(summary, turns[covered_turns:end]))
+    if new_summary:
+        await repo.save_conversation_summary(session_id, new_summary, end)
+
+
+def summarize_on_model(llm: Llama, messages: List[Dict[str, str]]) -> str:
+    """Runs on the generation thread."""
+    try:
+        completion = llm.create_chat_completion(
+            messages=messages, # type: ignore[arg-type]
+            max_tokens=COMPACTION_SUMMARY_MAX_TOKENS,
+            stream=False)
+    finally:
+        # The model state no longer matches any session's saved KV state
+        get_session_state_cache().current_session_id = None
+    return (completion["choices"][0]["message"].get("content") or "").strip() # type: ignore[index]
+
+
+def schedule_conversation_compaction(session_id: str) -> None:
+    """Refresh the session's summary in the background, between turns."""
+    if not COMPACTION_ENABLED or session_id in _compaction_tasks:
+        return
+
+    async def run() -> None:
+        try:
+            await refresh_conversation_summary(session_id)
+        except Exception as e:
+            print(f"Could not compact conversation {session_id}: {e}")
+
+    task = asyncio.create_task(run())
+    _compaction_tasks[session_id] = task
+    task.add_done_callback(lambda _: _compaction_tasks.pop(session_id, None))
+
+
+def context_token_budget(formatted_messages : List[Dict[str, str]], max_tokens: int,
+                         model_path: Optional[str] = MODEL_ABSOLUTE_PATH) -> int:
+    """
+    Tokens left for retrieved chunks after the response reserve, the conversation
+    and the context message header.
+    """
+    used = sum(count_tokens_cached(msg["content"], model_path) + MESSAGE_TOKEN_OVERHEAD for msg in formatted_messages)
+    used += count_tokens_cached(CONTEXT_HEADER, model_path) + MESSAGE_TOKEN_OVERHEAD
+    return max(CONTEXT_LIMIT - max_tokens - used, 0)
+
 
 def cut_into_context_window(
         formatted_messages : List[Dict[str, str]],
         knowledge_base_the_most_relevant : QueryResult | None,
-        max_tokens: int) -> List[Dict[str, str]]:
-    
+        max_tokens: int,
+        trace: Optional[Dict[str, Any]] = None,
+        model_path: Optional[str] = MODEL_ABSOLUTE_PATH) -> List[Dict[str, str]]:
+    """
+    Packs the conversation plus as many retrieved chunks as fit in CONTEXT_LIMIT.
+    Message counts come from an LRU-cached tokenizer call and chunk counts from
+    the n_tokens metadata written at ingest, so no chunk is tokenized here, unless
+    model_path has another vocabulary than the primary model that counted them.
+    The prompt's token count is stored in trace["prompt_tokens"].
+    """
+    stored_counts_apply = tokenizer_signature(model_path) == tokenizer_signature()
     # Reserve space for the response so the model doesn't cut off mid-sentence
     SAFE_LIMIT = CONTEXT_LIMIT - max_tokens
     current_tokens = 0
@@ -80,54 +353,104 @@ def cut_into_context_window(
     mandatory_messages = [ m for m in formatted_messages ]
 
     for msg in mandatory_messages:
-        tokens = count_tokens(msg["content"])
+        tokens = count_tokens_cached(msg["content"], model_path) + MESSAGE_TOKEN_OVERHEAD
         final_context.append(msg)
         current_tokens += tokens
 
     # 2. Knowledge Base (RAG) results
-    # Flatten documents from Chroma QueryResult
+    # Flatten documents and their metadata from Chroma QueryResult
     all_docs = []
+    all_metadatas = []
 
     if knowledge_base_the_most_relevant is not None:
         # Check if 'documents' key exists and isn't empty
         docs = knowledge_base_the_most_relevant.get("documents")
         if docs and len(docs) > 0:
             all_docs = docs[0]
+        metadatas = knowledge_base_the_most_relevant.get("metadatas")
+        if metadatas and len(metadatas) > 0:
+            all_metadatas = metadatas[0]
+
+    current_tokens += count_tokens_cached(CONTEXT_HEADER, model_path) + MESSAGE_TOKEN_OVERHEAD
 
     valid_docs = []
-    for doc_text in all_docs:
-        tokens = count_tokens(doc_text)
-        remaining_tokens = SAFE_LIMIT - current_tokens
-        
-        if tokens <= remaining_tokens:
-            # Entire document fits
+    for idx, doc_text in enumerate(all_docs):
+        metadata = all_metadatas[idx] if idx < len(all_metadatas) and all_metadatas[idx] else {}
+        n_tokens = metadata.get("n_tokens")
+        # Chunks ingested before token counts were stored fall back to the cached tokenizer
+        tokens = (int(n_tokens) if n_tokens is not None and stored_counts_apply
+                  else count_tokens_cached(doc_text, model_path))
+        tokens += DOCUMENT_SEPARATOR_TOKENS
+
+        # Greedily pack whole chunks in relevance order; skip the ones that don't fit
+        if tokens <= SAFE_LIMIT - current_tokens:
             valid_docs.append(doc_text)
             current_tokens += tokens
-        elif remaining_tokens > 0:
-            # Partial document fits 
-            max_chars = remaining_tokens * 4  # Approximate chars from tokens
-            truncated_doc = doc_text[:max_chars] + "... [truncated]"
-            valid_docs.append(truncated_doc)
-            current_tokens += remaining_tokens
-            break
-        else:
-            break
-    
+
     if valid_docs:
         context_str = "\n\n".join(valid_docs)
-        final_context.insert(0, {
+        # Context goes right before the latest user message so the system prompt
+        # and earlier turns stay a stable, KV-cacheable prompt prefix
+        final_context.insert(max(len(final_context) - 1, 0), {
             "role": "system", 
-            "content": f"{SOURCES_VECTOR_DB_N_RESULTS} The most relevant paragraphs context from database:\n\n{context_str}"
+            "content": f"{CONTEXT_HEADER}{context_str}"
         })
 
-    print(f"{final_context=}")
+    if trace is not None:
+        trace["prompt_tokens"] = current_tokens
     return final_context
 
 
-def get_llm_formatted_messages(messages : List[Message]) -> List[Dict[str, str]]:
-    llm_formatted_messages = []
-    for m in messages:
-        llm_formatted_messages.append({"role": m.role.value, "content": m.text})
+def prepare_llm_formatted_messages(turns : List[Dict[str, str]], max_tokens: int = MAX_OUTPUT_TOKENS,
+                                   model_path: Optional[str] = MODEL_ABSOLUTE_PATH) -> List[Dict[str, str]]:
+    """
+    Adds the system prompt, fits the history into its token budget and warms the
+    token count cache, so packing the context window afterwards does no
+    tokenization on the event loop.
+    """
+    return fit_history(get_llm_formatted_messages(turns), max_tokens, model_path)
+
+
+def fit_history(formatted_messages : List[Dict[str, str]], max_tokens: int,
+                model_path: Optional[str] = MODEL_ABSOLUTE_PATH) -> List[Dict[str, str]]:
+    """
+    Keeps the leading system turns (prompt and conversation summary) and the latest
+    message, then as many of the newest earlier turns as fit HISTORY_MAX_TOKENS.
+    Turns only drop out while a long session waits for its summary to catch up.
+    """
+    budget = min(HISTORY_MAX_TOKENS, CONTEXT_LIMIT - max_tokens)
+    n_head = 0
+    while n_head < len(formatted_messages) - 1 and formatted_messages[n_head]["role"] == "system":
+        n_head += 1
+    head, middle, last = formatted_messages[:n_head], formatted_messages[n_head:-1], formatted_messages[-1:]
+
+    used = sum(count_tokens_cached(msg["content"], model_path) + MESSAGE_TOKEN_OVERHEAD for msg in head + last)
+    kept: List[Dict[str, str]] = []
+    for msg in reversed(middle):
+        used += count_tokens_cached(msg["content"], model_path) + MESSAGE_TOKEN_OVERHEAD
+        if used > budget:
+            break
+        kept.append(msg)
+    return [*head, *reversed(kept), *last]
+
+
+def get_llm_formatted_messages(turns : List[Dict[str, str]]) -> List[Dict[str, str]]:
+    # The system prompt is added per request so prompt changes apply to cached sessions too
+    return [{"role": "system", "content": runtime_config.role_llm_prompt}, *turns]
+
+
+def format_turns(messages : List[Message]) -> List[Dict[str, str]]:
+    return [{"role": m.role.value, "content": m.text} for m in messages]
+
 
-    llm_formatted_messages.append({"role": "system", "content": runtime_config.role_llm_prompt})
-    return llm_formatted_messages
\ No newline at end of file
+async def load_session_turns(session_id: str) -> List[Dict[str, str]]:
+    """
+    The session's formatted history: from the conversation cache, or loaded
+    from the message database once and cached for the following turns.
+    """
+    cache = get_conversation_cache()
+    turns = cache.get(session_id)
+    if turns is None:
+        turns = format_turns(await get_async_message_repository().get_by_session(session_id))
+        cache.put(session_id, turns)
+    return turns
\ No newline at end of file
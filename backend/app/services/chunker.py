@@ -0,0 +1,223 @@
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Type
+import re
+from app.core.config import CHUNK_TARGET_TOKENS, CHUNK_MAX_TOKENS, CHUNK_OVERLAP_TOKENS, CHUNKER_STRATEGY
+from app.services.token_service import count_tokens, tokenizer_signature
+
+# Sentence ends: terminal punctuation followed by whitespace, or a blank line.
+# Single line breaks are treated as wrapping, as in extracted PDF text.
+_SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?])\s+|\n\s*\n")
+
+
+@dataclass
+class TextBlock:
+    """A paragraph, heading, page or table extracted from a source, with its offset in the extracted text."""
+    text: str
+    offset: int
+    page: Optional[int] = None
+    is_heading: bool = False
+
+
+@dataclass
+class Chunk:
+    text: str
+    n_tokens: int
+    start_offset: int
+    end_offset: int
+    page_start: Optional[int] = None
+    page_end: Optional[int] = None
+    heading: Optional[str] = None
+
+    def metadata(self) -> Dict[str, str | int]:
+        metadata: Dict[str, str | int] = {
+            "n_tokens": self.n_tokens,
+            "start_offset": self.start_offset,
+            "end_offset": self.end_offset,
+        }
+        if self.page_start is not None:
+            metadata["page_start"] = self.page_start
+            metadata["page_end"] = self.page_end if self.page_end is not None else self.page_start
+        if self.heading:
+            metadata["heading"] = self.heading
+        return metadata
+
+
+@dataclass
+class _Piece:
+    text: str
+    n_tokens: int
+    start: int
+    end: int
+    page: Optional[int]
+    joiner: str  # Text placed before this piece when it is not first in a chunk
+    is_heading: bool = False
+
+
+class Chunker(ABC):
+    """Turns a stream of TextBlocks into Chunks; implementations must not buffer the whole source."""
+
+    @abstractmethod
+    def chunk(self, blocks: Iterable[TextBlock]) -> Iterator[Chunk]:
+        ...
+
+
+class BlockChunker(Chunker):
+    """One chunk per extracted block: the original paragraph/page splitting."""
+
+    def __init__(self, count: Callable[[str], int] = count_tokens, **_):
+        self._count = count
+
+    def chunk(self, blocks: Iterable[TextBlock]) -> Iterator[Chunk]:
+        for block in blocks:
+            text = block.text.strip()
+            if text:
+                yield Chunk(text, self._count(text), block.offset, block.offset + len(block.text),
+                            block.page, block.page)
+
+
+class TokenChunker(Chunker):
+    """
+    Packs sentences into chunks of about target_tokens, never above max_tokens.
+    Headings always start a new chunk and label the chunks under them; consecutive
+    chunks within a section share up to overlap_tokens of trailing sentences.
+    """
+
+    def __init__(self,
+                 target_tokens: int = CHUNK_TARGET_TOKENS,
+                 max_tokens: int = CHUNK_MAX_TOKENS,
+                 overlap_tokens: int = CHUNK_OVERLAP_TOKENS,
+                 count: Callable[[str], int] = count_tokens):
+        self._max_tokens = max(1, max_tokens)
+        self._target_tokens = max(1, min(target_tokens, self._max_tokens))
+        self._overlap_tokens = max(0, min(overlap_tokens, self._target_tokens // 2))
+        self._count = count
+
+    def chunk(self, blocks: Iterable[TextBlock]) -> Iterator[Chunk]:
+        buffer: List[_Piece] = []
+        heading: Optional[str] = None
+
+        for block in blocks:
+            if block.is_heading:
+                if self._has_body(buffer):
+                    yield self._build(buffer, heading)
+                text = block.text.strip()
+                start = block.offset + len(block.text) - len(block.text.lstrip())
+                heading = text.lstrip("#").strip() or heading
+                buffer = [_Piece(text, self._count(text), start, start + len(text), block.page, "\n\n", True)]
+                continue
+
+            first_in_block = True
+            for piece in self._split_block(block):
+                if first_in_block:
+                    piece.joiner = "\n\n"
+                first_in_block = False
+                if self._has_body(buffer) and self._size(buffer) + piece.n_tokens > self._target_tokens:
+                    yield self._build(buffer, heading)
+                    buffer = self._overlap(buffer)
+                    # Overlap must never push a chunk past the hard maximum
+                    while buffer and self._size(buffer) + piece.n_tokens > self._max_tokens:
+                        buffer.pop(0)
+                buffer.append(piece)
+
+        if self._has_body(buffer):
+            yield self._build(buffer, heading)
+
+    def _split_block(self, block: TextBlock) -> Iterator[_Piece]:
+        """Sentences of a block with absolute offsets; oversized sentences are split by words."""
+        position = 0
+        boundaries = [(m.start(), m.end()) for m in _SENTENCE_BOUNDARY.finditer(block.text)]
+        for boundary_start, boundary_end in boundaries + [(len(block.text), len(block.text))]:
+            sentence = block.text[position:boundary_start]
+            start = block.offset + position
+            position = boundary_end
+            stripped = sentence.strip()
+            if not stripped:
+                continue
+            start += len(sentence) - len(sentence.lstrip())
+            n_tokens = self._count(stripped)
+            if n_tokens <= self._max_tokens:
+                yield _Piece(stripped, n_tokens, start, start + len(stripped), block.page, " ")
+            else:
+                yield from self._split_long(stripped, n_tokens, start, block.page)
+
+    def _split_long(self, text: str, n_tokens: int, start: int, page: Optional[int]) -> Iterator[_Piece]:
+        words = list(re.finditer(r"\S+", text))
+        # Words per window from the sentence's token density, shrunk until the window fits
+        window = max(1, int(len(words) * self._target_tokens / max(n_tokens, 1)))
+        i = 0
+        while i < len(words):
+            size = window
+            while True:
+                segment = text[words[i].start():words[min(i + size, len(words)) - 1].end()]
+                segment_tokens = self._count(segment)
+                if segment_tokens <= self._max_tokens or size == 1:
+                    break
+                size = max(1, size // 2)
+            segment_start = start + words[i].start()
+            if segment_tokens <= self._max_tokens:
+                yield _Piece(segment, segment_tokens, segment_start, segment_start + len(segment), page, " ")
+            else:
+                # A single "word" over the limit (base64, minified code): cut by characters
+                step = max(1, len(segment) * self._max_tokens // segment_tokens)
+                for char_start in range(0, len(segment), step):
+                    part = segment[char_start:char_start + step]
+                    yield _Piece(part, self._count(part), segment_start + char_start,
+                                 segment_start + char_start + len(part), page, "")
+            i += size
+
+    def _overlap(self, buffer: List[_Piece]) -> List[_Piece]:
+        kept: List[_Piece] = []
+        total = 0
+        for piece in reversed(buffer):
+            if total + piece.n_tokens > self._overlap_tokens:
+                break
+            kept.insert(0, piece)
+            total += piece.n_tokens
+        return kept
+
+    @staticmethod
+    def _size(buffer: List[_Piece]) -> int:
+        return sum(piece.n_tokens for piece in buffer)
+
+    @staticmethod
+    def _has_body(buffer: List[_Piece]) -> bool:
+        # A buffer holding only a heading is not emitted on its own
+        return any(not piece.is_heading for piece in buffer)
+
+    def _build(self, buffer: List[_Piece], heading: Optional[str]) -> Chunk:
+        text = buffer[0].text + "".join(piece.joiner + piece.text for piece in buffer[1:])
+        pages = [piece.page for piece in buffer if piece.page is not None]
+        return Chunk(
+            text=text,
+            n_tokens=self._count(text),
+            start_offset=buffer[0].start,
+            end_offset=buffer[-1].end,
+            page_start=min(pages) if pages else None,
+            page_end=max(pages) if pages else None,
+            heading=heading,
+        )
+
+
+CHUNKERS: Dict[str, Type[Chunker]] = {
+    "token": TokenChunker,
+    "block": BlockChunker,
+}
+
+
+def get_chunker(strategy: str = CHUNKER_STRATEGY) -> Chunker:
+    """Instantiate the configured chunking strategy ("token" or "block")."""
+    chunker_class = CHUNKERS.get(strategy)
+    if chunker_class is None:
+        raise ValueError(f"Unknown chunker strategy '{strategy}'. Available: {sorted(CHUNKERS)}")
+    return chunker_class()
+
+
+def chunker_signature() -> str:
+    """
+    Identifies the chunking settings and the tokenizer behind the stored n_tokens,
+    so sources chunked or counted differently get re-ingested.
+    """
+    if CHUNKER_STRATEGY == "block":
+        return f"block|{tokenizer_signature()}"
+    return f"{CHUNKER_STRATEGY}:{CHUNK_TARGET_TOKENS}:{CHUNK_MAX_TOKENS}:{CHUNK_OVERLAP_TOKENS}|{tokenizer_signature()}"
@@ -0,0 +1,63 @@
+from typing import Dict, List, Optional, Tuple
+
+SUMMARY_HEADER = "Summary of the earlier conversation:\n"
+SUMMARIZE_INSTRUCTION = (
+    "You maintain the running summary of a conversation between a user and an assistant. "
+    "Merge the new turns into the current summary. Keep facts, decisions, names, numbers "
+    "and open questions that later answers may depend on; drop greetings and repetition. "
+    "Reply with the updated summary only."
+)
+# Chars kept per folded turn, so one huge message cannot overflow the summarization prompt
+_MAX_TURN_CHARS = 16000
+
+
+def compact_turns(turns: List[Dict[str, str]], summary: Optional[Tuple[str, int]]) -> List[Dict[str, str]]:
+    """
+    Replaces the turns a summary covers with one system turn holding the summary.
+    A summary covering more turns than the history has (history edited or sent
+    by a client) is ignored.
+    """
+    if not summary:
+        return turns
+    text, covered_turns = summary
+    if not text or covered_turns <= 0 or covered_turns >= len(turns):
+        return turns
+    return [{"role": "system", "content": f"{SUMMARY_HEADER}{text}"}, *turns[covered_turns:]]
+
+
+def turns_to_fold(
+        turn_tokens: List[int],
+        covered_turns: int,
+        trigger_tokens: int,
+        keep_recent_tokens: int,
+        max_fold_tokens: int) -> Optional[int]:
+    """
+    Given the token count of every turn, returns the end index of the turns the next
+    summary should cover, or None while the history after the summary stays below
+    trigger_tokens. The newest keep_recent_tokens (and at least the last turn) are
+    never folded, and one summarization folds at most max_fold_tokens of turns.
+    """
+    unsummarized = turn_tokens[covered_turns:]
+    if sum(unsummarized) <= trigger_tokens:
+        return None
+
+    end, kept = len(turn_tokens), 0
+    while end > covered_turns and kept + turn_tokens[end - 1] <= keep_recent_tokens:
+        end -= 1
+        kept += turn_tokens[end]
+    end = min(end, len(turn_tokens) - 1)
+
+    stop, folded = covered_turns, 0
+    while stop < end and (stop == covered_turns or folded + turn_tokens[stop] <= max_fold_tokens):
+        folded += turn_tokens[stop]
+        stop += 1
+    return stop if stop > covered_turns else None
+
+
+def build_summary_messages(previous_summary: str, turns: List[Dict[str, str]]) -> List[Dict[str, str]]:
+    """Chat messages asking the model to merge turns into the previous summary."""
+    transcript = "\n\n".join(f"{turn['role']}: {turn['content'][:_MAX_TURN_CHARS]}" for turn in turns)
+    return [
+        {"role": "system", "content": SUMMARIZE_INSTRUCTION},
+        {"role": "user", "content": f"Current summary:\n{previous_summary or '(none)'}\n\nNew turns:\n{transcript}"},
+    ]
@@ -0,0 +1,73 @@
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+import threading
+from app.core.config import CONVERSATION_CACHE_SIZE
+
+FormattedTurn = Dict[str, str]
+
+
+class ConversationCache:
+    """
+    LRU of per-session conversation history, already formatted as chat turns
+    ({"role", "content"}, without the system prompt). Lets a client send only the
+    new message: the history comes from here and falls back to the message database.
+    """
+
+    def __init__(self, max_sessions: int):
+        self._max_sessions = max_sessions
+        self._sessions: "OrderedDict[str, List[FormattedTurn]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, session_id: str) -> List[FormattedTurn] | None:
+        """A copy of the session's turns, or None when the session is not cached."""
+        with self._lock:
+            turns = self._sessions.get(session_id)
+            if turns is None:
+                self.misses += 1
+                return None
+            self._sessions.move_to_end(session_id)
+            self.hits += 1
+            return list(turns)
+
+    def put(self, session_id: str, turns: List[FormattedTurn]) -> None:
+        if self._max_sessions <= 0:
+            return
+        with self._lock:
+            self._sessions[session_id] = list(turns)
+            self._sessions.move_to_end(session_id)
+            while len(self._sessions) > self._max_sessions:
+                self._sessions.popitem(last=False)
+
+    def append(self, session_id: str, turn: FormattedTurn) -> None:
+        """Add a turn to a cached session; uncached sessions are loaded in full on next use."""
+        with self._lock:
+            turns = self._sessions.get(session_id)
+            if turns is not None:
+                turns.append(turn)
+
+    def discard(self, session_id: str) -> None:
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "sessions": len(self._sessions),
+            "max_sessions": self._max_sessions,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+_conversation_cache: Optional[ConversationCache] = None
+
+
+def get_conversation_cache() -> ConversationCache:
+    """Get or create the singleton ConversationCache instance."""
+    global _conversation_cache
+    if _conversation_cache is None:
+        _conversation_cache = ConversationCache(CONVERSATION_CACHE_SIZE)
+    return _conversation_cache
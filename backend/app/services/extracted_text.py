@@ -0,0 +1,176 @@
+from bisect import bisect_right
+from typing import Any, Dict, Iterator, List, Optional
+from uuid import UUID
+import json
+import mmap
+import os
+import shutil
+from app.core.config import EXTRACTED_TEXT_DIR
+
+_SIDECAR_FORMAT_VERSION = 1
+_READ_CHUNK_BYTES = 64 * 1024
+
+
+def _sidecar_paths(file_id: UUID | str, directory: Optional[str] = None) -> tuple[str, str]:
+    base = os.path.join(directory or EXTRACTED_TEXT_DIR, str(file_id))
+    return f"{base}.txt", f"{base}.json"
+
+
+class ExtractedTextWriter:
+    """
+    Writes the text extracted at ingest as a plain UTF-8 sidecar (memory-mappable,
+    byte-addressable for HTTP Range) plus a JSON table of block char/byte offsets.
+    Files appear atomically when the context exits cleanly and are discarded on error.
+    """
+
+    def __init__(self, file_id: UUID | str, directory: Optional[str] = None):
+        self._text_path, self._index_path = _sidecar_paths(file_id, directory)
+        os.makedirs(os.path.dirname(self._text_path), exist_ok=True)
+        self._file = open(f"{self._text_path}.tmp", "wb")
+        self._chars = 0
+        self._bytes = 0
+        self._block_chars: List[int] = []
+        self._block_bytes: List[int] = []
+        self._block_pages: List[Optional[int]] = []
+
+    def add(self, text: str, page: Optional[int] = None, block_start: bool = True) -> None:
+        """Append extracted text; block_start records an entry in the offset table."""
+        if block_start:
+            self._block_chars.append(self._chars)
+            self._block_bytes.append(self._bytes)
+            self._block_pages.append(page)
+        data = text.encode("utf-8")
+        self._file.write(data)
+        self._chars += len(text)
+        self._bytes += len(data)
+
+    def __enter__(self) -> "ExtractedTextWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self._file.close()
+        if exc_type is not None:
+            os.remove(f"{self._text_path}.tmp")
+            return
+        index = {
+            "version": _SIDECAR_FORMAT_VERSION,
+            "chars": self._chars,
+            "bytes": self._bytes,
+            "blocks": {"char": self._block_chars, "byte": self._block_bytes, "page": self._block_pages},
+        }
+        with open(f"{self._index_path}.tmp", "w", encoding="utf-8") as f:
+            json.dump(index, f)
+        os.replace(f"{self._text_path}.tmp", self._text_path)
+        # The index is written last: its presence marks a complete sidecar
+        os.replace(f"{self._index_path}.tmp", self._index_path)
+
+
+class ExtractedText:
+    """
+    Read-only view of a sidecar. Text is memory-mapped, so ranged reads touch
+    only the requested pages; char offsets (as stored in chunk metadata) are
+    translated to bytes through the block offset table.
+    """
+
+    def __init__(self, text_path: str, index: Dict[str, Any]):
+        self.total_chars: int = index["chars"]
+        self.total_bytes: int = index["bytes"]
+        self._block_chars: List[int] = index["blocks"]["char"]
+        self._block_bytes: List[int] = index["blocks"]["byte"]
+        self._file = open(text_path, "rb")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if self.total_bytes else None
+
+    def close(self) -> None:
+        if self._map is not None:
+            self._map.close()
+        self._file.close()
+
+    def byte_offset(self, char_offset: int) -> int:
+        char_offset = max(0, min(char_offset, self.total_chars))
+        if self.total_chars == self.total_bytes or self._map is None:
+            return char_offset  # Pure ASCII text
+        if char_offset == self.total_chars:
+            return self.total_bytes
+        block = max(0, bisect_right(self._block_chars, char_offset) - 1)
+        if not self._block_chars:
+            block_char, block_byte = 0, 0
+        else:
+            block_char, block_byte = self._block_chars[block], self._block_bytes[block]
+        # Decode forward from the block start; UTF-8 needs at most 4 bytes per char
+        window = self._map[block_byte:min(self.total_bytes, block_byte + 4 * (char_offset - block_char))]
+        prefix = window.decode("utf-8", errors="ignore")[:char_offset - block_char]
+        return block_byte + len(prefix.encode("utf-8"))
+
+    def iter_bytes(self, start: int = 0, end: Optional[int] = None) -> Iterator[bytes]:
+        """Yield bytes [start, end) in read-sized pieces."""
+        if self._map is None:
+            return
+        end = self.total_bytes if end is None else min(end, self.total_bytes)
+        for position in range(max(0, start), end, _READ_CHUNK_BYTES):
+            yield self._map[position:min(position + _READ_CHUNK_BYTES, end)]
+
+    def iter_chars(self, offset: int = 0, limit: Optional[int] = None) -> Iterator[bytes]:
+        """Yield the UTF-8 bytes of chars [offset, offset + limit)."""
+        end_char = self.total_chars if limit is None else offset + max(0, limit)
+        yield from self.iter_bytes(self.byte_offset(offset), self.byte_offset(end_char))
+
+
+def open_extracted_text(file_id: UUID | str, directory: Optional[str] = None) -> ExtractedText | None:
+    """Open a file's sidecar, or None when it was never written or is from another format version."""
+    text_path, index_path = _sidecar_paths(file_id, directory)
+    if not os.path.isfile(index_path) or not os.path.isfile(text_path):
+        return None
+    try:
+        with open(index_path, "r", encoding="utf-8") as f:
+            index = json.load(f)
+        if index.get("version") != _SIDECAR_FORMAT_VERSION:
+            return None
+        return ExtractedText(text_path, index)
+    except Exception as e:
+        print(f"Ignoring unreadable extracted text for {file_id}: {e}")
+        return None
+
+
+def parse_byte_range(range_header: str, total_bytes: int) -> tuple[int, int] | None:
+    """
+    Parse a single "bytes=start-end" / "bytes=start-" / "bytes=-suffix" Range header
+    into an inclusive (start, end). Returns None for headers to ignore (other units,
+    multiple ranges) and raises ValueError when the range is not satisfiable.
+    """
+    unit, _, spec = range_header.strip().partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    first, _, last = spec.strip().partition("-")
+    try:
+        if not first:
+            suffix = int(last)
+            if suffix <= 0:
+                raise ValueError("Empty suffix range")
+            start, end = max(0, total_bytes - suffix), total_bytes - 1
+        else:
+            start = int(first)
+            end = min(int(last), total_bytes - 1) if last else total_bytes - 1
+    except ValueError:
+        raise ValueError(f"Unsatisfiable range '{range_header}'")
+    if start < 0 or start >= total_bytes or end < start:
+        raise ValueError(f"Unsatisfiable range '{range_header}'")
+    return start, end
+
+
+def has_extracted_text(file_id: UUID | str) -> bool:
+    return os.path.isfile(_sidecar_paths(file_id)[1])
+
+
+def remove_extracted_text(file_id: UUID | str) -> None:
+    for path in _sidecar_paths(file_id):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            # Windows refuses to delete a file that a reader still has mapped
+            print(f"Could not remove extracted text '{path}': {e}")
+
+
+def clear_extracted_text() -> None:
+    shutil.rmtree(EXTRACTED_TEXT_DIR, ignore_errors=True)
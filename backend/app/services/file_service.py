@@ -1,17 +1,35 @@
-from typing import List, Optional
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from functools import partial
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, cast
+import asyncio
+import contextlib
+import hashlib
 import os
 import shutil
 import re
+import tempfile
+import time
 from uuid import UUID
-from app.core.database import chroma_client
-from app.core.config import VECTOR_DB_COLLECTION_NAME, SOURCES_VECTOR_DB_N_RESULTS
+from app.core.database import chroma_client, embedding_function
+from app.core.config import (VECTOR_DB_COLLECTION_NAME, SOURCES_DIR, SOURCES_VECTOR_DB_N_RESULTS, INGEST_BATCH_SIZE,
+                             RETRIEVAL_WORKERS, HYBRID_SEARCH_ENABLED, RRF_K, RETRIEVAL_PAGE_SIZE,
+                             RETRIEVAL_MIN_REMAINING_TOKENS, NEAR_DUPLICATE_THRESHOLD)
 from app.models.message import Message
+from app.services.token_service import count_tokens
+from app.services.retrieval_cache import get_retrieval_cache
+from app.services.lexical_index import get_lexical_index
+from app.services.chunker import Chunker, TextBlock, get_chunker
+from app.services.pdf_extraction import iter_pdf_pages
+from app.services.extracted_text import ExtractedTextWriter, clear_extracted_text, remove_extracted_text
+from app.services.metrics import INGEST_HISTOGRAMS, observe
 from fastapi import UploadFile
 from chromadb import QueryResult
 from pypdf import PdfReader
 from docx import Document
 
-data_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "sources"))
+data_dir = os.path.abspath(SOURCES_DIR)
+retrieval_executor = ThreadPoolExecutor(max_workers=RETRIEVAL_WORKERS, thread_name_prefix="retrieval")
 
 def clear_documents_collection():
     """
@@ -23,50 +41,312 @@ def clear_documents_collection():
         return True
     except:
         return False
+    finally:
+        lexical_index = get_lexical_index()
+        lexical_index.clear()
+        lexical_index.save(force=True)
+        clear_extracted_text()
+        get_retrieval_cache().bump_version()
 
 
-def add_documents(document_content: str, file_id: Optional[UUID], doc_id: Optional[str] = None):
+def count_documents() -> int:
     """
-    Adds text to the vector database with file ID tracking.
-    file_id is always stored in metadata for filtering; doc_id can vary per chunk.
+    Returns the number of chunks stored in the vector database.
     """
-    if not document_content or not file_id:
-        return False
+    collection = chroma_client.get_or_create_collection(name=VECTOR_DB_COLLECTION_NAME)
+    return collection.count()
 
-    resolved_doc_id = doc_id or str(file_id)
 
+def rebuild_lexical_index_if_stale(page_size: int = 1000) -> None:
+    """
+    Rebuilds the BM25 index from the chunks stored in Chroma when its document
+    count no longer matches the collection (first run, or a crash before saving).
+    """
+    lexical_index = get_lexical_index()
     collection = chroma_client.get_or_create_collection(name=VECTOR_DB_COLLECTION_NAME)
-    collection.add(
-        ids=[resolved_doc_id],
-        documents=[document_content],
-        metadatas=[{"file_id": str(file_id)}]
-    )
-    return resolved_doc_id
+    total = collection.count()
+    if lexical_index.doc_count == total:
+        return
+
+    print(f"Rebuilding lexical index from {total} stored chunks")
+    lexical_index.clear()
+    for offset in range(0, total, page_size):
+        page = collection.get(limit=page_size, offset=offset, include=["documents", "metadatas"]) # type: ignore[list-item]
+        by_file: Dict[str, Tuple[List[str], List[str]]] = {}
+        for doc_id, text, metadata in zip(page["ids"], page["documents"] or [], page["metadatas"] or []):
+            file_ids, texts = by_file.setdefault(str((metadata or {}).get("file_id")), ([], []))
+            file_ids.append(doc_id)
+            texts.append(text or "")
+        for file_id, (doc_ids, texts) in by_file.items():
+            lexical_index.add_documents(doc_ids, texts, file_id)
+    lexical_index.save(force=True)
+
+
+def compute_file_hash(file_path: str) -> str:
+    """
+    Returns the sha256 hex digest of a file's content, read in 1 MiB blocks.
+    """
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
 
 
 def get_results_from_vector_db(
         last_user_message: Message,
-        selected_file_ids: Optional[List[UUID]] = None) -> QueryResult | None:
+        selected_file_ids: Optional[List[UUID]] = None,
+        token_budget: Optional[int] = None) -> QueryResult | None:
     """
     Returns results from chroma db query, filtered by selected file IDs.
     """
+    results, _ = retrieve_within_budget(last_user_message.text, selected_file_ids, token_budget)
+    return results
+
+
+@dataclass
+class FirstPage:
+    """The embedded query and its first ranked page, fetched before the token budget is known."""
+    query_embeddings: Any
+    page_size: int
+    candidates: List[Tuple[str, str, Dict]]
+
+
+def _first_page_key(query_text: str, selected_file_ids: List[UUID], page_size: int):
+    return get_retrieval_cache().make_key(query_text, selected_file_ids, "first_page", page_size)
+
+
+def cached_first_page(query_text: str, selected_file_ids: Optional[List[UUID]] = None) -> Optional[FirstPage]:
+    """The cached first page of the query, if any; a dictionary lookup, safe on the event loop."""
     if not selected_file_ids:
         return None
+    page_size = max(1, min(RETRIEVAL_PAGE_SIZE, SOURCES_VECTOR_DB_N_RESULTS))
+    return get_retrieval_cache().get(_first_page_key(query_text, selected_file_ids, page_size))
+
 
+def fetch_first_page(query_text: str, selected_file_ids: Optional[List[UUID]] = None) -> Optional[FirstPage]:
+    """
+    Embeds the query and ranks the first RETRIEVAL_PAGE_SIZE candidates; None without
+    selected files. Pages are cached like results but without the token budget in the
+    key, so a repeated query skips the embedding whatever its history.
+    """
+    if not selected_file_ids:
+        return None
+    cached = cached_first_page(query_text, selected_file_ids)
+    if cached is not None:
+        return cached
+    page_size = max(1, min(RETRIEVAL_PAGE_SIZE, SOURCES_VECTOR_DB_N_RESULTS))
+    cache_key = _first_page_key(query_text, selected_file_ids, page_size)
     collection = chroma_client.get_or_create_collection(name=VECTOR_DB_COLLECTION_NAME)
+    query_embeddings = embedding_function([query_text])
+    candidates = rank_candidates(collection, query_embeddings, query_text, [str(fid) for fid in selected_file_ids], page_size)
+    first_page = FirstPage(query_embeddings, page_size, candidates)
+    get_retrieval_cache().put(cache_key, first_page)
+    return first_page
 
-    kwargs = {
-        "query_texts": [last_user_message.text],
-        "n_results": SOURCES_VECTOR_DB_N_RESULTS,
-    }
+
+def retrieve_within_budget(
+        query_text: str,
+        selected_file_ids: Optional[List[UUID]] = None,
+        token_budget: Optional[int] = None,
+        per_chunk_overhead: int = 0,
+        first_page: Optional[FirstPage] = None) -> Tuple[QueryResult | None, Dict[str, int]]:
+    """
+    Fetches ranked candidates in growing pages (RETRIEVAL_PAGE_SIZE, doubling up to
+    SOURCES_VECTOR_DB_N_RESULTS) until the token budget is filled or results run out.
+    Near-duplicate chunks are dropped by shingle Jaccard similarity. The query is
+    embedded once for all pages, or taken from first_page along with its candidates
+    when fetch_first_page already ran. Results are cached per (query, file IDs, budget,
+    collection version) for a short TTL.
+    Returns the kept chunks plus fetched/kept/dropped counts.
+    """
+    stats = {"pages": 0, "fetched": 0, "kept": 0, "dropped_duplicates": 0, "dropped_budget": 0}
+    if not selected_file_ids:
+        return None, stats
+
+    # Bucket the budget so turns with nearly equal history share cache entries
+    budget_bucket = None if token_budget is None else token_budget // 256
+    cache = get_retrieval_cache()
+    cache_key = cache.make_key(query_text, selected_file_ids, SOURCES_VECTOR_DB_N_RESULTS, budget_bucket)
+    cached = cache.get(cache_key)
+    if cached is not None:
+        cached_results, cached_stats = cached
+        return cached_results, {**cached_stats, "cached": 1}
+
+    collection = chroma_client.get_or_create_collection(name=VECTOR_DB_COLLECTION_NAME)
     file_id_strs = [str(fid) for fid in selected_file_ids]
-    kwargs["where"] = {"file_id": {"$in": file_id_strs}}
-    results = collection.query(**kwargs)
-    return results
+    max_results = SOURCES_VECTOR_DB_N_RESULTS
+    # Never None here: selected_file_ids is not empty
+    first_page = first_page or cast(FirstPage, fetch_first_page(query_text, selected_file_ids))
+    query_embeddings = first_page.query_embeddings
+    page_size = first_page.page_size
+
+    seen_ids = set()
+    kept: List[Tuple[str, str, Dict]] = []
+    kept_signatures: List[frozenset] = []
+    used_tokens = 0
+
+    while True:
+        stats["pages"] += 1
+        if stats["pages"] == 1:
+            candidates = first_page.candidates
+        else:
+            candidates = rank_candidates(collection, query_embeddings, query_text, file_id_strs, page_size)
+        for doc_id, doc, metadata in candidates:
+            if doc_id in seen_ids:
+                continue
+            seen_ids.add(doc_id)
+            stats["fetched"] += 1
+            if not doc or len(kept) >= max_results:
+                continue
+
+            signature = shingle_signature(doc)
+            if any(jaccard_similarity(signature, other) >= NEAR_DUPLICATE_THRESHOLD for other in kept_signatures):
+                stats["dropped_duplicates"] += 1
+                continue
+
+            n_tokens = (metadata or {}).get("n_tokens")
+            tokens = (int(n_tokens) if n_tokens is not None else count_tokens(doc)) + per_chunk_overhead
+            if token_budget is not None and used_tokens + tokens > token_budget:
+                stats["dropped_budget"] += 1
+                continue
+
+            kept.append((doc_id, doc, metadata or {}))
+            kept_signatures.append(signature)
+            used_tokens += tokens
+
+        budget_filled = token_budget is not None and token_budget - used_tokens < RETRIEVAL_MIN_REMAINING_TOKENS
+        exhausted = len(candidates) < page_size
+        if budget_filled or exhausted or page_size >= max_results or len(kept) >= max_results:
+            break
+        page_size = min(page_size * 2, max_results)
+
+    stats["kept"] = len(kept)
+    results = build_query_result(kept)
+    cache.put(cache_key, (results, stats))
+    return results, stats
+
+
+def rank_candidates(
+        collection,
+        query_embeddings,
+        query_text: str,
+        file_id_strs: List[str],
+        n_results: int) -> List[Tuple[str, str, Dict]]:
+    """
+    Top n_results (doc_id, document, metadata) for the query: dense only, or
+    dense fused with BM25 when hybrid search is enabled.
+    """
+    results = collection.query(
+        query_embeddings=query_embeddings,
+        n_results=n_results,
+        where={"file_id": {"$in": file_id_strs}}) # type: ignore[arg-type]
+
+    if HYBRID_SEARCH_ENABLED:
+        lexical_hits = get_lexical_index().search(query_text, file_id_strs, n_results)
+        results = fuse_results(results, lexical_hits, n_results)
+
+    ids = (results.get("ids") or [[]])[0]
+    documents = (results.get("documents") or [[]])[0]
+    metadatas = (results.get("metadatas") or [[]])[0]
+    return [(doc_id, doc, dict(meta or {})) for doc_id, doc, meta in zip(ids, documents, metadatas)]
+
 
+def shingle_signature(text: str, size: int = 4) -> frozenset:
+    """
+    Hashed word 4-gram shingles; long texts keep a consistent 1-in-4 sample,
+    which preserves the Jaccard estimate at a fraction of the cost.
+    """
+    words = re.findall(r"\w+", text.lower())
+    if len(words) < size:
+        return frozenset([hash(" ".join(words))])
+    shingles = [hash(" ".join(words[i:i + size])) for i in range(len(words) - size + 1)]
+    if len(shingles) > 200:
+        shingles = [h for h in shingles if h % 4 == 0] or shingles[:1]
+    return frozenset(shingles)
+
+
+def jaccard_similarity(a: frozenset, b: frozenset) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def build_query_result(chunks: List[Tuple[str, str, Dict]]) -> QueryResult:
+    """Wrap (doc_id, document, metadata) tuples in a QueryResult-shaped dict."""
+    return cast(QueryResult, {
+        "ids": [[doc_id for doc_id, _, _ in chunks]],
+        "documents": [[doc for _, doc, _ in chunks]],
+        "metadatas": [[meta for _, _, meta in chunks]],
+        "distances": None,
+        "embeddings": None,
+        "uris": None,
+        "data": None,
+        "included": ["documents", "metadatas"],
+    })
+
+
+def fuse_results(
+        dense_results: QueryResult,
+        lexical_hits: List[Tuple[str, float]],
+        n_results: int) -> QueryResult:
+    """
+    Reciprocal-rank fusion of dense (Chroma) and lexical (BM25) rankings:
+    score = sum(1 / (RRF_K + rank)). Chunks found only lexically are fetched from Chroma.
+    Returns a QueryResult-shaped dict with ids, documents and metadatas.
+    """
+    dense_ids = (dense_results.get("ids") or [[]])[0]
+    dense_docs = (dense_results.get("documents") or [[]])[0]
+    dense_metas = (dense_results.get("metadatas") or [[]])[0]
+
+    scores: Dict[str, float] = {}
+    for rank, doc_id in enumerate(dense_ids):
+        scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (RRF_K + rank + 1)
+    for rank, (doc_id, _) in enumerate(lexical_hits):
+        scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (RRF_K + rank + 1)
+
+    fused_ids = sorted(scores, key=lambda doc_id: scores[doc_id], reverse=True)[:n_results]
+
+    documents = {doc_id: (doc, meta) for doc_id, doc, meta in zip(dense_ids, dense_docs, dense_metas)}
+    missing = [doc_id for doc_id in fused_ids if doc_id not in documents]
+    if missing:
+        collection = chroma_client.get_or_create_collection(name=VECTOR_DB_COLLECTION_NAME)
+        fetched = collection.get(ids=missing, include=["documents", "metadatas"]) # type: ignore[list-item]
+        for doc_id, doc, meta in zip(fetched["ids"], fetched["documents"] or [], fetched["metadatas"] or []):
+            documents[doc_id] = (doc, meta)
 
-def save_or_reuse_data_file(file: UploadFile):
-    """Save upload into backend/sources (reusing existing file name) and return the path."""
+    fused_ids = [doc_id for doc_id in fused_ids if doc_id in documents]
+    return build_query_result([(doc_id, *documents[doc_id]) for doc_id in fused_ids])
+
+
+async def fetch_first_page_async(query_text: str, selected_file_ids: Optional[List[UUID]] = None) -> Optional[FirstPage]:
+    """Awaitable fetch_first_page, on the retrieval thread pool."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(retrieval_executor, partial(fetch_first_page, query_text, selected_file_ids))
+
+
+async def retrieve_within_budget_async(
+        query_text: str,
+        selected_file_ids: Optional[List[UUID]] = None,
+        token_budget: Optional[int] = None,
+        per_chunk_overhead: int = 0,
+        first_page: Optional[FirstPage] = None) -> Tuple[QueryResult | None, Dict[str, int]]:
+    """
+    Awaitable retrieve_within_budget: query embedding and the Chroma
+    search run on the retrieval thread pool instead of the event loop.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        retrieval_executor,
+        partial(retrieve_within_budget, query_text, selected_file_ids, token_budget, per_chunk_overhead, first_page))
+
+
+def save_data_file(file: UploadFile):
+    """
+    Save upload into backend/sources and return the path. An existing file of the
+    same name is replaced atomically: the upload is written to a temporary file
+    next to it and moved over it once complete.
+    """
     os.makedirs(data_dir, exist_ok=True)
     raw_name = file.filename or ""
     if not raw_name:
@@ -75,64 +355,204 @@ def save_or_reuse_data_file(file: UploadFile):
     filename = os.path.basename(raw_name)
     destination = os.path.join(data_dir, filename)
 
-    if os.path.exists(destination):
-        return destination
-
+    # Unsupported extension, so a leftover from a crash is never indexed
+    fd, temp_path = tempfile.mkstemp(prefix=f".{filename}.", suffix=".part", dir=data_dir)
     try:
         file.file.seek(0)
-        with open(destination, "wb") as dest:
+        with os.fdopen(fd, "wb") as dest:
             shutil.copyfileobj(file.file, dest)
+        os.replace(temp_path, destination)
         return destination
     except Exception:
+        with contextlib.suppress(OSError):
+            os.remove(temp_path)
         return False
 
 
-def upload_file_to_vector_db(file_path: str, file_extension: str, file_id: Optional[UUID] = None):
+# Paragraphs longer than this are handed to the chunker in pieces while reading text files
+_MAX_BLOCK_CHARS = 64 * 1024
+_MARKDOWN_HEADING = re.compile(r"^#{1,6}\s")
+
+
+def iter_text_blocks(
+        file_path: str,
+        file_extension: str,
+        sidecar: Optional[ExtractedTextWriter] = None) -> Iterator[TextBlock]:
     """
-    Load a saved file from disk and push its contents into the vector DB with file ID tracking.
+    Streams the text of a saved file as TextBlocks without loading it whole.
+    Offsets index the extracted text: the decoded file for txt/md, and non-empty
+    pages/paragraphs/table cells each followed by a blank line for pdf/docx.
+    When a sidecar writer is given, that extracted text is written to it as it streams.
     """
     if file_extension in ("txt", "md"):
-        try:
-            with open(file_path, "r", encoding="utf-8", errors="ignore") as f:
-                text_content = f.read()
-            paragraphs = [p.strip() for p in re.split(r"\n\s*\n", text_content) if p.strip()]
-            for idx, paragraph in enumerate(paragraphs):
-                add_documents(paragraph, file_id=file_id, doc_id=f"{file_id}-{file_extension}-{idx}")
-            return True
-        except Exception as e:
-            print(e)
-            return False
+        with open(file_path, "r", encoding="utf-8", errors="ignore") as f:
+            offset = 0
+            paragraph: List[str] = []
+            paragraph_offset = 0
+            paragraph_chars = 0
+            for line in f:
+                is_heading = file_extension == "md" and bool(_MARKDOWN_HEADING.match(line))
+                if not line.strip() or is_heading or paragraph_chars >= _MAX_BLOCK_CHARS:
+                    if paragraph:
+                        yield TextBlock("".join(paragraph), paragraph_offset)
+                    paragraph, paragraph_chars = [], 0
+                    if is_heading:
+                        yield TextBlock(line, offset, is_heading=True)
+                if line.strip() and not is_heading:
+                    if not paragraph:
+                        paragraph_offset = offset
+                    paragraph.append(line)
+                    paragraph_chars += len(line)
+                if sidecar:
+                    sidecar.add(line, block_start=is_heading or paragraph_chars == len(line))
+                offset += len(line)
+            if paragraph:
+                yield TextBlock("".join(paragraph), paragraph_offset)
     elif file_extension == "pdf":
-        try:
-            reader = PdfReader(file_path)
-            for idx, page in enumerate(reader.pages):
-                add_documents(page.extract_text(), file_id=file_id, doc_id=f"{file_id}-pdf-{idx}")
-            return True
-        except Exception as e:
-            print(f"Error processing PDF: {e}")
-            return False
+        offset = 0
+        for idx, text in iter_pdf_pages(file_path):
+            if text:
+                if sidecar:
+                    sidecar.add(text + "\n\n", page=idx + 1)
+                yield TextBlock(text, offset, page=idx + 1)
+                offset += len(text) + 2
     elif file_extension == "docx":
-        try:
-            doc = Document(file_path)
-            for idx, para in enumerate(doc.paragraphs):
-                if para.text.strip():
-                    add_documents(para.text, file_id=file_id, doc_id=f"{file_id}-docx-p-{idx}")
-            
-            # Also extract text from tables
-            for t_idx, table in enumerate(doc.tables):
-                table_content = ""
-                for row in table.rows:
-                    for cell in row.cells:
-                        if cell.text.strip():
-                            table_content += cell.text + "\n\n"
-                if table_content.strip():
-                    add_documents(table_content, file_id=file_id, doc_id=f"{file_id}-docx-t-{t_idx}")
-            
-            return True
-        except Exception as e:
-            print(f"Error processing DOCX: {e}")
-            return False
-    return False
+        doc = Document(file_path)
+        offset = 0
+        for para in doc.paragraphs:
+            if para.text.strip():
+                style_name = para.style.name if para.style is not None else ""
+                is_heading = style_name.startswith("Heading") or style_name == "Title"
+                if sidecar:
+                    sidecar.add(para.text + "\n\n")
+                yield TextBlock(para.text, offset, is_heading=is_heading)
+                offset += len(para.text) + 2
+
+        # Also extract text from tables, one block per table
+        for table in doc.tables:
+            cells = [cell.text for row in table.rows for cell in row.cells if cell.text.strip()]
+            if cells:
+                table_content = "\n\n".join(cells)
+                if sidecar:
+                    sidecar.add(table_content + "\n\n")
+                yield TextBlock(table_content, offset)
+                offset += len(table_content) + 2
+
+
+def iter_file_chunks(
+        file_path: str,
+        file_extension: str,
+        file_id: Optional[UUID],
+        chunker: Optional[Chunker] = None,
+        sidecar: Optional[ExtractedTextWriter] = None) -> Iterator[Tuple[str, str, Dict[str, str | int]]]:
+    """
+    Yields (doc_id, text, metadata) chunks of a saved file from the configured chunker.
+    Metadata carries the token count and character offsets (plus pages for pdf).
+    """
+    chunker = chunker or get_chunker()
+    for idx, chunk in enumerate(chunker.chunk(iter_text_blocks(file_path, file_extension, sidecar))):
+        yield f"{file_id}-{file_extension}-{idx}", chunk.text, chunk.metadata()
+
+
+def add_documents_in_batches(
+        chunks: Iterable[Tuple[str, str, Dict[str, str | int]]],
+        file_id: UUID,
+        batch_size: int = INGEST_BATCH_SIZE,
+        on_progress: Optional[Callable[[int], None]] = None) -> Dict[str, float]:
+    """
+    Embeds and writes chunks with one bulk collection.add per batch,
+    so the embedding function runs once per batch instead of once per chunk.
+    on_progress receives the running chunk count after every batch.
+    Returns ingestion stats including throughput in chunks/s and the time spent
+    parsing (reading and chunking the source), embedding and writing.
+    """
+    collection = chroma_client.get_or_create_collection(name=VECTOR_DB_COLLECTION_NAME)
+    lexical_index = get_lexical_index()
+    batch_size = max(1, min(batch_size, chroma_client.get_max_batch_size()))
+    ids: List[str] = []
+    documents: List[str] = []
+    metadatas: List[Dict[str, str | int]] = []
+    total_chunks = 0
+    timings = {"embed_seconds": 0.0, "write_seconds": 0.0}
+    started = time.perf_counter()
+
+    def flush():
+        flush_started = time.perf_counter()
+        embeddings = embedding_function(documents)
+        embedded = time.perf_counter()
+        collection.add(ids=ids, documents=documents, metadatas=metadatas, embeddings=embeddings) # type: ignore[arg-type]
+        lexical_index.add_documents(ids, documents, str(file_id))
+        get_retrieval_cache().bump_version()
+        timings["embed_seconds"] += embedded - flush_started
+        timings["write_seconds"] += time.perf_counter() - embedded
+        ids.clear()
+        documents.clear()
+        metadatas.clear()
+        if on_progress:
+            on_progress(total_chunks)
+
+    for doc_id, text, chunk_metadata in chunks:
+        if not text:
+            continue
+        ids.append(doc_id)
+        documents.append(text)
+        # Exact token count stored once here and read back by the context budgeter
+        metadata = {"file_id": str(file_id), **chunk_metadata}
+        metadata.setdefault("n_tokens", count_tokens(text))
+        metadatas.append(metadata)
+        total_chunks += 1
+        if len(ids) >= batch_size:
+            flush()
+    if ids:
+        flush()
+
+    elapsed = time.perf_counter() - started
+    return {
+        "chunks": total_chunks,
+        "seconds": elapsed,
+        "chunks_per_second": total_chunks / elapsed if elapsed > 0 else 0.0,
+        # Chunks are pulled lazily from the parser, so parsing is the time not spent in flushes
+        "parse_seconds": max(0.0, elapsed - timings["embed_seconds"] - timings["write_seconds"]),
+        **timings,
+    }
+
+
+def ingest_file(
+        file_path: str,
+        file_extension: str,
+        file_id: UUID,
+        on_progress: Optional[Callable[[int], None]] = None) -> Dict[str, float]:
+    """
+    Parses, embeds and stores a saved file, writing its extracted text sidecar
+    in the same pass. Raises on unsupported or unreadable files.
+    """
+    if file_extension not in ("txt", "md", "pdf", "docx"):
+        raise ValueError(f"Unsupported file extension '{file_extension}'.")
+    with ExtractedTextWriter(file_id) as sidecar:
+        stats = add_documents_in_batches(
+            iter_file_chunks(file_path, file_extension, file_id, sidecar=sidecar),
+            file_id,
+            on_progress=on_progress)
+    get_lexical_index().save()
+    observe(INGEST_HISTOGRAMS, stats)
+    print(f"Ingested {stats['chunks']} chunks from {os.path.basename(file_path)} "
+          f"in {stats['seconds']:.2f}s ({stats['chunks_per_second']:.1f} chunks/s; parse {stats['parse_seconds']:.2f}s, "
+          f"embed {stats['embed_seconds']:.2f}s, write {stats['write_seconds']:.2f}s)")
+    return stats
+
+
+def upload_file_to_vector_db(file_path: str, file_extension: str, file_id: Optional[UUID] = None):
+    """
+    Load a saved file from disk and push its contents into the vector DB with file ID tracking.
+    """
+    if not file_id:
+        return False
+    try:
+        ingest_file(file_path, file_extension, file_id)
+        return True
+    except Exception as e:
+        print(f"Error processing {file_extension.upper()}: {e}")
+        return False
 
 
 def delete_file_from_disk(filename: str):
@@ -150,13 +570,19 @@ def delete_file_from_disk(filename: str):
 
 def delete_file_from_vector_db(file_id: UUID):
     """
-    Delete documents associated with a file ID from the vector database.
+    Delete documents associated with a file ID from the vector database,
+    along with the lexical index entries and extracted text derived from them.
     """
     try:
         collection = chroma_client.get_or_create_collection(name=VECTOR_DB_COLLECTION_NAME)
         
-        # Delete documents by file ID
-        collection.delete(ids=[str(file_id)])
+        # Delete every chunk tagged with the file ID
+        collection.delete(where={"file_id": str(file_id)})
+        lexical_index = get_lexical_index()
+        lexical_index.remove_file(str(file_id))
+        lexical_index.save()
+        remove_extracted_text(file_id)
+        get_retrieval_cache().bump_version()
         
         return True
     except Exception as e:
@@ -0,0 +1,205 @@
+from contextlib import asynccontextmanager
+from concurrent.futures import Executor, TimeoutError as FutureTimeoutError
+from typing import Any, AsyncGenerator, AsyncIterator, Callable, Dict, Iterable, List, Optional, cast
+import asyncio
+import threading
+import time
+
+# Marks the end of a generation stream in the token queue
+_END_OF_STREAM = object()
+
+
+class StreamStats:
+    """Timing of one streamed answer, measured from when the request was received."""
+
+    def __init__(self, started: Optional[float] = None):
+        self.started = time.perf_counter() if started is None else started
+        self.first_token_at: Optional[float] = None
+        self.last_token_at: Optional[float] = None
+        self.tokens = 0
+
+    def record(self, n_tokens: int) -> float:
+        """Count a batch of streamed tokens; returns ms since the request started."""
+        now = time.perf_counter()
+        if self.first_token_at is None:
+            self.first_token_at = now
+        self.last_token_at = now
+        self.tokens += n_tokens
+        return self.elapsed_ms(now)
+
+    def elapsed_ms(self, at: Optional[float] = None) -> float:
+        return round(((time.perf_counter() if at is None else at) - self.started) * 1000, 1)
+
+    @property
+    def ttft_ms(self) -> Optional[float]:
+        return None if self.first_token_at is None else self.elapsed_ms(self.first_token_at)
+
+    @property
+    def tokens_per_second(self) -> Optional[float]:
+        """Decode rate after the first token."""
+        if self.first_token_at is None or self.last_token_at is None or self.last_token_at <= self.first_token_at:
+            return None
+        return round((self.tokens - 1) / (self.last_token_at - self.first_token_at), 2)
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "tokens": self.tokens,
+            "ttft_ms": self.ttft_ms,
+            "tokens_per_second": self.tokens_per_second,
+            "total_ms": self.elapsed_ms(),
+        }
+
+
+class GenerationQueueFullError(Exception):
+    """Raised when more requests wait for the model than the admission queue allows."""
+
+
+class AdmissionTicket:
+    """A reserved place in the generation queue; release() is idempotent."""
+
+    def __init__(self, admission: "GenerationAdmission", position: int):
+        self.position = position  # Requests waiting ahead of this one (not running) when it was admitted
+        self._admission = admission
+        self._released = False
+
+    def release(self) -> None:
+        if not self._released:
+            self._released = True
+            self._admission._pending -= 1
+
+
+class GenerationAdmission:
+    """
+    FIFO admission to the model slot. The lock serialises generations (a semaphore
+    admits one per model replica) while the pending counter lets callers report
+    queue position or reject early.
+    """
+
+    def __init__(self, lock: asyncio.Lock | asyncio.Semaphore, max_depth: int, slots: int = 1):
+        self._lock = lock
+        self._slots = slots  # Generations the lock admits at once
+        self._max_depth = max_depth  # Waiting requests allowed besides the running ones
+        self._pending = 0
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    @property
+    def max_depth(self) -> int:
+        return self._max_depth
+
+    @property
+    def slots(self) -> int:
+        return self._slots
+
+    def reserve(self) -> AdmissionTicket:
+        if self._pending >= self._slots + self._max_depth:
+            raise GenerationQueueFullError(
+                f"{self._pending} generation requests pending (max queue depth {self._max_depth}).")
+        ticket = AdmissionTicket(self, position=max(0, self._pending - self._slots))
+        self._pending += 1
+        return ticket
+
+    @asynccontextmanager
+    async def hold(self, ticket: AdmissionTicket) -> AsyncIterator[None]:
+        """Wait for the model slot and keep it for the duration of the block."""
+        try:
+            async with self._lock:
+                yield
+        finally:
+            ticket.release()
+
+
+async def stream_tokens_from_worker(
+        executor: Executor,
+        create_stream: Callable[[], Iterable[Any]],
+        buffer_size: int) -> AsyncGenerator[str, None]:
+    """
+    Runs a blocking llama-cpp stream on the executor thread and forwards its
+    content tokens through a bounded asyncio.Queue, so the event loop only
+    awaits queue reads. Closing the generator stops the worker at the next token.
+    """
+    async for batch in stream_token_batches_from_worker(executor, create_stream, buffer_size):
+        for token in batch:
+            yield token
+
+
+async def stream_token_batches_from_worker(
+        executor: Executor,
+        create_stream: Callable[[], Iterable[Any]],
+        buffer_size: int,
+        window_seconds: float = 0.0,
+        max_bytes: int = 0) -> AsyncGenerator[List[str], None]:
+    """
+    Like stream_tokens_from_worker, but coalesces tokens: after the first token of
+    a batch, tokens arriving within window_seconds (up to max_bytes, 0 for no limit)
+    are yielded together, so the response does one write per batch instead of per
+    token. The very first token is yielded alone to keep time-to-first-token low.
+    """
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue(maxsize=max(1, buffer_size))
+    cancelled = threading.Event()
+
+    def put(item: Any) -> bool:
+        # Blocks the worker while the queue is full (back-pressure) but gives up on cancel
+        future = asyncio.run_coroutine_threadsafe(queue.put(item), loop)
+        while True:
+            try:
+                future.result(timeout=0.1)
+                return True
+            except FutureTimeoutError:
+                if cancelled.is_set():
+                    future.cancel()
+                    return False
+
+    def produce() -> None:
+        try:
+            for chunk in create_stream():
+                if cancelled.is_set():
+                    break
+                chunk_dict = cast(Dict[str, Any], chunk)
+                content = chunk_dict['choices'][0].get('delta', {}).get('content')
+                if content and not put(content):
+                    break
+        except Exception as e:
+            put(e)
+        finally:
+            put(_END_OF_STREAM)
+
+    worker = loop.run_in_executor(executor, produce)
+    try:
+        first = True
+        item = await queue.get()
+        while item is not _END_OF_STREAM:
+            if isinstance(item, Exception):
+                raise item
+            batch = [item]
+            size = len(item.encode("utf-8"))
+            deadline = loop.time() + (0.0 if first else window_seconds)
+            first = False
+            item = None
+            while max_bytes <= 0 or size < max_bytes:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    item = None
+                    break
+                if item is _END_OF_STREAM or isinstance(item, Exception):
+                    break
+                batch.append(item)
+                size += len(item.encode("utf-8"))
+                item = None
+            yield batch
+            if item is None:
+                item = await queue.get()
+    finally:
+        cancelled.set()
+        try:
+            # Keep the model slot until the worker has really stopped
+            await asyncio.shield(worker)
+        except BaseException:
+            pass
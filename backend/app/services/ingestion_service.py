@@ -0,0 +1,84 @@
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Callable, Optional
+from uuid import UUID
+import threading
+from app.core.config import INGEST_WORKERS
+from app.core.enums import JobState
+from app.models.file import File
+from app.models.ingestion_job import IngestionJob
+from app.services.file_service import ingest_file
+
+# Finished jobs kept for status lookups before the oldest are forgotten
+MAX_FINISHED_JOBS = 1000
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+class IngestionQueue:
+    """
+    Background worker pool that parses and embeds files off the request path.
+    Each submitted file gets an IngestionJob whose state and progress can be polled.
+    """
+
+    def __init__(self, max_workers: int = INGEST_WORKERS):
+        self._executor = ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="ingest")
+        self._jobs: "OrderedDict[UUID, IngestionJob]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, file: File, on_finished: Optional[Callable[[IngestionJob], None]] = None) -> IngestionJob:
+        """Queue a saved file for ingestion; on_finished runs on the worker thread afterwards."""
+        job = IngestionJob(file_id=file.id, file_name=file.name, created_at=_now())
+        with self._lock:
+            self._jobs[job.id] = job
+            self._prune()
+        self._executor.submit(self._run, job, file, on_finished)
+        return job
+
+    def get(self, job_id: UUID) -> IngestionJob | None:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return job.model_copy() if job else None
+
+    def _run(self, job: IngestionJob, file: File, on_finished: Optional[Callable[[IngestionJob], None]]) -> None:
+        job.state = JobState.running
+        job.started_at = _now()
+
+        def on_progress(chunks_processed: int) -> None:
+            job.chunks_processed = chunks_processed
+
+        try:
+            stats = ingest_file(file.path, file.extension, file.id, on_progress=on_progress)
+            job.chunks_processed = int(stats["chunks"])
+            job.state = JobState.completed
+        except Exception as e:
+            print(f"Ingestion job {job.id} for '{file.name}' failed: {e}")
+            job.error = str(e)
+            job.state = JobState.failed
+        finally:
+            job.finished_at = _now()
+
+        if on_finished:
+            try:
+                on_finished(job)
+            except Exception as e:
+                print(f"Ingestion job {job.id} completion callback failed: {e}")
+
+    def _prune(self) -> None:
+        finished = [jid for jid, j in self._jobs.items() if j.state in (JobState.completed, JobState.failed)]
+        for jid in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+            del self._jobs[jid]
+
+
+_ingestion_queue: Optional[IngestionQueue] = None
+
+
+def get_ingestion_queue() -> IngestionQueue:
+    """Get or create the singleton IngestionQueue instance."""
+    global _ingestion_queue
+    if _ingestion_queue is None:
+        _ingestion_queue = IngestionQueue()
+    return _ingestion_queue
@@ -0,0 +1,177 @@
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+import hashlib
+import os
+import pickle
+import threading
+from app.core.config import KV_CACHE_RAM_BYTES, KV_CACHE_SPILL_DIR
+
+
+class SessionStateCache:
+    """
+    LRU of llama.cpp states (Llama.save_state()) keyed by session_id under a RAM budget.
+    Restoring a session's state before generation lets llama.cpp match the shared
+    prompt prefix and evaluate only the new suffix. Evicted states optionally spill to disk.
+    """
+
+    def __init__(self, capacity_bytes: int, spill_dir: Optional[str] = None):
+        self._capacity_bytes = capacity_bytes
+        self._spill_dir = spill_dir or None
+        self._states: "OrderedDict[str, Any]" = OrderedDict()
+        self._size_bytes = 0
+        self._lock = threading.Lock()
+        self.current_session_id: Optional[str] = None  # Session whose state the model holds now
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.prefill_tokens_saved = 0
+
+    @staticmethod
+    def _state_size(state: Any) -> int:
+        return int(getattr(state, "llama_state_size", 0)) or len(getattr(state, "llama_state", b""))
+
+    def _spill_path(self, session_id: str) -> str:
+        digest = hashlib.sha256(session_id.encode("utf-8")).hexdigest()
+        return os.path.join(self._spill_dir or "", f"{digest}.state")
+
+    def get(self, session_id: str) -> Any | None:
+        with self._lock:
+            state = self._states.get(session_id)
+            if state is not None:
+                self._states.move_to_end(session_id)
+                self.hits += 1
+                return state
+
+        state = self._load_spilled(session_id)
+        if state is not None:
+            self.disk_hits += 1
+            self.put(session_id, state)
+            return state
+
+        self.misses += 1
+        return None
+
+    def put(self, session_id: str, state: Any) -> None:
+        size = self._state_size(state)
+        if size > self._capacity_bytes:
+            self._spill(session_id, state)
+            return
+
+        evicted = []
+        with self._lock:
+            previous = self._states.pop(session_id, None)
+            if previous is not None:
+                self._size_bytes -= self._state_size(previous)
+            while self._states and self._size_bytes + size > self._capacity_bytes:
+                old_id, old_state = self._states.popitem(last=False)
+                self._size_bytes -= self._state_size(old_state)
+                self.evictions += 1
+                evicted.append((old_id, old_state))
+            self._states[session_id] = state
+            self._size_bytes += size
+
+        for old_id, old_state in evicted:
+            self._spill(old_id, old_state)
+
+    def discard(self, session_id: str) -> None:
+        with self._lock:
+            state = self._states.pop(session_id, None)
+            if state is not None:
+                self._size_bytes -= self._state_size(state)
+            if self.current_session_id == session_id:
+                self.current_session_id = None
+        if self._spill_dir:
+            try:
+                os.remove(self._spill_path(session_id))
+            except FileNotFoundError:
+                pass
+
+    def record_resident_hit(self) -> None:
+        """Count a turn whose session state was still loaded in the model."""
+        self.hits += 1
+
+    def record_prefill_saved(self, tokens: int) -> None:
+        self.prefill_tokens_saved += max(0, tokens)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.disk_hits + self.misses
+        return {
+            "sessions_in_ram": len(self._states),
+            "ram_bytes": self._size_bytes,
+            "ram_capacity_bytes": self._capacity_bytes,
+            "spill_enabled": bool(self._spill_dir),
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "prefill_tokens_saved": self.prefill_tokens_saved,
+        }
+
+    def _spill(self, session_id: str, state: Any) -> None:
+        if not self._spill_dir:
+            return
+        try:
+            os.makedirs(self._spill_dir, exist_ok=True)
+            tmp_path = f"{self._spill_path(session_id)}.tmp"
+            with open(tmp_path, "wb") as f:
+                pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self._spill_path(session_id))
+        except Exception as e:
+            print(f"Could not spill KV state for session {session_id}: {e}")
+
+    def _load_spilled(self, session_id: str) -> Any | None:
+        if not self._spill_dir:
+            return None
+        path = self._spill_path(session_id)
+        if not os.path.isfile(path):
+            return None
+        try:
+            with open(path, "rb") as f:
+                state = pickle.load(f)
+            os.remove(path)
+            return state
+        except Exception as e:
+            print(f"Could not load spilled KV state for session {session_id}: {e}")
+            return None
+
+
+_session_state_cache: Optional[SessionStateCache] = None
+
+
+def get_session_state_cache() -> SessionStateCache:
+    """Get or create the singleton SessionStateCache instance."""
+    global _session_state_cache
+    if _session_state_cache is None:
+        _session_state_cache = SessionStateCache(KV_CACHE_RAM_BYTES, KV_CACHE_SPILL_DIR)
+    return _session_state_cache
+
+
+def stream_with_session_state(llm: Any, session_id: str, create_stream: Callable[[], Iterable[Any]],
+                              cache: Optional[SessionStateCache] = None) -> Iterator[Any]:
+    """
+    Runs on the generation thread. Loads the session's saved llama.cpp state when the
+    model currently holds another session, lets llama.cpp reuse the longest common
+    token prefix, and saves the state again once the answer has fully streamed.
+    """
+    if cache is None:
+        cache = get_session_state_cache()
+    restored_ids: List[int] = []
+    if cache.current_session_id == session_id:
+        cache.record_resident_hit()
+        restored_ids = llm.input_ids.tolist()
+    else:
+        state = cache.get(session_id)
+        if state is not None:
+            llm.load_state(state)
+            restored_ids = llm.input_ids.tolist()
+        cache.current_session_id = session_id
+
+    yield from create_stream()
+
+    try:
+        cache.record_prefill_saved(llm.longest_token_prefix(restored_ids, llm.input_ids.tolist()))
+        cache.put(session_id, llm.save_state())
+    except Exception as e:
+        print(f"Could not save KV state for session {session_id}: {e}")
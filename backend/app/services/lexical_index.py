@@ -0,0 +1,239 @@
+from array import array
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import atexit
+import math
+import os
+import pickle
+import re
+import threading
+import time
+import numpy as np
+from app.core.config import LEXICAL_INDEX_PATH
+
+# Words plus compound identifiers such as error codes (ERR-404), versions (1.2.3) or dotted names
+_TOKEN_PATTERN = re.compile(r"\w+(?:[-.:/]\w+)*")
+_INDEX_FORMAT_VERSION = 1
+# Minimum seconds between background saves; a final save runs at exit
+_SAVE_INTERVAL_SECONDS = 10.0
+# Compact tombstoned documents once they make up this share of the index
+_COMPACT_DEAD_RATIO = 0.3
+
+
+def tokenize_for_index(text: str) -> List[str]:
+    """Lowercased word tokens; compound identifiers are indexed whole and by their parts."""
+    tokens = []
+    for match in _TOKEN_PATTERN.findall(text.lower()):
+        tokens.append(match)
+        if not match.isalnum():
+            tokens.extend(part for part in re.split(r"[-.:/]", match) if part)
+    return tokens
+
+
+class LexicalIndex:
+    """
+    In-process BM25 inverted index over the same chunks stored in Chroma.
+    Postings are compact array('I') pairs (doc ordinals, term frequencies)
+    scored with numpy; deleted files are tombstoned and compacted lazily.
+    """
+
+    def __init__(self, index_path: Optional[str] = None, k1: float = 1.2, b: float = 0.75):
+        self._path = index_path or LEXICAL_INDEX_PATH
+        self._k1 = k1
+        self._b = b
+        self._lock = threading.RLock()
+        self._dirty = False
+        self._last_save = 0.0
+        self._reset()
+
+    def _reset(self) -> None:
+        self._doc_ids: List[str] = []
+        self._doc_index: Dict[str, int] = {}
+        self._doc_file = array("I")
+        self._doc_len = array("I")
+        self._alive = bytearray()
+        self._file_ordinals: Dict[str, int] = {}
+        self._file_docs: Dict[str, List[int]] = {}
+        self._postings: Dict[str, Tuple[array, array]] = {}
+        self._live_docs = 0
+        self._live_tokens = 0
+
+    @property
+    def doc_count(self) -> int:
+        return self._live_docs
+
+    def add_documents(self, doc_ids: Iterable[str], texts: Iterable[str], file_id: str) -> None:
+        with self._lock:
+            file_ordinal = self._file_ordinals.setdefault(file_id, len(self._file_ordinals))
+            file_docs = self._file_docs.setdefault(file_id, [])
+            for doc_id, text in zip(doc_ids, texts):
+                if doc_id in self._doc_index:
+                    continue
+                term_counts = Counter(tokenize_for_index(text))
+                ordinal = len(self._doc_ids)
+                doc_len = sum(term_counts.values())
+                self._doc_ids.append(doc_id)
+                self._doc_index[doc_id] = ordinal
+                self._doc_file.append(file_ordinal)
+                self._doc_len.append(doc_len)
+                self._alive.append(1)
+                file_docs.append(ordinal)
+                for term, tf in term_counts.items():
+                    postings = self._postings.get(term)
+                    if postings is None:
+                        postings = self._postings[term] = (array("I"), array("I"))
+                    postings[0].append(ordinal)
+                    postings[1].append(tf)
+                self._live_docs += 1
+                self._live_tokens += doc_len
+            self._dirty = True
+
+    def remove_file(self, file_id: str) -> int:
+        with self._lock:
+            ordinals = self._file_docs.pop(file_id, [])
+            for ordinal in ordinals:
+                if not self._alive[ordinal]:
+                    continue
+                self._alive[ordinal] = 0
+                self._doc_index.pop(self._doc_ids[ordinal], None)
+                self._live_docs -= 1
+                self._live_tokens -= self._doc_len[ordinal]
+            if ordinals:
+                self._dirty = True
+                dead = len(self._doc_ids) - self._live_docs
+                if dead and dead >= _COMPACT_DEAD_RATIO * len(self._doc_ids):
+                    self._compact()
+            return len(ordinals)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._reset()
+            self._dirty = True
+
+    def search(self, query: str, file_ids: Iterable[str], k: int) -> List[Tuple[str, float]]:
+        """Top-k (doc_id, BM25 score) among chunks of the given files."""
+        with self._lock:
+            terms = set(tokenize_for_index(query))
+            allowed_files = [self._file_ordinals[fid] for fid in file_ids if fid in self._file_ordinals]
+            if not terms or not allowed_files or not self._live_docs or k <= 0:
+                return []
+
+            n_docs = len(self._doc_ids)
+            avg_len = self._live_tokens / self._live_docs if self._live_docs else 1.0
+            doc_len = np.frombuffer(self._doc_len, dtype=np.uint32).astype(np.float32)
+            length_norm = self._k1 * (1.0 - self._b + self._b * doc_len / max(avg_len, 1e-6))
+            scores = np.zeros(n_docs, dtype=np.float32)
+            alive = np.frombuffer(bytes(self._alive), dtype=np.uint8).astype(bool)
+
+            for term in terms:
+                postings = self._postings.get(term)
+                if postings is None:
+                    continue
+                docs = np.frombuffer(postings[0], dtype=np.uint32)
+                tfs = np.frombuffer(postings[1], dtype=np.uint32).astype(np.float32)
+                # Same population as _live_docs, so tombstones cannot push idf below zero
+                df = int(np.count_nonzero(alive[docs]))
+                if not df:
+                    continue
+                idf = math.log(1.0 + (self._live_docs - df + 0.5) / (df + 0.5))
+                scores[docs] += idf * tfs * (self._k1 + 1.0) / (tfs + length_norm[docs])
+
+            mask = alive & np.isin(np.frombuffer(self._doc_file, dtype=np.uint32), allowed_files)
+            scores[~mask] = 0.0
+
+            candidates = np.flatnonzero(scores > 0)
+            if len(candidates) > k:
+                candidates = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+            ranked = candidates[np.argsort(-scores[candidates], kind="stable")]
+            return [(self._doc_ids[i], float(scores[i])) for i in ranked]
+
+    def _compact(self) -> None:
+        """Drop tombstoned documents and renumber ordinals."""
+        alive = np.frombuffer(bytes(self._alive), dtype=np.uint8).astype(bool)
+        new_ordinals = np.cumsum(alive, dtype=np.int64) - 1
+        postings: Dict[str, Tuple[array, array]] = {}
+        for term, (docs_arr, tfs_arr) in self._postings.items():
+            docs = np.frombuffer(docs_arr, dtype=np.uint32)
+            keep = alive[docs]
+            if not keep.any():
+                continue
+            postings[term] = (
+                array("I", new_ordinals[docs[keep]].astype(np.uint32).tobytes()),
+                array("I", np.frombuffer(tfs_arr, dtype=np.uint32)[keep].tobytes()),
+            )
+
+        live = np.flatnonzero(alive)
+        self._doc_ids = [self._doc_ids[i] for i in live]
+        self._doc_index = {doc_id: i for i, doc_id in enumerate(self._doc_ids)}
+        self._doc_file = array("I", np.frombuffer(self._doc_file, dtype=np.uint32)[live].tobytes())
+        self._doc_len = array("I", np.frombuffer(self._doc_len, dtype=np.uint32)[live].tobytes())
+        self._alive = bytearray(b"\x01" * len(live))
+        self._file_docs = {fid: [int(new_ordinals[o]) for o in ords if alive[o]]
+                           for fid, ords in self._file_docs.items()}
+        self._postings = postings
+
+    def save(self, force: bool = False) -> None:
+        """Persist the index next to the vector store, at most every few seconds unless forced."""
+        with self._lock:
+            if not self._dirty or (not force and time.monotonic() - self._last_save < _SAVE_INTERVAL_SECONDS):
+                return
+            state = {
+                "version": _INDEX_FORMAT_VERSION,
+                "doc_ids": self._doc_ids,
+                "doc_file": self._doc_file,
+                "doc_len": self._doc_len,
+                "alive": self._alive,
+                "file_ordinals": self._file_ordinals,
+                "file_docs": self._file_docs,
+                "postings": self._postings,
+                "live_docs": self._live_docs,
+                "live_tokens": self._live_tokens,
+            }
+            os.makedirs(os.path.dirname(self._path) or ".", exist_ok=True)
+            tmp_path = f"{self._path}.tmp"
+            with open(tmp_path, "wb") as f:
+                pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self._path)
+            self._dirty = False
+            self._last_save = time.monotonic()
+
+    def load(self) -> bool:
+        if not os.path.isfile(self._path):
+            return False
+        try:
+            with open(self._path, "rb") as f:
+                state: Dict[str, Any] = pickle.load(f)
+            if state.get("version") != _INDEX_FORMAT_VERSION:
+                return False
+        except Exception as e:
+            print(f"Ignoring unreadable lexical index: {e}")
+            return False
+        with self._lock:
+            self._reset()
+            self._doc_ids = state["doc_ids"]
+            self._doc_file = state["doc_file"]
+            self._doc_len = state["doc_len"]
+            self._alive = state["alive"]
+            self._file_ordinals = state["file_ordinals"]
+            self._file_docs = state["file_docs"]
+            self._postings = state["postings"]
+            self._live_docs = state["live_docs"]
+            self._live_tokens = state["live_tokens"]
+            self._doc_index = {doc_id: i for i, doc_id in enumerate(self._doc_ids) if self._alive[i]}
+            self._dirty = False
+        return True
+
+
+_lexical_index: Optional[LexicalIndex] = None
+_lexical_index_lock = threading.Lock()
+
+
+def get_lexical_index() -> LexicalIndex:
+    """Get or create the singleton LexicalIndex, loading it from disk when present."""
+    global _lexical_index
+    with _lexical_index_lock:
+        if _lexical_index is None:
+            _lexical_index = LexicalIndex()
+            _lexical_index.load()
+            atexit.register(_lexical_index.save, True)
+    return _lexical_index
@@ -0,0 +1,136 @@
+from functools import partial
+from multiprocessing.connection import Connection
+from typing import Any, Dict, List, Optional
+import logging
+import os
+from llama_cpp import Llama
+from llama_cpp.llama_cpp import llama_supports_gpu_offload
+from app.services.kv_cache import SessionStateCache, stream_with_session_state
+from app.services.model_loader import ProgressCallback, prefetch_file
+from app.core.config import CONTEXT_LIMIT, N_GPU_LAYERS, LLAMA_VERBOSE, MODEL_USE_MMAP, MODEL_USE_MLOCK, MODEL_PREFETCH
+
+# Share of the load progress given to prefetching the model file
+PREFETCH_PROGRESS_SHARE = 0.9
+
+logger = logging.getLogger(__name__)
+
+
+def load_llm(model_path: Optional[str], report_progress: ProgressCallback, n_threads: Optional[int] = None) -> Llama:
+    """Runs on the generation thread (or in a worker process), started by the app lifespan or the first chat on the model."""
+    if MODEL_PREFETCH and MODEL_USE_MMAP and model_path and os.path.isfile(model_path):
+        prefetch_file(model_path, report_progress, share=PREFETCH_PROGRESS_SHARE)
+    # Initialize with GPU support: n_gpu_layers offloads layers to GPU
+    # -1 offloads all layers; adjust based on your VRAM and model size
+    # (llama-cpp-python must be built with CUDA, see the README)
+    model = Llama(
+        model_path=model_path, # type: ignore
+        n_ctx=CONTEXT_LIMIT,
+        n_gpu_layers=N_GPU_LAYERS,  # Enable GPU acceleration
+        n_threads=n_threads,  # None lets llama.cpp pick
+        use_mmap=MODEL_USE_MMAP,
+        use_mlock=MODEL_USE_MLOCK,
+        verbose=LLAMA_VERBOSE  # Set True for debugging
+    )
+    logger.info("Library compiled with GPU support: %s", llama_supports_gpu_offload())
+    return model
+
+
+class _Replica:
+    """
+    Worker-process side: the models the API process told it to load, and its own KV
+    state cache. Models are only loaded or dropped on command, so the replica always
+    mirrors ModelRegistry's resident set.
+    """
+
+    def __init__(self, conn: Connection, n_threads: Optional[int], kv_cache_bytes: int):
+        self.conn = conn
+        self.n_threads = n_threads
+        self.cache = SessionStateCache(kv_cache_bytes)
+        self.models: Dict[Optional[str], Llama] = {}
+
+    def load(self, model_path: Optional[str]) -> None:
+        if model_path not in self.models:
+            self.models[model_path] = load_llm(model_path, lambda _: None, self.n_threads)
+
+    def drop(self, model_path: Optional[str]) -> None:
+        if self.models.pop(model_path, None) is not None:
+            # The session whose state it held may be served by another model next
+            self.cache.current_session_id = None
+
+    def model(self, model_path: Optional[str]) -> Llama:
+        llm = self.models.get(model_path)
+        if llm is None:
+            raise RuntimeError(f"Model {model_path} is not loaded in worker {os.getpid()}")
+        return llm
+
+    def generate(self, model_path: Optional[str], messages: List[Dict[str, str]], max_tokens: int,
+                 session_key: Optional[str]) -> None:
+        llm = self.model(model_path)
+        create_stream = partial(llm.create_chat_completion, messages=messages, max_tokens=max_tokens, stream=True) # type: ignore[arg-type]
+        stream = stream_with_session_state(llm, session_key, create_stream, self.cache) if session_key else create_stream()
+        try:
+            for chunk in stream:
+                content = chunk["choices"][0].get("delta", {}).get("content") # type: ignore[index]
+                if content:
+                    self.conn.send(("token", content))
+                # The API process sends "cancel" when the client went away
+                if self.conn.poll() and self.conn.recv()[0] == "cancel":
+                    break
+        finally:
+            stream.close() # type: ignore[union-attr]
+        self.conn.send(("done",))
+
+    def complete(self, model_path: Optional[str], messages: List[Dict[str, str]], max_tokens: int) -> None:
+        llm = self.model(model_path)
+        try:
+            completion = llm.create_chat_completion(messages=messages, max_tokens=max_tokens, stream=False) # type: ignore[arg-type]
+        finally:
+            # The model state no longer matches any session's saved KV state
+            self.cache.current_session_id = None
+        self.conn.send(("result", (completion["choices"][0]["message"].get("content") or "").strip())) # type: ignore[index]
+
+
+def run_worker(conn: Connection, n_threads: Optional[int], kv_cache_bytes: int,
+               preload_paths: List[Optional[str]]) -> None:
+    """
+    Entry point of a model worker process. Serves one command at a time from the pipe:
+    ("load", path) and ("drop", path) answered with ("loaded",) / ("dropped",),
+    ("discard", session_key) answered with ("discarded",), ("cache_stats",) answering ("result", stats),
+    ("generate", path, messages, max_tokens, session_key) streaming ("token", text)...
+    then ("done",), and ("complete", path, messages, max_tokens) answering ("result", text).
+    Failures are answered with ("error", detail). preload_paths are the models the
+    process held before it was restarted.
+    """
+    replica = _Replica(conn, n_threads, kv_cache_bytes)
+    for path in preload_paths:
+        try:
+            replica.load(path)
+        except Exception as e:
+            # Reported again by the first command that needs the model
+            logger.warning("Worker %s could not preload %s: %s", os.getpid(), path, e)
+
+    while True:
+        try:
+            command: Any = conn.recv()
+        except (EOFError, OSError):
+            return
+        kind = command[0]
+        try:
+            if kind == "load":
+                replica.load(command[1])
+                conn.send(("loaded",))
+            elif kind == "drop":
+                replica.drop(command[1])
+                conn.send(("dropped",))
+            elif kind == "discard":
+                replica.cache.discard(command[1])
+                conn.send(("discarded",))
+            elif kind == "cache_stats":
+                conn.send(("result", replica.cache.stats()))
+            elif kind == "generate":
+                replica.generate(*command[1:])
+            elif kind == "complete":
+                replica.complete(*command[1:])
+            # A "cancel" arriving after its stream already ended is dropped
+        except Exception as e:
+            conn.send(("error", str(e) or type(e).__name__))
@@ -0,0 +1,92 @@
+from bisect import bisect_left
+from typing import Any, Dict, List, Mapping, Sequence
+import threading
+
+# Written without prometheus_client: the exposition format for plain histograms is a few lines
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+TOKEN_BUCKETS = (16, 64, 256, 1024, 4096, 16384, 65536, 131072)
+COUNT_BUCKETS = (0, 1, 5, 10, 25, 50, 100, 250, 500)
+RATE_BUCKETS = (1, 2, 5, 10, 20, 40, 80, 160, 320)
+
+
+class Histogram:
+    """Cumulative histogram in the Prometheus text format; observe() is thread-safe."""
+
+    def __init__(self, name: str, documentation: str, buckets: Sequence[float]):
+        self.name = name
+        self.documentation = documentation
+        self._bounds = tuple(sorted(buckets))
+        self._counts = [0] * (len(self._bounds) + 1)  # Last slot is +Inf
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        with self._lock:
+            self._counts[bisect_left(self._bounds, value)] += 1
+            self._sum += value
+
+    def render(self) -> List[str]:
+        with self._lock:
+            counts, total_sum = list(self._counts), self._sum
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        cumulative = 0
+        for bound, count in zip(self._bounds, counts):
+            cumulative += count
+            lines.append(f'{self.name}_bucket{{le="{bound:g}"}} {cumulative}')
+        cumulative += counts[-1]
+        lines.append(f'{self.name}_bucket{{le="+Inf"}} {cumulative}')
+        lines.append(f"{self.name}_sum {total_sum:g}")
+        lines.append(f"{self.name}_count {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._histograms: Dict[str, Histogram] = {}
+
+    def histogram(self, name: str, documentation: str, buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        if name not in self._histograms:
+            self._histograms[name] = Histogram(name, documentation, buckets)
+        return self._histograms[name]
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for histogram in self._histograms.values():
+            lines.extend(histogram.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+# Chat requests; keys are the trace keys filled in by the chat service and endpoint
+CHAT_HISTOGRAMS: Dict[str, Histogram] = {
+    "queue_wait_s": registry.histogram("chat_queue_wait_seconds", "Time waiting for the model slot."),
+    "retrieval_s": registry.histogram("chat_retrieval_seconds", "Budget-aware retrieval time."),
+    "candidates": registry.histogram("chat_retrieval_candidates", "Chunks fetched from the vector DB.", COUNT_BUCKETS),
+    "prompt_tokens": registry.histogram("chat_prompt_tokens", "Tokens in the packed prompt.", TOKEN_BUCKETS),
+    "prefill_s": registry.histogram("chat_prefill_seconds", "From starting generation to the first token."),
+    "ttft_s": registry.histogram("chat_time_to_first_token_seconds", "From receiving the request to the first token."),
+    "decode_tokens_per_second": registry.histogram("chat_decode_tokens_per_second", "Decode rate after the first token.", RATE_BUCKETS),
+    "total_s": registry.histogram("chat_request_seconds", "From receiving the request to the end of the stream."),
+}
+
+# Ingestion, per file
+INGEST_HISTOGRAMS: Dict[str, Histogram] = {
+    "parse_seconds": registry.histogram("ingest_parse_seconds", "Extracting and chunking a file's text."),
+    "embed_seconds": registry.histogram("ingest_embed_seconds", "Embedding a file's chunks."),
+    "write_seconds": registry.histogram("ingest_write_seconds", "Writing a file's chunks to the vector DB and lexical index."),
+    "seconds": registry.histogram("ingest_file_seconds", "Total ingestion time of a file."),
+}
+
+
+def observe(histograms: Mapping[str, Histogram], values: Mapping[str, Any]) -> None:
+    """Observe every value whose key has a histogram; missing or None values are skipped."""
+    for key, histogram in histograms.items():
+        value = values.get(key)
+        if value is not None:
+            histogram.observe(float(value))
+
+
+def server_timing(durations_s: Mapping[str, float]) -> str:
+    """Server-Timing header value from named durations in seconds."""
+    return ", ".join(f"{name};dur={seconds * 1000:.1f}" for name, seconds in durations_s.items())
@@ -0,0 +1,119 @@
+from concurrent.futures import Executor, Future
+from typing import Any, Callable, Dict, Optional
+import asyncio
+import os
+import time
+
+# Receives the load progress as a fraction between 0 and 1
+ProgressCallback = Callable[[float], None]
+
+
+class ModelNotReadyError(Exception):
+    """Raised when the model is still loading after the wait timeout, or failed to load."""
+
+
+class ModelLoader:
+    """
+    Loads a model once, in the background, on the executor that will run it.
+    load(report_progress) builds the model; progress and failures are kept for /health/ready.
+    A failed load is retried on the next start() or wait().
+    """
+
+    def __init__(self, load: Callable[[ProgressCallback], Any]):
+        self._load = load
+        self._future: Optional[Future] = None
+        self._model: Any = None
+        self.state = "not_started"  # not_started, loading, ready or failed
+        self.progress = 0.0
+        self.error: Optional[str] = None
+        self._started_at: Optional[float] = None
+        self._finished_at: Optional[float] = None
+
+    def start(self, executor: Executor) -> Future:
+        """Submit the load unless it already ran or is running; returns its future."""
+        if self._future is None or self.state == "failed":
+            self.state = "loading"
+            self.progress = 0.0
+            self.error = None
+            self._started_at = time.perf_counter()
+            self._finished_at = None
+            self._future = executor.submit(self._run)
+        return self._future
+
+    def _run(self) -> Any:
+        try:
+            model = self._load(self._report)
+        except BaseException as e:
+            self.state = "failed"
+            self.error = str(e) or type(e).__name__
+            raise
+        finally:
+            self._finished_at = time.perf_counter()
+        self._model = model
+        self.progress = 1.0
+        self.state = "ready"
+        return model
+
+    def _report(self, progress: float) -> None:
+        self.progress = min(max(progress, self.progress), 1.0)
+
+    @property
+    def ready(self) -> bool:
+        return self.state == "ready"
+
+    @property
+    def model(self) -> Any:
+        """The loaded model, for code that runs after wait() succeeded."""
+        if not self.ready:
+            raise ModelNotReadyError(f"The model is not loaded (state: {self.state})")
+        return self._model
+
+    def unload(self) -> None:
+        """Drop the reference to a loaded model; it is freed once in-flight users let go of it."""
+        if self.ready:
+            self.state = "not_started"
+            self.progress = 0.0
+            self._future = None
+            self._model = None
+
+    async def wait(self, executor: Executor, timeout: float) -> Any:
+        """Returns the model, starting the load if needed; ModelNotReadyError after timeout seconds."""
+        model = self._model
+        if model is not None:
+            return model
+        future = asyncio.wrap_future(self.start(executor))
+        try:
+            return await asyncio.wait_for(asyncio.shield(future), timeout)
+        except asyncio.TimeoutError:
+            raise ModelNotReadyError(f"The model is still loading ({self.progress:.0%})")
+        except Exception as e:
+            raise ModelNotReadyError(f"The model failed to load: {e}") from e
+
+    def status(self) -> Dict[str, Any]:
+        elapsed = None
+        if self._started_at is not None:
+            elapsed = round((self._finished_at or time.perf_counter()) - self._started_at, 2)
+        return {
+            "state": self.state,
+            "progress": round(self.progress, 3),
+            "elapsed_s": elapsed,
+            "error": self.error,
+        }
+
+
+def prefetch_file(path: str, report_progress: ProgressCallback, share: float = 1.0,
+                  chunk_bytes: int = 16 * 1024**2) -> None:
+    """
+    Reads the file sequentially so a memory-mapped load finds it in the page cache
+    instead of faulting pages in at random. Reports up to share of the progress.
+    """
+    size = os.path.getsize(path) or 1
+    done = 0
+    buffer = bytearray(chunk_bytes)
+    with open(path, "rb", buffering=0) as f:
+        while True:
+            read = f.readinto(buffer)
+            if not read:
+                break
+            done += read
+            report_progress(share * done / size)
@@ -0,0 +1,164 @@
+from collections import OrderedDict
+from concurrent.futures import Executor
+from typing import Any, Callable, Dict, List, Optional
+import os
+import threading
+from app.services.model_loader import ModelLoader, ProgressCallback
+
+# Name of the model when MODEL_ABSOLUTE_PATH is unset
+FALLBACK_MODEL_NAME = "default"
+
+
+class UnknownModelError(ValueError):
+    """Raised for a model name that is not in the registry."""
+
+
+def model_paths_from_config(primary_path: Optional[str], extra_paths: str) -> Dict[str, Optional[str]]:
+    """
+    Maps model names (GGUF file stems) to paths: primary_path first, then
+    extra_paths separated by os.pathsep. Duplicate names raise ValueError.
+    """
+    paths: Dict[str, Optional[str]] = {}
+    if primary_path:
+        paths[os.path.splitext(os.path.basename(primary_path))[0]] = primary_path
+    for path in filter(None, (p.strip() for p in extra_paths.split(os.pathsep))):
+        name = os.path.splitext(os.path.basename(path))[0]
+        if paths.get(name, path) != path:
+            raise ValueError(f"Two models are named '{name}': {paths[name]} and {path}")
+        paths[name] = path
+    return paths or {FALLBACK_MODEL_NAME: primary_path}
+
+
+class ModelRegistry:
+    """
+    The configured models by name, loaded on demand on the load executor.
+    Loaded models stay resident in an LRU while their total file size fits budget_bytes
+    (0 keeps only the most recently used one). Eviction drops the registry's reference
+    and calls on_evict(name, model), so a stream already holding a model finishes on it.
+    Sessions remember the last model chosen for them, up to session_capacity sessions.
+    """
+
+    def __init__(self, paths: Dict[str, Optional[str]], default: Optional[str], budget_bytes: int,
+                 load: Callable[[Optional[str], ProgressCallback], Any], session_capacity: int = 4096,
+                 on_evict: Optional[Callable[[str, Any], None]] = None):
+        self._paths = paths
+        self._budget_bytes = budget_bytes
+        self._session_capacity = session_capacity
+        self._on_evict = on_evict
+        self._loaders = {name: ModelLoader(self._loader_for(name, path, load)) for name, path in paths.items()}
+        self._resident: "OrderedDict[str, None]" = OrderedDict()  # Loaded models, least recently used first
+        self._session_models: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+        self.default = self._check(default) if default else next(iter(paths))
+
+    @property
+    def names(self) -> List[str]:
+        return list(self._paths)
+
+    def _check(self, name: str) -> str:
+        if name not in self._loaders:
+            raise UnknownModelError(f"Unknown model '{name}'; available: {', '.join(self._paths)}")
+        return name
+
+    @staticmethod
+    def _size(path: Optional[str]) -> int:
+        return os.path.getsize(path) if path and os.path.isfile(path) else 0
+
+    def _loader_for(self, name: str, path: Optional[str], load: Callable[[Optional[str], ProgressCallback], Any]):
+        def load_model(report_progress: ProgressCallback) -> Any:
+            # Runs on the load executor; in-process that is the generation thread, so no stream is decoding
+            self._make_room(name)
+            model = load(path, report_progress)
+            with self._lock:
+                self._resident[name] = None
+            return model
+        return load_model
+
+    def _make_room(self, name: str) -> None:
+        needed = self._size(self._paths[name])
+        evicted = []
+        with self._lock:
+            used = sum(self._size(self._paths[other]) for other in self._resident)
+            for other in list(self._resident):
+                if other == name:
+                    continue
+                if self._budget_bytes and used + needed <= self._budget_bytes:
+                    break
+                del self._resident[other]
+                used -= self._size(self._paths[other])
+                evicted.append(other)
+                self.evictions += 1
+        for other in evicted:
+            loader = self._loaders[other]
+            model = loader.model if loader.ready else None
+            loader.unload()
+            if self._on_evict is not None:
+                self._on_evict(other, model)
+
+    def set_default(self, name: str) -> None:
+        """Switch the model used when neither the request nor the session picks one."""
+        self.default = self._check(name)
+
+    def resolve(self, name: Optional[str] = None, session_id: Optional[str] = None) -> str:
+        """
+        The model for a request: name if given (remembered for the session),
+        else the session's last choice, else the default.
+        """
+        with self._lock:
+            if name is not None:
+                self._check(name)
+                if session_id is not None:
+                    self._session_models[session_id] = name
+                    self._session_models.move_to_end(session_id)
+                    while len(self._session_models) > self._session_capacity:
+                        self._session_models.popitem(last=False)
+                return name
+            if session_id is not None and session_id in self._session_models:
+                return self._session_models[session_id]
+            return self.default
+
+    def forget_session(self, session_id: str) -> None:
+        with self._lock:
+            self._session_models.pop(session_id, None)
+
+    def start(self, name: str, executor: Executor) -> None:
+        """Begin loading a model in the background."""
+        self._loaders[self._check(name)].start(executor)
+
+    async def acquire(self, name: str, executor: Executor, timeout: float) -> Any:
+        """The loaded model, loading it if needed; ModelNotReadyError after timeout seconds."""
+        model = await self._loaders[self._check(name)].wait(executor, timeout)
+        with self._lock:
+            if name in self._resident:
+                self._resident.move_to_end(name)
+        return model
+
+    def path(self, name: str) -> Optional[str]:
+        """The model's file, which also selects its tokenizer."""
+        return self._paths[self._check(name)]
+
+    def loaded(self, name: str) -> Any | None:
+        loader = self._loaders[self._check(name)]
+        return loader.model if loader.ready else None
+
+    def is_ready(self, name: str) -> bool:
+        return self._loaders[self._check(name)].ready
+
+    def status(self, name: str) -> Dict[str, Any]:
+        return self._loaders[self._check(name)].status()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            resident = list(self._resident)
+        return {
+            "default": self.default,
+            "budget_bytes": self._budget_bytes,
+            "resident": resident,
+            "resident_bytes": sum(self._size(self._paths[name]) for name in resident),
+            "evictions": self.evictions,
+            "models": [
+                {"name": name, "size_bytes": self._size(path), **self._loaders[name].status()}
+                for name, path in self._paths.items()
+            ],
+        }
@@ -0,0 +1,97 @@
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Deque, Dict, Iterator, List, Optional, Tuple
+import multiprocessing
+import os
+import threading
+from pypdf import PdfReader
+from app.core.config import (PDF_EXTRACT_WORKERS, PDF_PAGES_PER_TASK, PDF_MAX_IN_FLIGHT_PAGES,
+                             PDF_PARALLEL_MIN_PAGES)
+
+# Kept free of heavy imports: spawned worker processes import this module to unpickle tasks.
+# Shared pools by worker count
+_pools: Dict[int, ProcessPoolExecutor] = {}
+_pool_lock = threading.Lock()
+# Per worker process: the last opened reader, reused by the next ranges of the same file
+_worker_reader: Optional[Tuple[str, float, PdfReader]] = None
+
+
+def _extract_page_range(file_path: str, start: int, stop: int) -> List[str]:
+    """Worker task: extract pages [start, stop) with a reader opened in this process."""
+    global _worker_reader
+    mtime = os.path.getmtime(file_path)
+    if _worker_reader is None or _worker_reader[:2] != (file_path, mtime):
+        _worker_reader = (file_path, mtime, PdfReader(file_path))
+    reader = _worker_reader[2]
+    return [reader.pages[idx].extract_text() or "" for idx in range(start, stop)]
+
+
+def get_pdf_process_pool(workers: int = PDF_EXTRACT_WORKERS) -> ProcessPoolExecutor:
+    """Get or create the shared extraction process pool with this many workers."""
+    workers = max(1, workers)
+    with _pool_lock:
+        if workers not in _pools:
+            # Spawned, not forked: forking this multi-threaded server can deadlock the child
+            _pools[workers] = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+        return _pools[workers]
+
+
+def _reset_pool(workers: int) -> None:
+    with _pool_lock:
+        pool = _pools.pop(max(1, workers), None)
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+
+def iter_pdf_pages(
+        file_path: str,
+        workers: int = PDF_EXTRACT_WORKERS,
+        pages_per_task: int = PDF_PAGES_PER_TASK,
+        max_in_flight_pages: int = PDF_MAX_IN_FLIGHT_PAGES) -> Iterator[Tuple[int, str]]:
+    """
+    Yields (page_index, text) for every page in order. Large PDFs are split into
+    page ranges extracted in parallel worker processes; at most max_in_flight_pages
+    are submitted or waiting to be consumed, which bounds memory for huge files.
+    """
+    reader = PdfReader(file_path)
+    n_pages = len(reader.pages)
+    if workers <= 1 or n_pages < PDF_PARALLEL_MIN_PAGES:
+        for idx, page in enumerate(reader.pages):
+            yield idx, page.extract_text() or ""
+        return
+    del reader
+
+    pages_per_task = max(1, pages_per_task)
+    max_tasks = max(1, max_in_flight_pages // pages_per_task)
+    ranges = iter([(start, min(start + pages_per_task, n_pages)) for start in range(0, n_pages, pages_per_task)])
+    in_flight: Deque[Tuple[int, int, Future]] = deque()
+    pool = get_pdf_process_pool(workers)
+
+    def submit_next() -> bool:
+        page_range = next(ranges, None)
+        if page_range is None:
+            return False
+        in_flight.append((*page_range, pool.submit(_extract_page_range, file_path, *page_range)))
+        return True
+
+    try:
+        while len(in_flight) < max_tasks and submit_next():
+            pass
+        while in_flight:
+            start, stop, future = in_flight.popleft()
+            try:
+                texts = future.result()
+            except BrokenProcessPool:
+                # A worker died (e.g. out of memory): finish the file in this process
+                _reset_pool(workers)
+                fallback = PdfReader(file_path)
+                for idx in range(start, n_pages):
+                    yield idx, fallback.pages[idx].extract_text() or ""
+                return
+            submit_next()
+            for offset, text in enumerate(texts):
+                yield start + offset, text
+    finally:
+        for _, _, future in in_flight:
+            future.cancel()
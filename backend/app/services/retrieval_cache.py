@@ -0,0 +1,86 @@
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Iterable, Optional, Tuple
+from uuid import UUID
+import threading
+import time
+from app.core.config import RETRIEVAL_CACHE_SIZE, RETRIEVAL_CACHE_TTL_SECONDS
+
+
+class RetrievalCache:
+    """
+    LRU cache with a TTL for vector DB query results.
+    Keys include the collection version, so any ingest, delete or clear
+    makes earlier entries unreachable instead of stale.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self._max_entries = max_entries
+        self._ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._version = 0
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def version(self) -> int:
+        return self._version
+
+    def bump_version(self) -> int:
+        """Invalidate all cached results; called whenever the collection changes."""
+        with self._lock:
+            self._version += 1
+            self._entries.clear()
+            return self._version
+
+    @staticmethod
+    def normalize_query(query_text: str) -> str:
+        return " ".join(query_text.lower().split())
+
+    def make_key(self, query_text: str, file_ids: Iterable[UUID], *extra: Hashable) -> Hashable:
+        return (self.normalize_query(query_text), tuple(sorted(str(fid) for fid in file_ids)), self._version, *extra)
+
+    def get(self, key: Hashable) -> Any | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                stored_at, value = entry
+                if time.monotonic() - stored_at <= self._ttl_seconds:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key: Hashable, value: Any) -> None:
+        if self._max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self._max_entries,
+            "ttl_seconds": self._ttl_seconds,
+            "collection_version": self._version,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+_retrieval_cache: Optional[RetrievalCache] = None
+
+
+def get_retrieval_cache() -> RetrievalCache:
+    """Get or create the singleton RetrievalCache instance."""
+    global _retrieval_cache
+    if _retrieval_cache is None:
+        _retrieval_cache = RetrievalCache(RETRIEVAL_CACHE_SIZE, RETRIEVAL_CACHE_TTL_SECONDS)
+    return _retrieval_cache
@@ -0,0 +1,63 @@
+from functools import lru_cache
+from typing import Optional
+import logging
+import os
+import threading
+from app.core.config import MODEL_ABSOLUTE_PATH, TOKEN_COUNT_CACHE_SIZE
+
+# Vocabulary-only llama.cpp instances, one per model file: they load the tokenizer without
+# model weights, so ingestion threads can count tokens without touching a generation model.
+_tokenizer_lock = threading.Lock()
+
+logger = logging.getLogger(__name__)
+
+
+@lru_cache(maxsize=None)
+def _load_tokenizer(model_path: Optional[str]):
+    try:
+        if not model_path or not os.path.isfile(model_path):
+            raise FileNotFoundError(f"Model file '{model_path}' not found")
+        from llama_cpp import Llama
+        return Llama(model_path=model_path, vocab_only=True, verbose=False)
+    except Exception as e:
+        logger.warning("Tokenizer unavailable, token counts fall back to a 4 chars/token estimate: %s", e)
+        return None
+
+
+def get_tokenizer(model_path: Optional[str] = MODEL_ABSOLUTE_PATH):
+    """Lazily load the model's tokenizer; returns None when no model file is available."""
+    with _tokenizer_lock:
+        return _load_tokenizer(model_path)
+
+
+def tokenizer_signature(model_path: Optional[str] = MODEL_ABSOLUTE_PATH) -> str:
+    """
+    Identifies what produces token counts: the model vocabulary, or the estimate.
+    Part of chunker_signature, so chunk counts stored under another one are redone.
+    """
+    if get_tokenizer(model_path) is None:
+        return "estimate"
+    return f"vocab:{os.path.basename(model_path)}:{os.path.getsize(model_path)}"  # type: ignore[arg-type]
+
+
+def count_tokens(text: str, model_path: Optional[str] = MODEL_ABSOLUTE_PATH) -> int:
+    """
+    Exact token count from the model's tokenizer (no BOS, no special tokens).
+    Chunks are counted with the primary model's, the default.
+    """
+    if not text:
+        return 0
+    tokenizer = get_tokenizer(model_path)
+    if tokenizer is None:
+        # Rough estimate: 1 token ~= 4 characters for English
+        return len(text) // 4
+    with _tokenizer_lock:
+        return len(tokenizer.tokenize(text.encode("utf-8"), add_bos=False, special=False))  # type: ignore[attr-defined]
+
+
+@lru_cache(maxsize=TOKEN_COUNT_CACHE_SIZE)
+def count_tokens_cached(text: str, model_path: Optional[str] = MODEL_ABSOLUTE_PATH) -> int:
+    """
+    Memoized count_tokens for texts seen every turn, like conversation history.
+    """
+    return count_tokens(text, model_path)
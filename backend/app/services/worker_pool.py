@@ -0,0 +1,315 @@
+from collections import OrderedDict
+from multiprocessing.connection import Connection
+from typing import Any, Dict, Iterator, List, Optional
+import logging
+import multiprocessing
+import threading
+from app.services.llm_worker import run_worker
+from app.services.model_loader import ProgressCallback
+
+
+logger = logging.getLogger(__name__)
+
+
+class WorkerCrashedError(RuntimeError):
+    """Raised to the request a model worker process was serving when it died."""
+
+
+class ReplicaModel:
+    """
+    What ModelRegistry holds for a model loaded on every worker process. Requests pin
+    it while they use it, so an eviction only drops it from the replicas after them.
+    """
+
+    def __init__(self, model_path: Optional[str]):
+        self.model_path = model_path
+        self.pins = 0
+        self.evicting = False  # No new pins once the registry evicted it
+
+
+class _Replica:
+    """API-process side of one model worker process."""
+
+    def __init__(self, index: int):
+        self.index = index
+        self.process: Optional[multiprocessing.process.BaseProcess] = None
+        self.conn: Optional[Connection] = None
+        self.busy = False
+        self.model_paths: List[Optional[str]] = []  # Loaded models, preloaded again when the process restarts
+        self.last_used = 0
+        self.served = 0
+        self.restarts = 0
+
+
+class WorkerPool:
+    """
+    Model replicas in worker processes, each with its own Llama, n_threads and KV state
+    cache. Streams are relayed over a pipe by blocking calls meant for executor threads:
+    stream() yields the same chunk dicts as Llama.create_chat_completion(stream=True),
+    so it drops into stream_token_batches_from_worker. A free replica is picked per
+    request, preferring the one that served the session last since it holds its KV state.
+    Every replica holds the models ModelRegistry keeps resident (load / unload), so any
+    free replica can serve any request. Callers bound concurrency to size (see
+    GenerationAdmission); a replica that dies is restarted with its models and the
+    request it was serving fails with WorkerCrashedError.
+    """
+
+    def __init__(self, size: int, n_threads: Optional[int], kv_cache_bytes: int, affinity_capacity: int = 4096):
+        self._n_threads = n_threads
+        self._kv_cache_bytes = kv_cache_bytes
+        self._affinity_capacity = affinity_capacity
+        self._context = multiprocessing.get_context("spawn")
+        self._replicas = [_Replica(index) for index in range(size)]
+        self._affinity: "OrderedDict[str, int]" = OrderedDict()  # Session key -> replica index
+        self._condition = threading.Condition()
+        self._clock = 0
+        self.affinity_hits = 0
+        self.affinity_misses = 0
+        self._started = False
+
+    @property
+    def size(self) -> int:
+        return len(self._replicas)
+
+    def start(self) -> None:
+        with self._condition:
+            if not self._started:
+                self._started = True
+                for replica in self._replicas:
+                    self._spawn(replica)
+
+    def _spawn(self, replica: _Replica) -> None:
+        parent_conn, child_conn = self._context.Pipe()
+        process = self._context.Process(
+            target=run_worker,
+            args=(child_conn, self._n_threads, self._kv_cache_bytes, list(replica.model_paths)),
+            name=f"llm-worker-{replica.index}",
+            daemon=True)
+        process.start()
+        # Only the child keeps its end open, so its death reads as EOF here
+        child_conn.close()
+        replica.process, replica.conn = process, parent_conn
+
+    def _restart(self, replica: _Replica) -> None:
+        logger.warning("Model worker %s (pid %s) died; restarting",
+                       replica.index, replica.process.pid if replica.process else None)
+        if replica.conn is not None:
+            replica.conn.close()
+        if replica.process is not None:
+            replica.process.join(timeout=1)
+        replica.restarts += 1
+        self._spawn(replica)
+
+    def _acquire(self, session_key: Optional[str] = None, index: Optional[int] = None) -> _Replica:
+        """Blocks until a replica is free: replica index if given, else the session's, else the least recently used."""
+        self.start()
+        with self._condition:
+            while True:
+                free = [replica for replica in self._replicas if not replica.busy]
+                if index is not None:
+                    free = [replica for replica in free if replica.index == index]
+                if free:
+                    break
+                self._condition.wait()
+            preferred = self._affinity.get(session_key) if session_key is not None else None
+            chosen = next((replica for replica in free if replica.index == preferred), None)
+            if session_key is not None:
+                if chosen is not None:
+                    self.affinity_hits += 1
+                else:
+                    self.affinity_misses += 1
+            if chosen is None:
+                chosen = min(free, key=lambda replica: replica.last_used)
+            chosen.busy = True
+            self._clock += 1
+            chosen.last_used = self._clock
+        # A replica that died while idle is replaced before it is handed out, so no request fails for it
+        if chosen.process is None or not chosen.process.is_alive():
+            self._restart(chosen)
+        return chosen
+
+    def _release(self, replica: _Replica, session_key: Optional[str] = None) -> None:
+        with self._condition:
+            replica.busy = False
+            if session_key is not None:
+                self._affinity[session_key] = replica.index
+                self._affinity.move_to_end(session_key)
+                while len(self._affinity) > self._affinity_capacity:
+                    self._affinity.popitem(last=False)
+            self._condition.notify_all()
+
+    def _recv(self, replica: _Replica) -> Any:
+        try:
+            return replica.conn.recv() # type: ignore[union-attr]
+        except (EOFError, OSError):
+            self._restart(replica)
+            raise WorkerCrashedError(f"Model worker {replica.index} stopped unexpectedly")
+
+    def _call(self, replica: _Replica, command: tuple, expected: str) -> Any:
+        """Send a command and wait for its single reply."""
+        try:
+            replica.conn.send(command) # type: ignore[union-attr]
+        except (BrokenPipeError, OSError):
+            self._restart(replica)
+            raise WorkerCrashedError(f"Model worker {replica.index} stopped unexpectedly")
+        reply = self._recv(replica)
+        if reply[0] == "error":
+            raise RuntimeError(reply[1])
+        if reply[0] != expected:
+            raise RuntimeError(f"Unexpected reply from model worker {replica.index}: {reply[0]}")
+        return reply[1] if len(reply) > 1 else None
+
+    def load(self, model_path: Optional[str], report_progress: ProgressCallback) -> ReplicaModel:
+        """
+        Blocking: loads the model on every replica in turn, so each can serve it.
+        This is ModelRegistry's load function, so residency follows its budget.
+        """
+        for done, replica in enumerate(self._replicas, start=1):
+            acquired = self._acquire(index=replica.index)
+            try:
+                self._call(acquired, ("load", model_path), "loaded")
+                if model_path not in acquired.model_paths:
+                    acquired.model_paths.append(model_path)
+            finally:
+                self._release(acquired)
+            report_progress(done / self.size)
+        return ReplicaModel(model_path)
+
+    def pin(self, model: ReplicaModel) -> bool:
+        """Keep the model on the replicas until unpin(); False once it is being evicted."""
+        with self._condition:
+            if model.evicting:
+                return False
+            model.pins += 1
+            return True
+
+    def unpin(self, model: ReplicaModel) -> None:
+        with self._condition:
+            model.pins -= 1
+            self._condition.notify_all()
+
+    def unload(self, model: ReplicaModel) -> None:
+        """
+        Blocking: drops an evicted model from every replica once the requests that
+        pinned it are done, so in-flight streams finish on it.
+        """
+        with self._condition:
+            model.evicting = True
+            while model.pins > 0:
+                self._condition.wait()
+        for replica in self._replicas:
+            acquired = self._acquire(index=replica.index)
+            try:
+                if model.model_path in acquired.model_paths:
+                    acquired.model_paths.remove(model.model_path)
+                self._call(acquired, ("drop", model.model_path), "dropped")
+            except WorkerCrashedError:
+                # Restarted without the model
+                pass
+            finally:
+                self._release(acquired)
+
+    def discard(self, *session_keys: str) -> None:
+        """Blocking: drops the sessions' saved KV states from every replica, once each is free."""
+        with self._condition:
+            for key in session_keys:
+                self._affinity.pop(key, None)
+        for replica in self._replicas:
+            acquired = self._acquire(index=replica.index)
+            try:
+                for key in session_keys:
+                    self._call(acquired, ("discard", key), "discarded")
+            except WorkerCrashedError:
+                # Restarted with an empty cache
+                pass
+            finally:
+                self._release(acquired)
+
+    def cache_stats(self) -> List[Dict[str, Any]]:
+        """Blocking: the KV state cache stats of every replica."""
+        stats = []
+        for replica in self._replicas:
+            acquired = self._acquire(index=replica.index)
+            try:
+                stats.append({"index": replica.index, **self._call(acquired, ("cache_stats",), "result")})
+            except WorkerCrashedError:
+                stats.append({"index": replica.index, "error": "restarted"})
+            finally:
+                self._release(acquired)
+        return stats
+
+    def stream(self, model_path: Optional[str], messages: List[Dict[str, str]], max_tokens: int,
+               session_key: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        """Blocking: streams a chat completion from a free replica. Closing the iterator cancels it."""
+        replica = self._acquire(session_key)
+        finished = False
+        try:
+            replica.conn.send(("generate", model_path, messages, max_tokens, session_key)) # type: ignore[union-attr]
+            replica.served += 1
+            while True:
+                reply = self._recv(replica)
+                if reply[0] == "token":
+                    yield {"choices": [{"delta": {"content": reply[1]}}]}
+                    continue
+                finished = True
+                if reply[0] == "error":
+                    raise RuntimeError(reply[1])
+                return
+        except (BrokenPipeError, OSError):
+            finished = True
+            self._restart(replica)
+            raise WorkerCrashedError(f"Model worker {replica.index} stopped unexpectedly")
+        except WorkerCrashedError:
+            finished = True
+            raise
+        finally:
+            if not finished:
+                self._cancel(replica)
+            self._release(replica, session_key)
+
+    def _cancel(self, replica: _Replica) -> None:
+        """Stop the replica's stream and drain what it already sent, so its pipe is clean for the next request."""
+        try:
+            replica.conn.send(("cancel",)) # type: ignore[union-attr]
+            while self._recv(replica)[0] == "token":
+                pass
+        except (WorkerCrashedError, BrokenPipeError, OSError):
+            pass
+
+    def complete(self, model_path: Optional[str], messages: List[Dict[str, str]], max_tokens: int) -> str:
+        """Blocking: a non-streamed completion on a free replica."""
+        replica = self._acquire()
+        try:
+            return self._call(replica, ("complete", model_path, messages, max_tokens), "result")
+        finally:
+            self._release(replica)
+
+    def close(self) -> None:
+        for replica in self._replicas:
+            if replica.conn is not None:
+                replica.conn.close()
+            if replica.process is not None:
+                replica.process.join(timeout=5)
+                if replica.process.is_alive():
+                    replica.process.terminate()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._condition:
+            return {
+                "workers": self.size,
+                "busy": sum(replica.busy for replica in self._replicas),
+                "affinity_hits": self.affinity_hits,
+                "affinity_misses": self.affinity_misses,
+                "replicas": [
+                    {
+                        "index": replica.index,
+                        "pid": replica.process.pid if replica.process else None,
+                        "alive": bool(replica.process and replica.process.is_alive()),
+                        "busy": replica.busy,
+                        "model_paths": list(replica.model_paths),
+                        "served": replica.served,
+                        "restarts": replica.restarts,
+                    }
+                    for replica in self._replicas
+                ],
+            }
@@ -0,0 +1,75 @@
+"""
+Per-turn message persistence cost, before and after pooled WAL connections.
+
+"before" reproduces the previous MessageRepository behaviour: a new connection
+per call and one SELECT plus one INSERT/commit per resent history message.
+
+Run from backend/:  python -m benchmarks.bench_message_persistence --turns 50
+"""
+import argparse
+import os
+import sqlite3
+import statistics
+import tempfile
+import time
+from datetime import datetime, timezone
+from uuid import uuid4
+
+from app.core.enums import Role
+from app.models.chat_request import ChatRequest
+from app.models.message import Message
+from app.repositories.message_repository import MessageRepository
+
+
+class LegacyMessageRepository(MessageRepository):
+    """Connection per call, default journal, row-at-a-time history upsert."""
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(str(self._db_path), check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def create_from_chat_request(self, chat_request: ChatRequest) -> bool:
+        for msg in chat_request.messages:
+            if msg.role != Role.assistant and not self.get(msg.id):
+                self.create(msg.model_copy(update={"session_id": chat_request.session_id}))
+        return True
+
+
+def _message(session_id: str, role: Role, text: str) -> Message:
+    return Message(session_id=session_id, text=text, role=role,
+                   timestamp=datetime.now(timezone.utc).isoformat())
+
+
+def run(repo: MessageRepository, turns: int) -> list[float]:
+    """Simulate one chat session; returns seconds spent persisting each turn."""
+    session_id = str(uuid4())
+    history: list[Message] = []
+    timings = []
+    for turn in range(turns):
+        history.append(_message(session_id, Role.user, f"Question {turn} " + "lorem ipsum " * 20))
+        started = time.perf_counter()
+        repo.create_from_chat_request(ChatRequest(messages=list(history), session_id=session_id))
+        answer = _message(session_id, Role.assistant, f"Answer {turn} " + "dolor sit amet " * 40)
+        repo.create(answer)
+        timings.append(time.perf_counter() - started)
+        history.append(answer)
+    return timings
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=50, help="Chat turns per session")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, repo_class in (("before", LegacyMessageRepository), ("after", MessageRepository)):
+            repo = repo_class(db_path=os.path.join(tmp, f"{name}.db"))
+            timings = run(repo, args.turns)
+            print(f"{name:>6}: mean {statistics.mean(timings) * 1000:.2f} ms/turn, "
+                  f"last turn {timings[-1] * 1000:.2f} ms, total {sum(timings):.3f} s")
+            repo.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""
+Compare two benchmark result files written by benchmarks.run and flag regressions:
+metrics that got worse (in their "better" direction) by more than the threshold.
+Millisecond metrics must also move by at least --min-ms, so sub-millisecond jitter
+on fast paths is not reported.
+Exits with status 1 when any regression is found.
+
+Run from backend/:  python -m benchmarks.compare baseline.json results.json --threshold 0.15
+"""
+import argparse
+import json
+import sys
+from typing import Any, Dict, List, Tuple
+
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any], threshold: float,
+            min_ms: float = 0.0) -> List[Tuple[str, float, float, float, str]]:
+    """Rows of (metric, baseline, current, relative change, status) for metrics present in both."""
+    rows = []
+    for name in sorted(set(baseline["metrics"]) & set(current["metrics"])):
+        before, after = baseline["metrics"][name], current["metrics"][name]
+        base, value = float(before["value"]), float(after["value"])
+        change = (value - base) / abs(base) if base else 0.0
+        if after.get("unit") == "ms" and abs(value - base) < min_ms:
+            change = 0.0
+        direction = after.get("better", "lower")
+        if direction not in ("lower", "higher"):
+            rows.append((name, base, value, change, "info"))
+            continue
+        worse = change > threshold if direction == "lower" else change < -threshold
+        better = change < -threshold if direction == "lower" else change > threshold
+        rows.append((name, base, value, change, "REGRESSION" if worse else "improved" if better else "ok"))
+    return rows
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("baseline")
+    parser.add_argument("current")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Relative change tolerated (0.10 = 10%%)")
+    parser.add_argument("--min-ms", type=float, default=0.5, help="Smallest change in ms metrics treated as real")
+    args = parser.parse_args()
+
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    with open(args.current, encoding="utf-8") as f:
+        current = json.load(f)
+
+    rows = compare(baseline, current, args.threshold, args.min_ms)
+    print(f"{'metric':<42} {'baseline':>12} {'current':>12} {'change':>8}  status")
+    for name, base, value, change, status in rows:
+        print(f"{name:<42} {base:>12.3f} {value:>12.3f} {change:>+8.1%}  {status}")
+    only = set(baseline["metrics"]) ^ set(current["metrics"])
+    if only:
+        print(f"Not compared (missing on one side): {', '.join(sorted(only))}")
+
+    regressions = [row for row in rows if row[4] == "REGRESSION"]
+    print(f"{len(regressions)} regression(s) beyond {args.threshold:.0%}")
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
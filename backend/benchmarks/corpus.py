@@ -0,0 +1,108 @@
+"""
+Synthetic source files in every supported format. Text is generated from a
+seeded vocabulary, so the same arguments always produce the same corpus.
+"""
+import os
+import random
+from typing import List, Tuple
+
+from docx import Document
+
+_VOCABULARY = [
+    "latency", "throughput", "cache", "index", "vector", "token", "prompt", "session", "batch", "stream",
+    "model", "query", "chunk", "document", "retrieval", "budget", "context", "window", "memory", "disk",
+    "parser", "embedding", "ranking", "sqlite", "database", "request", "response", "worker", "queue", "thread",
+    "process", "pipeline", "storage", "network", "cluster", "replica", "schema", "offset", "header", "summary",
+]
+FORMATS = ("txt", "md", "pdf", "docx")
+
+
+def _sentence(rng: random.Random) -> str:
+    words = rng.choices(_VOCABULARY, k=rng.randint(8, 20))
+    return " ".join(words).capitalize() + "."
+
+
+def random_paragraphs(rng: random.Random, size_bytes: int) -> List[str]:
+    paragraphs, total = [], 0
+    while total < size_bytes:
+        paragraph = " ".join(_sentence(rng) for _ in range(rng.randint(3, 8)))
+        paragraphs.append(paragraph)
+        total += len(paragraph) + 2
+    return paragraphs
+
+
+def query_terms(rng: random.Random, n_words: int = 4) -> str:
+    """A query drawn from the corpus vocabulary."""
+    return " ".join(rng.choices(_VOCABULARY, k=n_words))
+
+
+def _write_pdf(path: str, paragraphs: List[str], lines_per_page: int = 40) -> None:
+    """Minimal uncompressed PDF with one Helvetica text line per ~90 chars."""
+    lines: List[str] = []
+    for paragraph in paragraphs:
+        while paragraph:
+            lines.append(paragraph[:90])
+            paragraph = paragraph[90:]
+        lines.append("")
+    pages = [lines[i:i + lines_per_page] for i in range(0, len(lines), lines_per_page)] or [[]]
+
+    n = len(pages)
+    font_obj = 3 + 2 * n
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>",
+               f"<< /Type /Pages /Kids [{' '.join(f'{3 + 2 * i} 0 R' for i in range(n))}] /Count {n} >>".encode()]
+    for i, page_lines in enumerate(pages):
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents {4 + 2 * i} 0 R "
+                       f"/Resources << /Font << /F1 {font_obj} 0 R >> >> >>".encode())
+        text = " ".join(
+            "(" + line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)") + ") Tj T*" for line in page_lines)
+        stream = f"BT /F1 10 Tf 12 TL 50 750 Td {text} ET".encode("latin-1", errors="replace")
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+    objects.append(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, obj in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n".encode() + obj + b"\nendobj\n"
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    out += b"".join(f"{offset:010d} 00000 n \n".encode() for offset in offsets)
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    with open(path, "wb") as f:
+        f.write(bytes(out))
+
+
+def _write_docx(path: str, paragraphs: List[str], rng: random.Random) -> None:
+    document = Document()
+    for i, paragraph in enumerate(paragraphs):
+        if i % 10 == 0:
+            document.add_heading(" ".join(rng.choices(_VOCABULARY, k=3)).title(), level=2)
+        document.add_paragraph(paragraph)
+    document.save(path)
+
+
+def generate_corpus(directory: str, files_per_format: int, file_kb: int, seed: int = 0,
+                    formats: Tuple[str, ...] = FORMATS) -> List[Tuple[str, str]]:
+    """Writes files_per_format files of about file_kb KB of text per format; returns (path, extension) pairs."""
+    os.makedirs(directory, exist_ok=True)
+    rng = random.Random(seed)
+    files = []
+    for extension in formats:
+        for index in range(files_per_format):
+            paragraphs = random_paragraphs(rng, file_kb * 1024)
+            path = os.path.join(directory, f"synthetic_{index:04d}.{extension}")
+            if extension == "txt":
+                with open(path, "w", encoding="utf-8") as f:
+                    f.write("\n\n".join(paragraphs))
+            elif extension == "md":
+                with open(path, "w", encoding="utf-8") as f:
+                    for i, paragraph in enumerate(paragraphs):
+                        if i % 10 == 0:
+                            f.write(f"## Section {i // 10 + 1}\n\n")
+                        f.write(paragraph + "\n\n")
+            elif extension == "pdf":
+                _write_pdf(path, paragraphs)
+            elif extension == "docx":
+                _write_docx(path, paragraphs, rng)
+            files.append((path, extension))
+    return files
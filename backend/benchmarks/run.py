@@ -0,0 +1,317 @@
+"""
+Offline benchmark suite: ingest throughput, retrieval latency, context window
+packing, /sessions and /messages latency on a large message DB, and /chat
+streaming overhead. The model is replaced by a stub streaming at a fixed rate
+and embeddings by a hashing function (--real-embeddings uses the ONNX model).
+Everything runs in a temporary directory; results are written as JSON.
+
+Run from backend/:
+    python -m benchmarks.run --scale small --out results.json
+    python -m benchmarks.compare baseline.json results.json
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, Optional
+from uuid import uuid4
+
+SCALES: Dict[str, Dict[str, int]] = {
+    "small": {"files_per_format": 2, "file_kb": 64, "queries": 50, "sessions": 10_000,
+              "messages_per_session": 4, "chat_requests": 10, "answer_tokens": 64},
+    "medium": {"files_per_format": 5, "file_kb": 256, "queries": 200, "sessions": 20_000,
+               "messages_per_session": 8, "chat_requests": 30, "answer_tokens": 128},
+    "large": {"files_per_format": 10, "file_kb": 1024, "queries": 500, "sessions": 50_000,
+              "messages_per_session": 10, "chat_requests": 50, "answer_tokens": 256},
+}
+SUITES = ("ingest", "retrieval", "context_window", "sessions", "chat")
+
+
+def percentile(values: List[float], p: float) -> float:
+    """Nearest-rank percentile."""
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    rank = max(0, min(len(ordered) - 1, int(round(p / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[rank]
+
+
+class Results:
+    def __init__(self):
+        self.metrics: Dict[str, Dict[str, Any]] = {}
+
+    def add(self, name: str, value: float, unit: str, better: str = "lower") -> None:
+        """better is "lower", "higher" or "none" for informational metrics never flagged by compare."""
+        self.metrics[name] = {"value": round(value, 4), "unit": unit, "better": better}
+        print(f"  {name:<40} {value:>12.3f} {unit}", file=sys.stderr)
+
+    def add_latencies(self, name: str, seconds: List[float]) -> None:
+        self.add(f"{name}.p50_ms", percentile(seconds, 50) * 1000, "ms")
+        self.add(f"{name}.p99_ms", percentile(seconds, 99) * 1000, "ms")
+
+
+def timed(fn: Callable[[], Any], repeat: int) -> List[float]:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    return timings
+
+
+@contextlib.contextmanager
+def quiet():
+    """Hide the backend's progress prints while a suite runs."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+
+def bench_ingest(results: Results, corpus: List[tuple]) -> List[str]:
+    from app.services.file_service import ingest_file
+    totals: Dict[str, Dict[str, float]] = {}
+    file_ids = []
+    for path, extension in corpus:
+        file_id = uuid4()
+        with quiet():
+            stats = ingest_file(path, extension, file_id)
+        file_ids.append(str(file_id))
+        total = totals.setdefault(extension, {"bytes": 0, "chunks": 0, "seconds": 0, "parse": 0, "embed": 0, "write": 0})
+        total["bytes"] += os.path.getsize(path)
+        total["chunks"] += stats["chunks"]
+        total["seconds"] += stats["seconds"]
+        total["parse"] += stats["parse_seconds"]
+        total["embed"] += stats["embed_seconds"]
+        total["write"] += stats["write_seconds"]
+    for extension, total in totals.items():
+        seconds = total["seconds"] or 1e-9
+        results.add(f"ingest.{extension}.mb_per_second", total["bytes"] / 1024**2 / seconds, "MB/s", "higher")
+        results.add(f"ingest.{extension}.chunks_per_second", total["chunks"] / seconds, "chunks/s", "higher")
+        results.add(f"ingest.{extension}.parse_share", total["parse"] / seconds, "ratio", "none")
+    return file_ids
+
+
+def bench_retrieval(results: Results, file_ids: List[str], queries: int, seed: int) -> None:
+    from uuid import UUID
+    from app.services.file_service import retrieve_within_budget
+    from app.services.retrieval_cache import get_retrieval_cache
+    from benchmarks.corpus import query_terms
+    rng = random.Random(seed)
+    ids = [UUID(fid) for fid in file_ids]
+    texts = [query_terms(rng) for _ in range(queries)]
+    cache = get_retrieval_cache()
+
+    cold = []
+    for text in texts:
+        cache.bump_version()
+        started = time.perf_counter()
+        retrieve_within_budget(text, ids, token_budget=4096)
+        cold.append(time.perf_counter() - started)
+    results.add_latencies("retrieval.cold", cold)
+
+    warm = []
+    for text in texts:
+        retrieve_within_budget(text, ids, token_budget=4096)
+        started = time.perf_counter()
+        retrieve_within_budget(text, ids, token_budget=4096)
+        warm.append(time.perf_counter() - started)
+    results.add_latencies("retrieval.cached", warm)
+
+
+def bench_context_window(results: Results, seed: int) -> None:
+    with quiet():
+        from app.services.chat_service import cut_into_context_window, prepare_llm_formatted_messages
+    from benchmarks.corpus import random_paragraphs
+    rng = random.Random(seed)
+    turns = [{"role": "user" if i % 2 == 0 else "assistant", "content": " ".join(random_paragraphs(rng, 600))}
+             for i in range(41)]
+    documents = random_paragraphs(rng, 100 * 900)[:100]
+    query_result: Any = {"ids": [[str(i) for i in range(len(documents))]], "documents": [documents],
+                         "metadatas": [[{"n_tokens": len(doc) // 4} for doc in documents]]}
+    formatted = prepare_llm_formatted_messages(turns, 1024)
+    results.add_latencies("context_window.format", timed(lambda: prepare_llm_formatted_messages(turns, 1024), 200))
+    results.add_latencies("context_window.pack", timed(lambda: cut_into_context_window(formatted, query_result, 1024), 200))
+
+
+def populate_messages(db_path: str, sessions: int, messages_per_session: int) -> List[str]:
+    """Bulk-insert a message history; the repository backfills the sessions table on open."""
+    from app.core.enums import Role
+    from app.repositories.message_repository import MessageRepository
+    MessageRepository(db_path).close()
+    base = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    session_ids = [str(uuid4()) for _ in range(sessions)]
+    rows = []
+    for s, session_id in enumerate(session_ids):
+        for m in range(messages_per_session):
+            role = Role.user if m % 2 == 0 else Role.assistant
+            timestamp = (base + timedelta(minutes=s, seconds=m)).isoformat()
+            rows.append((str(uuid4()), session_id, f"Message {m} of session {s} " + "lorem ipsum " * 15,
+                         role.value, timestamp))
+    conn = sqlite3.connect(db_path)
+    conn.executemany("INSERT INTO messages (id, session_id, text, role, timestamp) VALUES (?, ?, ?, ?, ?)", rows)
+    conn.commit()
+    conn.close()
+    MessageRepository(db_path).close()
+    return session_ids
+
+
+def bench_sessions(results: Results, client: Any, session_ids: List[str], seed: int) -> None:
+    rng = random.Random(seed)
+    first_page = timed(lambda: client.get("/api/v1/sessions", params={"limit": 50}).raise_for_status(), 50)
+    results.add_latencies("sessions.first_page", first_page)
+
+    deep, cursor = [], None
+    for _ in range(50):
+        started = time.perf_counter()
+        response = client.get("/api/v1/sessions", params={"limit": 50, **({"cursor": cursor} if cursor else {})})
+        deep.append(time.perf_counter() - started)
+        cursor = response.json()["next_cursor"]
+        if cursor is None:
+            break
+    results.add_latencies("sessions.paging", deep)
+
+    picks = [rng.choice(session_ids) for _ in range(100)]
+    results.add_latencies("messages.page", [
+        t for sid in picks
+        for t in timed(lambda: client.get("/api/v1/messages", params={"session_id": sid, "limit": 50}).raise_for_status(), 1)])
+    results.add_latencies("messages.ndjson", [
+        t for sid in picks
+        for t in timed(lambda: client.get("/api/v1/messages", params={"session_id": sid, "stream": "true"}).raise_for_status(), 1)])
+
+
+def upload_files(client: Any, corpus: List[tuple], timeout: float = 300.0) -> List[str]:
+    """Uploads files through POST /api/v1/file and waits for their ingestion jobs, so /chat can select them."""
+    jobs = {}
+    for path, _ in corpus:
+        with open(path, "rb") as f:
+            response = client.post("/api/v1/file", files={"file": (os.path.basename(path), f)})
+        response.raise_for_status()
+        jobs[response.json()["job_id"]] = response.json()["file_id"]
+    deadline = time.monotonic() + timeout
+    for job_id in jobs:
+        while True:
+            job = client.get(f"/api/v1/jobs/{job_id}").json()
+            if job["state"] == "completed":
+                break
+            if job["state"] == "failed" or time.monotonic() > deadline:
+                raise RuntimeError(f"Ingestion of {job['file_name']} did not complete: {job['state']} {job['error']}")
+            time.sleep(0.05)
+    return list(jobs.values())
+
+
+def bench_chat(results: Results, client: Any, requests: int, tokens_per_second: float,
+               answer_tokens: int, file_ids: List[str]) -> None:
+    """
+    Server-side time beyond the stub's own token pacing, from the SSE "done" event.
+    With file_ids every request must retrieve chunks, or the numbers would leave out retrieval.
+    """
+    ideal_ms = answer_tokens / tokens_per_second * 1000
+    overheads, ttfts, rates = [], [], []
+    for i in range(requests):
+        session_id = str(uuid4())
+        message = {"session_id": session_id, "text": f"Question {i} about latency and cache",
+                   "role": "user", "timestamp": datetime.now(timezone.utc).isoformat()}
+        body = {"session_id": session_id, "message": message, "selected_file_ids": file_ids or None}
+        response = client.post("/api/v1/chat", json=body, headers={"Accept": "text/event-stream"})
+        done = json.loads(response.text.strip().split("\n\n")[-1].split("data: ", 1)[1])
+        if file_ids and not (done.get("retrieval") or {}).get("fetched"):
+            raise RuntimeError(f"/chat retrieved nothing from {file_ids}: {done}")
+        overheads.append((done["total_ms"] - ideal_ms) / 1000)
+        ttfts.append(done["ttft_ms"] / 1000)
+        rates.append(done["tokens_per_second"] or 0.0)
+    results.add_latencies("chat.overhead", overheads)
+    results.add_latencies("chat.ttft", ttfts)
+    results.add("chat.decode_tokens_per_second.p50", percentile(rates, 50), "tokens/s", "higher")
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", choices=sorted(SCALES), default="small")
+    parser.add_argument("--only", default=",".join(SUITES), help=f"Comma-separated suites out of {', '.join(SUITES)}")
+    parser.add_argument("--out", default="benchmark_results.json")
+    parser.add_argument("--tokens-per-second", type=float, default=200.0, help="Stub model decode rate")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--real-embeddings", action="store_true", help="Use the ONNX embedding model")
+    for key, value in SCALES["small"].items():
+        parser.add_argument(f"--{key.replace('_', '-')}", type=int, default=None, help=f"Override the scale ({value} in small)")
+    args = parser.parse_args()
+    params = {key: getattr(args, key) if getattr(args, key) is not None else value
+              for key, value in SCALES[args.scale].items()}
+    suites = [suite.strip() for suite in args.only.split(",") if suite.strip()]
+
+    workdir = tempfile.mkdtemp(prefix="rag-bench-")
+    # Configuration is read at import time: isolate every store before importing the app
+    os.environ.update({
+        "CHROMA_PERSIST_DIR": os.path.join(workdir, "chroma_db"),
+        "SOURCES_DIR": os.path.join(workdir, "sources"),
+        "MESSAGE_DB_PATH": os.path.join(workdir, "messages.db"),
+        "KV_CACHE_SPILL_DIR": "",
+    })
+    from benchmarks.stubs import install_stub_llm, use_stub_embeddings
+    install_stub_llm(args.tokens_per_second, params["answer_tokens"])
+    if not args.real_embeddings:
+        use_stub_embeddings()
+
+    results = Results()
+    file_ids: List[str] = []
+    corpus: List[tuple] = []
+    print(f"Benchmarking in {workdir} ({args.scale}: {params})", file=sys.stderr)
+
+    if "ingest" in suites or "retrieval" in suites or "chat" in suites:
+        from benchmarks.corpus import generate_corpus
+        corpus = generate_corpus(os.path.join(workdir, "corpus"), params["files_per_format"], params["file_kb"], args.seed)
+        file_ids = bench_ingest(results, corpus)
+    if "retrieval" in suites:
+        bench_retrieval(results, file_ids, params["queries"], args.seed)
+    if "context_window" in suites:
+        bench_context_window(results, args.seed)
+    if "sessions" in suites or "chat" in suites:
+        session_ids = populate_messages(os.environ["MESSAGE_DB_PATH"], params["sessions"], params["messages_per_session"])
+        from fastapi.testclient import TestClient
+        with quiet():
+            from app.main import app
+        with TestClient(app) as client:
+            if "sessions" in suites:
+                bench_sessions(results, client, session_ids, args.seed)
+            if "chat" in suites:
+                with quiet():
+                    chat_file_ids = upload_files(client, corpus[:4])
+                    bench_chat(results, client, params["chat_requests"], args.tokens_per_second,
+                               params["answer_tokens"], chat_file_ids)
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "scale": args.scale,
+            "params": params,
+            "tokens_per_second": args.tokens_per_second,
+            "embeddings": "onnx" if args.real_embeddings else "hash",
+        },
+        "metrics": results.metrics,
+    }
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {len(results.metrics)} metrics to {args.out}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
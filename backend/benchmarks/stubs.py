@@ -0,0 +1,103 @@
+"""
+Deterministic stand-ins for the model and the embedding function, so benchmarks
+run offline and measure this code rather than llama.cpp or ONNX.
+"""
+import hashlib
+import sys
+import time
+import types
+from typing import Any, Dict, Iterator, List
+
+import numpy as np
+
+_WORDS = ("the", "model", "answers", "with", "context", "from", "your", "sources", "and", "history",
+          "tokens", "stream", "quickly", "while", "retrieval", "finds", "relevant", "chunks")
+
+
+class StubLlama:
+    """
+    Mimics the parts of llama_cpp.Llama the backend uses. Answers with up to
+    answer_tokens words chosen from a hash of the prompt, streamed at tokens_per_second.
+    """
+    tokens_per_second: float = 200.0
+    answer_tokens: int = 64
+
+    def __init__(self, model_path: str = "", vocab_only: bool = False, **_: Any):
+        self.input_ids = np.zeros(0, dtype=np.int64)
+
+    def tokenize(self, text: bytes, add_bos: bool = True, special: bool = False) -> List[int]:
+        return list(range(len(text) // 4))
+
+    @staticmethod
+    def longest_token_prefix(a: List[int], b: List[int]) -> int:
+        n = 0
+        for x, y in zip(a, b):
+            if x != y:
+                break
+            n += 1
+        return n
+
+    def save_state(self) -> Any:
+        return types.SimpleNamespace(llama_state=self.input_ids.tobytes(), llama_state_size=self.input_ids.nbytes,
+                                     input_ids=self.input_ids.copy())
+
+    def load_state(self, state: Any) -> None:
+        self.input_ids = state.input_ids.copy()
+
+    def create_chat_completion(self, messages: List[Dict[str, str]], max_tokens: int = 64,
+                               stream: bool = False, **_: Any) -> Any:
+        prompt = "".join(m["content"] for m in messages).encode("utf-8")
+        self.input_ids = np.frombuffer(hashlib.sha256(prompt).digest(), dtype=np.int64).copy()
+        seed = int.from_bytes(hashlib.md5(prompt).digest()[:4], "little")
+        words = [_WORDS[(seed + i * 7) % len(_WORDS)] + " " for i in range(min(max_tokens, self.answer_tokens))]
+        if stream:
+            return self._stream(words)
+        return {"choices": [{"message": {"role": "assistant", "content": "".join(words)}}]}
+
+    def _stream(self, words: List[str]) -> Iterator[Dict[str, Any]]:
+        interval = 1.0 / self.tokens_per_second if self.tokens_per_second > 0 else 0.0
+        next_at = time.perf_counter()
+        for word in words:
+            next_at += interval
+            delay = next_at - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            yield {"choices": [{"delta": {"content": word}}]}
+
+
+def install_stub_llm(tokens_per_second: float, answer_tokens: int) -> None:
+    """Register a fake llama_cpp module; must run before app.services.chat_service is imported."""
+    StubLlama.tokens_per_second = tokens_per_second
+    StubLlama.answer_tokens = answer_tokens
+    module = types.ModuleType("llama_cpp")
+    module.Llama = StubLlama  # type: ignore[attr-defined]
+    low_level = types.ModuleType("llama_cpp.llama_cpp")
+    low_level.llama_supports_gpu_offload = lambda: False  # type: ignore[attr-defined]
+    module.llama_cpp = low_level  # type: ignore[attr-defined]
+    sys.modules["llama_cpp"] = module
+    sys.modules["llama_cpp.llama_cpp"] = low_level
+
+
+class HashEmbeddingFunction:
+    """Bag-of-words hashed into a fixed number of dimensions, L2-normalised."""
+
+    def __init__(self, dimensions: int = 384):
+        self._dimensions = dimensions
+
+    def __call__(self, input: List[str]) -> List[np.ndarray]:
+        vectors = []
+        for text in input:
+            vector = np.zeros(self._dimensions, dtype=np.float32)
+            for word in text.lower().split():
+                vector[int.from_bytes(hashlib.md5(word.encode("utf-8")).digest()[:4], "little") % self._dimensions] += 1
+            vectors.append(vector / (np.linalg.norm(vector) or 1.0))
+        return vectors
+
+
+def use_stub_embeddings() -> None:
+    """Point ingestion and retrieval at HashEmbeddingFunction."""
+    import app.core.database as database
+    import app.services.file_service as file_service
+    embedding_function = HashEmbeddingFunction()
+    database.embedding_function = embedding_function  # type: ignore[assignment]
+    file_service.embedding_function = embedding_function  # type: ignore[assignment]
@@ -46,18 +46,18 @@ export class Chat {
 
     this.isSending.set(true);
     this.isWaitingForFirstResponse.set(true);
-    this.addMessage({id:crypto.randomUUID(), session_id: this.currentSessionId() , role: Role.User, text, timestamp: new Date().toISOString() });
-    
-    const messagesToSend = this.messages();
+    const userMessage: Message = {id:crypto.randomUUID(), session_id: this.currentSessionId() , role: Role.User, text, timestamp: new Date().toISOString() };
+    this.addMessage(userMessage);
     
     // Defer creating the assistant message until we receive data from the API stream.
 
     try {
       const selectedIds = this.sourcesService.getSelectedFileIds();
       const requestBody = {
-        messages: messagesToSend,
+        // Only the new turn is sent; the backend continues the stored session history
+        message: userMessage,
         selected_file_ids: selectedIds.length > 0 ? selectedIds : undefined,
-        session_id: this.currentSessionId() // redundant duplication?
+        session_id: this.currentSessionId()
       };
       console.log(requestBody);
 
@@ -21,6 +21,7 @@ export class History implements OnInit {
   
   isCollapsed = signal(false);
   historyItems = signal<HistoryItem[]>([]);
+  nextCursor = signal<string | null>(null);
   isLoading = signal(false);
   
   sessionSelected = output<string>();
@@ -32,21 +33,42 @@ export class History implements OnInit {
   async loadSessions(): Promise<void> {
     this.isLoading.set(true);
     try {
-      const sessions = await this.chatService.getSessions();
-      this.historyItems.set(sessions.map(session => ({
-        id: session.id,
-        title: session.title,
-        timestamp: session.timestamp,
-        lastMessage: session.lastMessage
-      })));
+      const { sessions, nextCursor } = await this.chatService.getSessions();
+      this.historyItems.set(sessions.map(session => this.toHistoryItem(session)));
+      this.nextCursor.set(nextCursor);
     } catch (error) {
       console.error('Failed to load sessions:', error);
       this.historyItems.set([]);
+      this.nextCursor.set(null);
     } finally {
       this.isLoading.set(false);
     }
   }
 
+  async loadMoreSessions(): Promise<void> {
+    const cursor = this.nextCursor();
+    if (!cursor || this.isLoading()) return;
+    this.isLoading.set(true);
+    try {
+      const { sessions, nextCursor } = await this.chatService.getSessions(cursor);
+      this.historyItems.update(items => [...items, ...sessions.map(session => this.toHistoryItem(session))]);
+      this.nextCursor.set(nextCursor);
+    } catch (error) {
+      console.error('Failed to load more sessions:', error);
+    } finally {
+      this.isLoading.set(false);
+    }
+  }
+
+  private toHistoryItem(session: any): HistoryItem {
+    return {
+      id: session.id,
+      title: session.title,
+      timestamp: session.timestamp,
+      lastMessage: session.lastMessage
+    };
+  }
+
   onItemClick(sessionId: string): void {
     this.sessionSelected.emit(sessionId);
   }
@@ -5,4 +5,5 @@ export interface FileModel {
   extension: string;
   size_bytes: number;
   content_type: string;
+  status: 'processing' | 'ready' | 'failed';
 }
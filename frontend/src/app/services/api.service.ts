@@ -10,6 +10,7 @@ export class ApiService {
     file: `${this.BASE}/file`,
     files: `${this.BASE}/files`,
     fileContent: `${this.BASE}/file-content`,
+    jobs: `${this.BASE}/jobs`,
     messages: `${this.BASE}/messages`,
     sessions: `${this.BASE}/sessions`,
     settings: `${this.BASE}/settings`,
@@ -20,11 +20,11 @@ export class ChatService {
 
   /**
    * Sends a chat request to the backend and streams the response.
-   * @param request - The chat request containing messages and file IDs
+   * @param request - The session ID, the new user message and selected file IDs
    * @param onChunk - Callback function to handle each streamed chunk
    * @throws Error if the HTTP request fails
    */
-  async sendChatStream(request: { messages: Message[]; selected_file_ids?: string[] }, onChunk: (chunk: string) => void): Promise<void> {
+  async sendChatStream(request: { session_id: string; message: Message; selected_file_ids?: string[] }, onChunk: (chunk: string) => void): Promise<void> {
     this.abortController = new AbortController();
 
     try {
@@ -87,12 +87,18 @@ export class ChatService {
   }
 
   /**
-   * Fetches all session history from the backend.
-   * @returns Promise resolving to an array of session data
+   * Fetches one page of session history from the backend, most recent first.
+   * @param cursor - next_cursor returned with the previous page, if any
+   * @param limit - Maximum number of sessions in the page
+   * @returns Promise resolving to the sessions and the cursor of the next page (null on the last page)
    */
-  async getSessions(): Promise<any[]> {
-    const response = await this.http.get<{ sessions: any[] }>(this.apiService.endpoints.sessions).toPromise();
-    return response?.sessions || [];
+  async getSessions(cursor: string | null = null, limit = 50): Promise<{ sessions: any[]; nextCursor: string | null }> {
+    let url = `${this.apiService.endpoints.sessions}?limit=${limit}`;
+    if (cursor) {
+      url += `&cursor=${encodeURIComponent(cursor)}`;
+    }
+    const response = await this.http.get<{ sessions: any[]; next_cursor: string | null }>(url).toPromise();
+    return { sessions: response?.sessions || [], nextCursor: response?.next_cursor ?? null };
   }
 
   /**
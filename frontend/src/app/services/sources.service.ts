@@ -32,17 +32,35 @@ export class SourcesService {
   }
 
   /**
-   * Uploads a single file to the backend.
+   * Uploads a single file to the backend and waits until its ingestion job finishes.
    * @param file - The File object to upload
-   * @throws Error if the upload fails
+   * @throws Error if the upload or the ingestion job fails
    */
   async uploadFile(file: File): Promise<void> {
     const formData = new FormData();
     formData.append('file', file);
 
-    await lastValueFrom(
-      this.http.post(this.apiService.endpoints.file, formData)
+    const data = await lastValueFrom(
+      this.http.post<{ job_id: string }>(this.apiService.endpoints.file, formData)
     );
+    await this.waitForJob(data.job_id);
+  }
+
+  /**
+   * Polls an ingestion job until it completes.
+   * @param jobId - The ID returned by the upload endpoint
+   * @param intervalMs - Delay between status requests
+   * @throws Error if the job fails
+   */
+  async waitForJob(jobId: string, intervalMs = 500): Promise<void> {
+    while (true) {
+      const job = await lastValueFrom(
+        this.http.get<{ state: string; error: string | null }>(`${this.apiService.endpoints.jobs}/${jobId}`)
+      );
+      if (job.state === 'completed') return;
+      if (job.state === 'failed') throw new Error(job.error ?? 'Ingestion failed');
+      await new Promise(resolve => setTimeout(resolve, intervalMs));
+    }
   }
 
   /**